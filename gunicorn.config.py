@@ -1,7 +1,17 @@
+import glob
+import os
 from multiprocessing import cpu_count
 from os import getenv as env
 
-from service import log, settings
+from prometheus_client import multiprocess
+
+# Metrics directory must exist before service modules create any metrics.
+multiproc_dir = env("PROMETHEUS_MULTIPROC_DIR")
+if multiproc_dir:
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+from service import log, settings  # noqa: E402  # pylint: disable=wrong-import-position
+from service.prometheus import MULTIPROC_DIR_ENV  # noqa: E402  # pylint: disable=wrong-import-position
 
 # The socket to bind.
 host = env("HOST", "0.0.0.0")
@@ -103,3 +113,18 @@ tmp_upload_dir = env("GUNICORN_TMP_UPLOAD_DIR", None)
 
 # Front-end’s IPs from which allowed to handle set secure headers.
 forwarded_allow_ips = env("GUNICORN_FORWARDER_ALLOW_IPS", "127.0.0.1")
+
+
+# Metrics files of the previous run are removed on start.
+def on_starting(server):
+    multiproc_dir = env(MULTIPROC_DIR_ENV)
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+
+
+# Gauges of the dead worker are removed from aggregated metrics.
+def child_exit(server, worker):
+    if env(MULTIPROC_DIR_ENV):
+        multiprocess.mark_process_dead(worker.pid)
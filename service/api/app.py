@@ -8,6 +8,8 @@ from fastapi import FastAPI
 from ..log import app_logger, setup_logging
 from ..predictors.constructor import load_predictors
 from ..predictors.explainer import load_explanation_data
+from ..predictors.reload import PredictorsWatcher
+from ..prometheus import add_metrics_endpoint
 from ..settings import ServiceConfig
 from .exception_handlers import add_exception_handlers
 from .middlewares import add_middlewares
@@ -40,9 +42,22 @@ def create_app(config: ServiceConfig) -> FastAPI:
     app.state.root_path = config.root_path
     app.state.config = config
 
-    load_predictors(config)
-    load_explanation_data(config)
+    # Predictors and explanation data are independent, load them concurrently
+    with ThreadPoolExecutor(thread_name_prefix=f"{config.service_name}_loader") as executor:
+        loading = [*load_predictors(config, executor), executor.submit(load_explanation_data, config)]
+    for future in loading:
+        # Reraise loading errors
+        future.result()
+
+    # Watcher also passes admin commands between workers
+    app.state.watcher = None
+    if config.reload_config.watch or config.reload_config.admin_token is not None:
+        app.state.watcher = PredictorsWatcher(config)
+        app.add_event_handler("startup", app.state.watcher.start)
+        app.add_event_handler("shutdown", app.state.watcher.stop)
+
     add_views(app)
+    add_metrics_endpoint(app)
     add_middlewares(app)
     add_exception_handlers(app)
 
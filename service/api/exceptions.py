@@ -48,3 +48,36 @@ class ModelNotFoundError(AppException):
         error_loc: tp.Optional[tp.Sequence[str]] = None,
     ):
         super().__init__(status_code, error_key, error_message, error_loc)
+
+
+class ModelVersionNotFoundError(AppException):
+    def __init__(
+        self,
+        status_code: int = HTTPStatus.NOT_FOUND,
+        error_key: str = "model_version_not_found",
+        error_message: str = "Unknown model version",
+        error_loc: tp.Optional[tp.Sequence[str]] = None,
+    ):
+        super().__init__(status_code, error_key, error_message, error_loc)
+
+
+class ForbiddenError(AppException):
+    def __init__(
+        self,
+        status_code: int = HTTPStatus.FORBIDDEN,
+        error_key: str = "forbidden",
+        error_message: str = "Access denied",
+        error_loc: tp.Optional[tp.Sequence[str]] = None,
+    ):
+        super().__init__(status_code, error_key, error_message, error_loc)
+
+
+class NotSupportedError(AppException):
+    def __init__(
+        self,
+        status_code: int = HTTPStatus.BAD_REQUEST,
+        error_key: str = "not_supported",
+        error_message: str = "Operation is not supported",
+        error_loc: tp.Optional[tp.Sequence[str]] = None,
+    ):
+        super().__init__(status_code, error_key, error_message, error_loc)
@@ -1,62 +1,70 @@
 import time
 
 from fastapi import FastAPI, Request
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.middleware.cors import CORSMiddleware
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from service.log import access_logger, app_logger
 from service.models import Error
-from service.prometheus import add_prometheus_middleware
+from service.prometheus import observe_request
 from service.response import server_error
 
 
-class AccessMiddleware(BaseHTTPMiddleware):
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: RequestResponseEndpoint,
-    ) -> Response:
-        started_at = time.perf_counter()
-        response = await call_next(request)
-        request_time = time.perf_counter() - started_at
+class InstrumentationMiddleware:
+    """Access logging, request metrics and conversion of unhandled
+    exceptions to 500 responses in a single pure ASGI layer"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-        status_code = response.status_code
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        access_logger.info(
-            msg="",
-            extra={
-                "request_time": round(request_time, 4),
-                "status_code": status_code,
-                "requested_url": request.url,
-                "method": request.method,
-            },
-        )
-        return response
+        started_at = time.perf_counter()
+        status_code = 500
+        response_started = False
 
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_started = True
+            await send(message)
 
-class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: RequestResponseEndpoint,
-    ) -> Response:
         try:
-            return await call_next(request)
+            await self.app(scope, receive, send_with_status)
         except Exception as e:  # pylint: disable=W0703,W1203
             app_logger.exception(msg=f"Caught unhandled {e.__class__} exception: {e}")
+            if response_started:
+                # Response can't be replaced once its headers are sent
+                raise
             error = Error(
                 error_key="server_error",
                 error_message="Internal Server Error",
             )
-            return server_error([error])
+            await server_error([error])(scope, receive, send)
+            status_code = 500
+        finally:
+            request_time = time.perf_counter() - started_at
+            request = Request(scope)
+
+            access_logger.info(
+                msg="",
+                extra={
+                    "request_time": round(request_time, 4),
+                    "status_code": status_code,
+                    "requested_url": request.url,
+                    "method": request.method,
+                },
+            )
+            observe_request(request, status_code, request_time)
 
 
 def add_middlewares(app: FastAPI) -> None:
     # do not change order
-    add_prometheus_middleware(app)
-    app.add_middleware(ExceptionHandlerMiddleware)
-    app.add_middleware(AccessMiddleware)
+    app.add_middleware(InstrumentationMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
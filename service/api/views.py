@@ -1,20 +1,46 @@
 from __future__ import annotations
 
-from typing import Tuple, Union
+import secrets
+from functools import partial
+from typing import Any, Awaitable, Callable, Hashable, Iterator, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, FastAPI, Request
-from pandas import DataFrame
+from fastapi import APIRouter, FastAPI, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
-from service.api.exceptions import ItemNotFoundError, UserNotFoundError
+from service.api.exceptions import ForbiddenError, ItemNotFoundError, NotSupportedError, UserNotFoundError
 from service.log import app_logger
 
-from ..models import ExplainResponse, HealthResponse, HTTPValidationError, NotFoundError, RecoResponse
+from ..models import (
+    BatchExplainRequest,
+    BatchExplainResponse,
+    BatchRecoRequest,
+    BatchRecoResponse,
+    ExplainResponse,
+    FoldInRequest,
+    HealthResponse,
+    HTTPValidationError,
+    NotFoundError,
+    RecoResponse,
+    ReloadResponse,
+)
+from ..predictors.admission import get_admission_controller
 from ..predictors.base import BaseRecommender
-from ..predictors.constructor import get_predictor
-from ..predictors.explainer import get_all_users, get_items_rating
+from ..predictors.batching import get_batcher
+from ..predictors.cache import get_cache
+from ..predictors.constructor import get_predictor_async, previous_predictors
+from ..predictors.explainer import get_all_users, get_item_catalogue
+from ..predictors.reload import PredictorsWatcher
+from ..prometheus import observe_stage, set_request_labels
+from ..response import EncodedJSONResponse, encode_batch_explain, encode_batch_reco, encode_explain, encode_reco
 
 router = APIRouter()
 
+MAX_USER_ID = 10**9
+BATCH_STREAM_CHUNK_SIZE = 1_000
+# Set on responses with fallback recommendations of overloaded model
+DEGRADED_HEADER = "X-Degraded"
+
 
 @router.get(path="/health", tags=["Health"], response_model=HealthResponse)
 async def health() -> HealthResponse:
@@ -29,34 +55,97 @@ async def health() -> HealthResponse:
     tags=["Explanations"],
     responses={"200": {"model": ExplainResponse}, "404": {"model": NotFoundError}},
 )
-async def explain(request: Request, model_name: str, user_id: int, item_id: int) -> ExplainResponse:
+async def explain(request: Request, model_name: str, user_id: int, item_id: int) -> EncodedJSONResponse:
     """
     Explain recommendation
     """
-    model = get_predictor(model_name)
-    model_warm_users = model.users
+    model = await get_predictor_async(model_name)
+    set_request_labels(request, model_name, _user_temperature(model, user_id))
 
     all_users = get_all_users()
-    items_rating = get_items_rating()
+    item_catalogue = get_item_catalogue()
 
     # If the user is not in the database at all, we throw an error
     if user_id not in all_users:
         raise UserNotFoundError(error_message=f"User {user_id} not found")
 
     # Similarly for items
-    if item_id not in items_rating.index:
+    if item_id not in item_catalogue:
         raise ItemNotFoundError(error_message=f"Item {item_id} not found")
 
     # If the model has never seen the user,
     # we give him/her an explanation based on the global top seen
-    if user_id not in model_warm_users:
-        p, explanation = _explain_using_rating(item_id, items_rating)
+    if not model.is_warm(user_id):
+        p, explanation = item_catalogue.explain_using_rating(item_id)
 
     # Otherwise we try to explain by the model itself
     else:
-        p, explanation = _explain_using_model(item_id, user_id, model, items_rating)
+        try:
+            item_score, top_contributor = await _cached(
+                request,
+                model_name,
+                ("explain", user_id, model.user_version(user_id), item_id),
+                partial(run_in_threadpool, model.explain_reco, user_id, item_id),
+            )
+        except NotImplementedError as err:
+            raise NotSupportedError(error_message=f"Model {model_name} doesn't support explanations") from err
+        p, explanation = item_catalogue.explain_using_model(item_id, item_score, top_contributor)
+
+    return EncodedJSONResponse(encode_explain(p, explanation))
+
+
+@router.post(
+    path="/explain/{model_name}/{user_id}",
+    tags=["Explanations"],
+    responses={"200": {"model": BatchExplainResponse}, "404": {"model": NotFoundError}},
+)
+async def explain_batch(
+    request: Request,
+    model_name: str,
+    user_id: int,
+    body: Optional[BatchExplainRequest] = None,
+) -> EncodedJSONResponse:
+    """
+    Explain several items for user in one pass,
+    by default items recommended to the user are explained
+    """
+    model = await get_predictor_async(model_name)
+    set_request_labels(request, model_name, _user_temperature(model, user_id))
+
+    all_users = get_all_users()
+    item_catalogue = get_item_catalogue()
+
+    if user_id not in all_users:
+        raise UserNotFoundError(error_message=f"User {user_id} not found")
+
+    if body is not None and body.item_ids is not None:
+        item_ids = body.item_ids
+        unknown_items = [item_id for item_id in item_ids if item_id not in item_catalogue]
+        if unknown_items:
+            raise ItemNotFoundError(error_message=f"Item {unknown_items[0]} not found")
+    else:
+        # Recommended items without titles can't be explained
+        reco = await _cached(
+            request,
+            model_name,
+            ("reco", user_id, model.user_version(user_id)),
+            partial(_recommend, request, model_name, user_id),
+        )
+        item_ids = [item_id for item_id in reco if item_id in item_catalogue]
+
+    if not model.is_warm(user_id):
+        explanations = [item_catalogue.explain_using_rating(item_id) for item_id in item_ids]
+    else:
+        try:
+            explained = await run_in_threadpool(model.explain_reco_batch, user_id, item_ids)
+        except NotImplementedError as err:
+            raise NotSupportedError(error_message=f"Model {model_name} doesn't support explanations") from err
+        explanations = [
+            item_catalogue.explain_using_model(item_id, item_score, top_contributor)
+            for item_id, (item_score, top_contributor) in zip(item_ids, explained)
+        ]
 
-    return ExplainResponse(p=p, explanation=explanation)
+    return EncodedJSONResponse(encode_batch_explain(user_id, item_ids, explanations))
 
 
 @router.get(
@@ -73,70 +162,210 @@ async def get_reco(
     request: Request,
     model_name: str,
     user_id: int,
-) -> Union[RecoResponse, NotFoundError, HTTPValidationError]:
+) -> Union[EncodedJSONResponse, NotFoundError, HTTPValidationError]:
     """
     Get recommendations for user
     """
-    app_logger.info(f"Request for model: {model_name}, user_id: {user_id}")
+    app_logger.info("Request for model: %s, user_id: %s", model_name, user_id)
+
+    # Unknown models are rejected before the cache lookup
+    model = await get_predictor_async(model_name)
+    set_request_labels(request, model_name, _user_temperature(model, user_id))
+
+    if user_id > MAX_USER_ID:
+        raise UserNotFoundError(error_message=f"User {user_id} not found")
+
+    reco, degraded = await _admitted(
+        request,
+        model_name,
+        ("reco", user_id, model.user_version(user_id)),
+        partial(_recommend, request, model_name, user_id),
+        partial(model.fallback_recommend, user_id),
+    )
+
+    with observe_stage(model_name, "serialization"):
+        content = encode_reco(user_id, reco)
+
+    return EncodedJSONResponse(content, headers={DEGRADED_HEADER: "true"} if degraded else None)
+
+
+@router.post(
+    path="/reco/{model_name}/batch",
+    tags=["Recommendations"],
+    response_model=BatchRecoResponse,
+    responses={
+        "200": {"model": BatchRecoResponse},
+        "404": {"model": NotFoundError},
+        "422": {"model": HTTPValidationError},
+    },
+)
+async def get_batch_reco(
+    request: Request,
+    model_name: str,
+    body: BatchRecoRequest,
+    stream: bool = False,
+) -> Union[EncodedJSONResponse, StreamingResponse]:
+    """
+    Get recommendations for many users at once.
+    With `stream=true` recommendations are streamed back as NDJSON
+    """
+    app_logger.info("Batch request for model: %s, users: %s", model_name, len(body.user_ids))
+
+    model = await get_predictor_async(model_name)
+    set_request_labels(request, model_name)
+
+    unknown_users = [user_id for user_id in body.user_ids if user_id > MAX_USER_ID]
+    if unknown_users:
+        raise UserNotFoundError(error_message=f"User {unknown_users[0]} not found")
+
+    if stream:
+        return StreamingResponse(
+            _stream_batch_reco(model, body.user_ids),
+            media_type="application/x-ndjson",
+        )
+
+    recos = await run_in_threadpool(model.recommend_batch, body.user_ids)
+
+    return EncodedJSONResponse(encode_batch_reco(body.user_ids, recos))
+
+
+@router.post(
+    path="/fold_in/{model_name}/{user_id}",
+    tags=["Recommendations"],
+    response_model=RecoResponse,
+    responses={
+        "200": {"model": RecoResponse},
+        "404": {"model": NotFoundError},
+        "422": {"model": HTTPValidationError},
+    },
+)
+async def fold_in(
+    request: Request,
+    model_name: str,
+    user_id: int,
+    body: FoldInRequest,
+) -> EncodedJSONResponse:
+    """
+    Update user by recent interactions without retraining the model,
+    get new recommendations for user.
 
-    model = get_predictor(model_name)
+    Folded in user is kept by the worker process which handled
+    the request only, other workers recommend by the trained model.
+    """
+    model = await get_predictor_async(model_name)
+    set_request_labels(request, model_name, "warm")
 
-    if user_id > 10**9:
+    if user_id > MAX_USER_ID:
         raise UserNotFoundError(error_message=f"User {user_id} not found")
 
-    reco = model.recommend(user_id)
+    weights = body.weights if body.weights is not None else [1.0] * len(body.item_ids)
+    try:
+        await run_in_threadpool(model.fold_in, user_id, body.item_ids, weights)
+    except NotImplementedError as err:
+        raise NotSupportedError(error_message=f"Model {model_name} doesn't support fold-in") from err
+    reco = await run_in_threadpool(model.recommend, user_id)
+
+    return EncodedJSONResponse(encode_reco(user_id, reco))
+
+
+@router.post(
+    path="/admin/reload/{model_name}",
+    tags=["Admin"],
+    response_model=ReloadResponse,
+    responses={"200": {"model": ReloadResponse}, "404": {"model": NotFoundError}},
+)
+async def reload_model(
+    request: Request,
+    model_name: str,
+    x_admin_token: Optional[str] = Header(None),
+) -> ReloadResponse:
+    """
+    Load new version of model files in all workers,
+    serving version is kept for rollback
+    """
+    watcher = _get_admin_watcher(request, x_admin_token)
+    await run_in_threadpool(watcher.run_command, model_name, "reload")
+
+    return ReloadResponse(model_name=model_name, previous_versions=len(previous_predictors.get(model_name, ())))
+
+
+@router.post(
+    path="/admin/rollback/{model_name}",
+    tags=["Admin"],
+    response_model=ReloadResponse,
+    responses={"200": {"model": ReloadResponse}, "404": {"model": NotFoundError}},
+)
+async def rollback_model(
+    request: Request,
+    model_name: str,
+    x_admin_token: Optional[str] = Header(None),
+) -> ReloadResponse:
+    """
+    Return previous version of model to serving in all workers
+    """
+    watcher = _get_admin_watcher(request, x_admin_token)
+    await run_in_threadpool(watcher.run_command, model_name, "rollback")
 
-    return RecoResponse(user_id=user_id, items=reco)
+    return ReloadResponse(model_name=model_name, previous_versions=len(previous_predictors.get(model_name, ())))
 
 
 def add_views(app: FastAPI) -> None:
     app.include_router(router)
 
 
-def _explain_using_rating(item_id: int, items_rating: DataFrame) -> Tuple[int, str]:
-    # Get the values needed for the explanation
-    # from the dataset with the rating
-    views_count = items_rating.at[item_id, "views"]
-    item_rank = items_rating.at[item_id, "rank"]
-    item_title = items_rating.at[item_id, "title"]
-    # Let's use as p a value equal to the rounded value of
-    # (-95 * (rank - 1) / (max_rank - 1) + 95)
-    # (from the equation of the line passing through 2 points)
-    # Thus the higher in the ranking - the higher the score
-    # (In range [0;95])
-    p = round(-95 * (item_rank - 1) / (items_rating["rank"].max() - 1) + 95)
-
-    if p >= 10:
-        # Forming an explanation if p >= 10
-        explanation = (
-            rf"Фильм/сериал {item_title!r} может вам понравиться с вероятностью "
-            + rf"{p}% т.к. его уже посмотрели {views_count} пользователей сервиса "
-            + rf"и он занимает {item_rank} место в нашем топе"
-        )
-    else:
-        # Forming an explanation if p < 10
-        explanation = rf"Фильм/сериал {item_title!r} скорее всего вам не понравится"
-
-    return p, explanation
-
-
-def _explain_using_model(
-    item_id: int, user_id: int, model: BaseRecommender, items_rating: DataFrame
-) -> Tuple[int, str]:
-    # Get the values needed for the explanation from model itself
-    item_score, top_contributor = model.explain_reco(user_id, item_id)
-    p = round(item_score * 100)
-    item_title = items_rating.at[item_id, "title"]
-    top_contributor_title = items_rating.at[top_contributor, "title"]
-
-    if p >= 10:
-        # Forming an explanation if p >= 10
-        explanation = (
-            rf"Фильм/сериал {item_title!r} может вам понравиться "
-            + rf"с вероятностью {p}% т.к. вы посмотрели {top_contributor_title!r}"
-        )
-    else:
-        # Forming an explanation if p < 10
-        explanation = rf"Фильм/сериал {item_title!r} скорее всего вам не понравится"
+async def _recommend(request: Request, model_name: str, user_id: int) -> List:
+    batching_config = request.app.state.config.batching_config
+    if batching_config.enabled:
+        return await get_batcher(model_name, batching_config).recommend(user_id)
+
+    model = await get_predictor_async(model_name)
+    return await run_in_threadpool(model.recommend, user_id)
+
+
+async def _cached(request: Request, model_name: str, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+    # Results of repeated requests are taken from the model's cache
+    cache_config = request.app.state.config.cache_config
+    if not cache_config.enabled:
+        return await compute()
+
+    return await get_cache(model_name, cache_config).get_or_compute(key, compute)
+
+
+async def _admitted(
+    request: Request,
+    model_name: str,
+    key: Hashable,
+    compute: Callable[[], Awaitable[Any]],
+    fallback: Callable[[], Optional[Any]],
+) -> Tuple[Any, bool]:
+    # Cached results are served as is, only model calls can be shed
+    config = request.app.state.config
+    cached = config.cache_config.enabled and key in get_cache(model_name, config.cache_config)
+    if not config.admission_config.enabled or cached:
+        return await _cached(request, model_name, key, compute), False
+
+    controller = get_admission_controller(model_name, config.admission_config)
+    return await controller.run(partial(_cached, request, model_name, key, compute), fallback)
+
+
+def _user_temperature(model: BaseRecommender, user_id: int) -> str:
+    return "warm" if model.is_warm(user_id) else "cold"
+
+
+def _get_admin_watcher(request: Request, token: Optional[str]) -> PredictorsWatcher:
+    # Watcher of this worker passes admin commands to other workers
+    admin_token = request.app.state.config.reload_config.admin_token
+    if admin_token is None:
+        raise ForbiddenError(error_message="Admin endpoints are disabled, admin token is not set")
+    if token is None or not secrets.compare_digest(token, admin_token):
+        raise ForbiddenError(error_message="Wrong admin token")
+
+    return request.app.state.watcher
+
 
-    return p, explanation
+def _stream_batch_reco(model: BaseRecommender, user_ids: List[int]) -> Iterator[bytes]:
+    # Users are scored by chunks, the whole response is never kept in memory
+    for start in range(0, len(user_ids), BATCH_STREAM_CHUNK_SIZE):
+        chunk = user_ids[start : start + BATCH_STREAM_CHUNK_SIZE]
+        recos = model.recommend_batch(chunk)
+        yield b"".join(encode_reco(user_id, reco) + b"\n" for user_id, reco in zip(chunk, recos))
@@ -0,0 +1,266 @@
+"""Load benchmark of the service
+
+Replays a request log or a synthetic mix of users with Zipf popularity
+either in-process through ASGI or against a running server (`--url`)
+and prints latency percentiles, throughput and error rates as JSON.
+
+Usage:
+    python -m service.benchmark --log requests_log.jsonl --concurrency 16
+    python -m service.benchmark --models als random --url http://host:8080
+    python -m service.benchmark --max-p99-ms 50 --max-error-rate 0.001
+    python -m service.benchmark --serialization
+
+Every line of a request log is a JSON object with `method` (GET by
+default), `path` and an optional `json` body.
+Exit code is 1 if any threshold is violated.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import timeit
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from .models import RecoResponse
+from .response import PreEncodedList, encode_reco
+
+PERCENTILES = (50, 95, 99)
+
+
+class BenchmarkRequest(NamedTuple):
+    method: str
+    path: str
+    body: Optional[Any] = None
+
+
+class RequestResult(NamedTuple):
+    group: Tuple[str, str]
+    latency: float
+    status_code: int
+
+
+def read_request_log(path: str) -> List[BenchmarkRequest]:
+    """Read requests to replay from JSONL file"""
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                requests.append(BenchmarkRequest(record.get("method", "GET"), record["path"], record.get("json")))
+
+    return requests
+
+
+def zipf_requests(
+    user_ids: Sequence[int],
+    models: Sequence[str],
+    n_requests: int,
+    zipf_a: float = 1.2,
+    random_state: int = 42,
+) -> List[BenchmarkRequest]:
+    """Synthetic reco requests: user popularity follows Zipf law,
+    so a few users are requested repeatedly as in production"""
+    rng = np.random.default_rng(random_state)
+    # Popularity rank of every user is random
+    users_by_rank = rng.permutation(np.asarray(user_ids))
+    ranks = np.minimum(rng.zipf(zipf_a, n_requests), len(users_by_rank)) - 1
+    request_models = rng.choice(np.asarray(models), n_requests)
+
+    return [
+        BenchmarkRequest("GET", f"/reco/{model}/{user_id}")
+        for model, user_id in zip(request_models, users_by_rank[ranks])
+    ]
+
+
+def request_group(path: str) -> Tuple[str, str]:
+    """Get (endpoint, model name) of the request path"""
+    parts = path.split("?")[0].strip("/").split("/")
+    endpoint = parts[0]
+    if endpoint == "reco" and parts[-1] == "batch":
+        endpoint = "reco_batch"
+    elif endpoint == "explain" and len(parts) == 3:
+        endpoint = "explain_batch"
+    model_name = parts[1] if len(parts) > 1 else ""
+
+    return endpoint, model_name
+
+
+async def run_benchmark(
+    client: httpx.AsyncClient,
+    requests: Iterable[BenchmarkRequest],
+    concurrency: int,
+) -> Tuple[List[RequestResult], float]:
+    """Send requests with `concurrency` parallel clients,
+    get results of all requests and total time"""
+    requests_iter = iter(requests)
+    results: List[RequestResult] = []
+
+    async def worker() -> None:
+        # Workers share the iterator, so every request is sent once
+        for request in requests_iter:
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(request.method, request.path, json=request.body)
+                status_code = response.status_code
+            except httpx.HTTPError:
+                status_code = 0
+            results.append(RequestResult(request_group(request.path), time.perf_counter() - started_at, status_code))
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return results, time.perf_counter() - started_at
+
+
+def summarize(results: Sequence[RequestResult], total_time: float) -> Dict[str, Any]:
+    """Latency percentiles, throughput and error rate
+    in total and per endpoint and model"""
+    groups: Dict[Tuple[str, str], List[RequestResult]] = defaultdict(list)
+    for result in results:
+        groups[result.group].append(result)
+
+    return {
+        "total": _summarize_group(results, total_time),
+        "groups": [
+            {"endpoint": endpoint, "model_name": model_name, **_summarize_group(group_results, total_time)}
+            for (endpoint, model_name), group_results in sorted(groups.items())
+        ],
+    }
+
+
+def _summarize_group(results: Sequence[RequestResult], total_time: float) -> Dict[str, Any]:
+    latencies_ms = 1000 * np.array([result.latency for result in results])
+    # Server errors and failed connections, 4xx are valid answers
+    errors = sum(1 for result in results if result.status_code == 0 or result.status_code >= 500)
+    status_codes: Dict[str, int] = defaultdict(int)
+    for result in results:
+        status_codes[str(result.status_code)] += 1
+
+    summary: Dict[str, Any] = {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / max(len(results), 1),
+        "rps": len(results) / total_time if total_time > 0 else 0.0,
+        "status_codes": dict(status_codes),
+    }
+    for percentile in PERCENTILES:
+        summary[f"p{percentile}_ms"] = float(np.percentile(latencies_ms, percentile)) if len(results) else 0.0
+
+    return summary
+
+
+def check_thresholds(
+    summary: Dict[str, Any],
+    max_p99_ms: Optional[float] = None,
+    max_error_rate: Optional[float] = None,
+    min_rps: Optional[float] = None,
+) -> List[str]:
+    """Get descriptions of violated thresholds,
+    latency and errors are checked for every group, throughput in total"""
+    violations = []
+    for group in [{"endpoint": "total", "model_name": "", **summary["total"]}, *summary["groups"]]:
+        name = f"{group['endpoint']} {group['model_name']}".strip()
+        if max_p99_ms is not None and group["p99_ms"] > max_p99_ms:
+            violations.append(f"{name}: p99 {group['p99_ms']:.2f}ms > {max_p99_ms}ms")
+        if max_error_rate is not None and group["error_rate"] > max_error_rate:
+            violations.append(f"{name}: error rate {group['error_rate']:.4f} > {max_error_rate}")
+    if min_rps is not None and summary["total"]["rps"] < min_rps:
+        violations.append(f"total: {summary['total']['rps']:.1f} rps < {min_rps} rps")
+
+    return violations
+
+
+def benchmark_serialization(n_items: int = 10, repeat: int = 10_000) -> Dict[str, float]:
+    """Time of encoding one reco response (microseconds): pydantic model,
+    orjson and orjson with pre-encoded items"""
+    items = list(range(n_items))
+    pre_encoded_items = PreEncodedList(items)
+    cases = {
+        "pydantic": lambda: RecoResponse(user_id=1, items=items).json(),
+        "orjson": lambda: encode_reco(1, items),
+        "orjson_pre_encoded": lambda: encode_reco(1, pre_encoded_items),
+    }
+
+    return {name: 1e6 * timeit.timeit(case, number=repeat) / repeat for name, case in cases.items()}
+
+
+def _in_process_client() -> httpx.AsyncClient:
+    # Service is imported only when benchmarked in-process
+    from .api.app import create_app  # pylint: disable=import-outside-toplevel
+    from .settings import get_config  # pylint: disable=import-outside-toplevel
+
+    return httpx.AsyncClient(app=create_app(get_config()), base_url="http://benchmark")
+
+
+def _load_user_ids(path: Optional[str], n_users: int) -> Sequence[int]:
+    if path is None:
+        return range(1, n_users + 1)
+    return pd.read_csv(path)["user_id"].tolist()
+
+
+def _parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load benchmark of the service")
+    parser.add_argument("--url", help="Benchmark running server instead of the app in-process")
+    parser.add_argument("--log", help="JSONL request log to replay")
+    parser.add_argument("--models", nargs="+", default=["als"], help="Models of synthetic requests")
+    parser.add_argument("--requests", type=int, default=10_000, help="Number of synthetic requests")
+    parser.add_argument("--users-file", help="CSV with user_id column, users 1..--n-users by default")
+    parser.add_argument("--n-users", type=int, default=100_000, help="Number of synthetic users")
+    parser.add_argument("--zipf-a", type=float, default=1.2, help="Zipf distribution parameter (> 1)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of parallel clients")
+    parser.add_argument("--warmup", type=int, default=100, help="Requests sent before measurement")
+    parser.add_argument("--serialization", action="store_true", help="Benchmark only responses encoding")
+    parser.add_argument("--output", help="Write JSON report to the file instead of stdout")
+    parser.add_argument("--max-p99-ms", type=float, help="Maximum allowed p99 latency")
+    parser.add_argument("--max-error-rate", type=float, help="Maximum allowed share of errors")
+    parser.add_argument("--min-rps", type=float, help="Minimum allowed throughput")
+
+    return parser.parse_args(argv)
+
+
+async def _benchmark(args: argparse.Namespace, requests: Sequence[BenchmarkRequest]) -> Dict[str, Any]:
+    client = httpx.AsyncClient(base_url=args.url) if args.url else _in_process_client()
+    async with client:
+        await run_benchmark(client, requests[: args.warmup], args.concurrency)
+        results, total_time = await run_benchmark(client, requests, args.concurrency)
+
+    return summarize(results, total_time)
+
+
+def _build_requests(args: argparse.Namespace) -> List[BenchmarkRequest]:
+    if args.log:
+        return read_request_log(args.log)
+
+    user_ids = _load_user_ids(args.users_file, args.n_users)
+    return zipf_requests(user_ids, args.models, args.requests, args.zipf_a)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = _parse_args(argv)
+    if args.serialization:
+        print(json.dumps(benchmark_serialization(), indent=2))
+        return 0
+
+    summary = asyncio.run(_benchmark(args, _build_requests(args)))
+
+    violations = check_thresholds(summary, args.max_p99_ms, args.max_error_rate, args.min_rps)
+    summary["violations"] = violations
+
+    report = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
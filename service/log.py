@@ -1,10 +1,19 @@
+import atexit
 import logging.config
+import queue
+import random
 import typing as tp
+from logging.handlers import QueueHandler, QueueListener
 
+from .prometheus import LOG_RECORDS_DROPPED
 from .settings import ServiceConfig
 
 app_logger = logging.getLogger("app")
 access_logger = logging.getLogger("access")
+# Loggers whose records are written by a background thread
+QUEUED_LOGGERS = (app_logger.name, access_logger.name)
+
+_listeners: tp.List[QueueListener] = []
 
 
 class ServiceNameFilter(logging.Filter):
@@ -19,11 +28,49 @@ class ServiceNameFilter(logging.Filter):
         return super().filter(record)
 
 
+class SamplingFilter(logging.Filter):
+    """Keep only `rate` share of records up to `max_level`,
+    more severe records are always kept"""
+
+    def __init__(self, name: str = "", rate: float = 1.0, max_level: int = logging.INFO) -> None:
+        self.rate = rate
+        self.max_level = max_level
+
+        super().__init__(name)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= self.max_level and random.random() >= self.rate:
+            return False
+
+        return super().filter(record)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Puts records to a bounded queue without blocking,
+    records which don't fit are dropped and counted"""
+
+    def __init__(self, records_queue: "queue.Queue[logging.LogRecord]") -> None:
+        self.dropped = 0
+
+        super().__init__(records_queue)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records are formatted lazily by the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.labels(logger=record.name).inc()
+
+
 def get_config(service_config: ServiceConfig) -> tp.Dict[str, tp.Any]:
     level = service_config.log_config.level
     datetime_format = service_config.log_config.datetime_format
 
-    config = {
+    config: tp.Dict[str, tp.Any] = {
         "version": 1,
         "disable_existing_loggers": True,
         "loggers": {
@@ -136,9 +183,38 @@ def get_config(service_config: ServiceConfig) -> tp.Dict[str, tp.Any]:
         },
     }
 
+    for logger_name, rate in service_config.log_config.sample_rates.items():
+        filter_name = f"sampling_{logger_name}"
+        config["filters"][filter_name] = {"()": "service.log.SamplingFilter", "rate": rate}
+        config["loggers"].setdefault(logger_name, {"level": level, "handlers": ["console"], "propagate": False})
+        config["loggers"][logger_name].setdefault("filters", []).append(filter_name)
+
     return config
 
 
 def setup_logging(service_config: ServiceConfig) -> None:
     config = get_config(service_config)
+    _stop_listeners()
     logging.config.dictConfig(config)
+
+    if service_config.log_config.use_queue:
+        for logger_name in QUEUED_LOGGERS:
+            _install_queue(logging.getLogger(logger_name), service_config.log_config.queue_size)
+
+
+def _install_queue(logger: logging.Logger, queue_size: int) -> None:
+    # Handlers created by dictConfig are moved to the writer thread
+    records_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(queue_size)
+    listener = QueueListener(records_queue, *logger.handlers, respect_handler_level=True)
+    logger.handlers = [DroppingQueueHandler(records_queue)]
+    listener.start()
+    _listeners.append(listener)
+
+
+def _stop_listeners() -> None:
+    # Writes queued records before handlers are reconfigured
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(_stop_listeners)
@@ -0,0 +1,186 @@
+"""Users K-fold leave-p-out cross validation
+
+Interactions are grouped by users once into a CSR matrix whose rows keep
+the order of interactions. Folds are arrays of test users only, train
+and test matrices of a fold are built when the fold is evaluated.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from ..predictors.id_index import IdIndex
+from .ranking import RANKING_METRICS, calc_ranking_metrics
+
+# Get (n_test_users, k) internal item ids from train matrix and test users
+FitRecommend = Callable[[sparse.csr_matrix, np.ndarray, int], np.ndarray]
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+
+class UserInteractions(NamedTuple):
+    users: IdIndex
+    items: IdIndex
+    ui_csr: sparse.csr_matrix
+
+
+class Fold(NamedTuple):
+    number: int
+    test_users: np.ndarray
+
+
+def group_by_users(
+    interactions: pd.DataFrame,
+    order_column: Optional[str] = None,
+    weight_column: Optional[str] = None,
+) -> UserInteractions:
+    """Group interactions by users, items of every user are ordered
+    by `order_column` (or kept in order of the frame)"""
+    users = IdIndex(pd.unique(interactions["user_id"]))
+    items = IdIndex(pd.unique(interactions["item_id"]))
+    rows = users.to_internal(interactions["user_id"].to_numpy())
+    cols = items.to_internal(interactions["item_id"].to_numpy())
+    order = np.argsort(rows, kind="stable")
+    if order_column is not None:
+        order = np.lexsort((interactions[order_column].to_numpy(), rows))
+
+    weights = np.ones(len(interactions), dtype=np.float32)
+    if weight_column is not None:
+        weights = interactions[weight_column].to_numpy(dtype=np.float32)
+
+    indptr = np.zeros(len(users) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(users)), out=indptr[1:])
+    ui_csr = sparse.csr_matrix(
+        (weights[order], cols[order].astype(np.int32), indptr),
+        shape=(len(users), len(items)),
+    )
+    return UserInteractions(users, items, ui_csr)
+
+
+def leave_p_out(ui_csr: sparse.csr_matrix, users: np.ndarray, p: int) -> sparse.csr_matrix:
+    """Get (len(users), n_items) matrix of first p interactions of users"""
+    starts = ui_csr.indptr[users]
+    counts = np.minimum(ui_csr.indptr[users + 1] - starts, p)
+    indptr = np.concatenate(([0], np.cumsum(counts)))
+    positions = np.repeat(starts - indptr[:-1], counts) + np.arange(indptr[-1])
+
+    return sparse.csr_matrix(
+        (ui_csr.data[positions], ui_csr.indices[positions], indptr),
+        shape=(len(users), ui_csr.shape[1]),
+    )
+
+
+def exclude_users(ui_csr: sparse.csr_matrix, users: np.ndarray) -> sparse.csr_matrix:
+    """Get matrix of the same shape with empty rows of given users"""
+    lengths = np.diff(ui_csr.indptr)
+    lengths[users] = 0
+    kept = np.repeat(lengths > 0, np.diff(ui_csr.indptr))
+
+    return sparse.csr_matrix(
+        (ui_csr.data[kept], ui_csr.indices[kept], np.concatenate(([0], np.cumsum(lengths)))),
+        shape=ui_csr.shape,
+    )
+
+
+class UsersKFoldPOut:
+    """Users are split into folds, test part of a fold is first p
+    interactions of its users, train part is interactions of other users"""
+
+    def __init__(self, n_folds: int, p: int, random_state: Optional[int] = 23) -> None:
+        self.n_folds = n_folds
+        self.p = p
+        self.random_state = random_state
+
+    def split(self, n_users: int) -> Iterator[Fold]:
+        """Yield sorted internal ids of test users of every fold,
+        first folds are one user larger if users are not divided evenly"""
+        users = np.random.default_rng(self.random_state).permutation(n_users)
+        for number, test_users in enumerate(np.array_split(users, self.n_folds)):
+            yield Fold(number, np.sort(test_users))
+
+    def get_fold(self, ui_csr: sparse.csr_matrix, fold: Fold) -> Tuple[sparse.csr_matrix, sparse.csr_matrix]:
+        """Get train matrix of all users and test matrix of test users"""
+        return exclude_users(ui_csr, fold.test_users), leave_p_out(ui_csr, fold.test_users, self.p)
+
+
+def evaluate_folds(
+    ui_csr: sparse.csr_matrix,
+    cv: UsersKFoldPOut,
+    fit_recommend: FitRecommend,
+    k: int,
+    metrics: Sequence[str] = RANKING_METRICS,
+    n_jobs: int = 1,
+) -> List[Dict[str, Any]]:
+    """Train and evaluate a model on every fold.
+
+    With `n_jobs` more than 1 folds are evaluated concurrently by
+    processes, the matrix is put to shared memory once and is not copied
+    to them. `fit_recommend` must be picklable then.
+    """
+    folds = list(cv.split(ui_csr.shape[0]))
+    if n_jobs <= 1:
+        return [_evaluate_fold(ui_csr, cv, fit_recommend, k, metrics, fold) for fold in folds]
+
+    arrays = {"indptr": ui_csr.indptr, "indices": ui_csr.indices, "data": ui_csr.data}
+    blocks = {
+        name: shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1)) for name, array in arrays.items()
+    }
+    try:
+        specs = {}
+        for name, array in arrays.items():
+            np.ndarray(array.shape, array.dtype, buffer=blocks[name].buf)[:] = array
+            specs[name] = (blocks[name].name, array.shape, array.dtype.str)
+
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [
+                executor.submit(_evaluate_shared_fold, specs, ui_csr.shape, cv, fit_recommend, k, metrics, fold)
+                for fold in folds
+            ]
+            return [future.result() for future in futures]
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+
+def _evaluate_fold(
+    ui_csr: sparse.csr_matrix,
+    cv: UsersKFoldPOut,
+    fit_recommend: FitRecommend,
+    k: int,
+    metrics: Sequence[str],
+    fold: Fold,
+) -> Dict[str, Any]:
+    train, test = cv.get_fold(ui_csr, fold)
+    reco = fit_recommend(train, fold.test_users, k)
+
+    results: Dict[str, Any] = {"fold": fold.number, "train_size": train.nnz, "test_size": test.nnz}
+    results.update(calc_ranking_metrics(reco, test, k, metrics))
+    return results
+
+
+def _evaluate_shared_fold(
+    specs: Dict[str, ArraySpec],
+    shape: Tuple[int, int],
+    cv: UsersKFoldPOut,
+    fit_recommend: FitRecommend,
+    k: int,
+    metrics: Sequence[str],
+    fold: Fold,
+) -> Dict[str, Any]:
+    # Blocks are owned (and unlinked) by the parent process
+    blocks = {name: shared_memory.SharedMemory(name=block_name) for name, (block_name, _, _) in specs.items()}
+    arrays: Dict[str, np.ndarray] = {
+        name: np.ndarray(array_shape, np.dtype(dtype), buffer=blocks[name].buf)
+        for name, (_, array_shape, dtype) in specs.items()
+    }
+    ui_csr = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+    results = _evaluate_fold(ui_csr, cv, fit_recommend, k, metrics, fold)
+
+    # Views of blocks must be released before blocks are closed
+    del arrays, ui_csr
+    for block in blocks.values():
+        block.close()
+    return results
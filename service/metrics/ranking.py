@@ -0,0 +1,172 @@
+"""Offline ranking metrics over sparse ground truth
+
+Recommendations are a (n_users, k) array of internal item ids, padded
+with negative ids, ground truth is a (n_users, n_items) CSR matrix with
+relevance of items in [0, 1]. Rows of both are the same users.
+Metrics are averaged over users with at least one relevant item.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from ..predictors.id_index import MISSING_ID, IdIndex
+
+# Probability that a user stops looking through recommendations
+PFOUND_BREAK_PROBABILITY = 0.15
+
+
+def truth_matrix(
+    interactions: pd.DataFrame,
+    users: IdIndex,
+    items: IdIndex,
+    relevance_column: Optional[str] = None,
+) -> sparse.csr_matrix:
+    """Build ground truth matrix from interactions with external ids,
+    interactions of unknown users and items are dropped"""
+    rows = users.to_internal(interactions["user_id"].to_numpy())
+    cols = items.to_internal(interactions["item_id"].to_numpy())
+    known = (rows != MISSING_ID) & (cols != MISSING_ID)
+    relevance = np.ones(len(interactions), dtype=np.float32)
+    if relevance_column is not None:
+        relevance = interactions[relevance_column].to_numpy(dtype=np.float32)
+
+    # Duplicated interactions keep the highest relevance
+    pairs = pd.DataFrame({"row": rows[known], "col": cols[known], "relevance": relevance[known]})
+    pairs = pairs.groupby(["row", "col"], sort=False)["relevance"].max().reset_index()
+
+    return sparse.csr_matrix(
+        (pairs["relevance"].to_numpy(), (pairs["row"].to_numpy(), pairs["col"].to_numpy())),
+        shape=(len(users), len(items)),
+        dtype=np.float32,
+    )
+
+
+def hit_relevance(reco: np.ndarray, truth: sparse.csr_matrix) -> np.ndarray:
+    """Get (n_users, k) relevance of recommended items, 0 for misses.
+
+    All lookups are done by one binary search over sorted keys
+    (row, item) of the matrix, so time is O(n_users * k * log(nnz)).
+    """
+    truth = truth.tocsr()
+    reco = np.asarray(reco, dtype=np.int64)
+    if truth.nnz == 0:
+        return np.zeros(reco.shape, dtype=np.float32)
+    if not truth.has_sorted_indices:
+        truth = truth.sorted_indices()
+
+    n_items = np.int64(truth.shape[1])
+    rows = np.repeat(np.arange(truth.shape[0], dtype=np.int64), np.diff(truth.indptr))
+    keys = rows * n_items + truth.indices
+    query = np.arange(len(reco), dtype=np.int64)[:, None] * n_items + reco
+
+    positions = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    found = (reco >= 0) & (reco < n_items) & (keys[positions] == query)
+
+    return np.where(found, truth.data[positions], 0).astype(np.float32)
+
+
+def _ranks(relevance: np.ndarray) -> np.ndarray:
+    return np.arange(1, relevance.shape[1] + 1, dtype=np.float32)
+
+
+def _mrr(relevance: np.ndarray, n_relevant: np.ndarray) -> np.ndarray:
+    hits = relevance > 0
+    return np.where(hits.any(axis=1), 1 / _ranks(relevance)[hits.argmax(axis=1)], 0.0)
+
+
+def _map(relevance: np.ndarray, n_relevant: np.ndarray) -> np.ndarray:
+    hits = relevance > 0
+    precision = np.cumsum(hits, axis=1) / _ranks(relevance)
+    return (precision * hits).sum(axis=1) / n_relevant
+
+
+def _ndcg(relevance: np.ndarray, n_relevant: np.ndarray) -> np.ndarray:
+    # Ideal ranking puts all relevant items (of relevance 1) first
+    discounts = 1 / np.log2(_ranks(relevance) + 1)
+    ideal = np.concatenate(([0.0], np.cumsum(discounts)))[np.minimum(n_relevant, len(discounts)).astype(np.int64)]
+    return (relevance @ discounts) / ideal
+
+
+def _recall(relevance: np.ndarray, n_relevant: np.ndarray) -> np.ndarray:
+    return (relevance > 0).sum(axis=1) / n_relevant
+
+
+def _pfound(relevance: np.ndarray, n_relevant: np.ndarray) -> np.ndarray:
+    # Look at i-th item happens if previous ones were not relevant
+    # and the user did not stop
+    not_stopped = (1 - relevance[:, :-1]) * (1 - PFOUND_BREAK_PROBABILITY)
+    look = np.cumprod(np.hstack((np.ones((len(relevance), 1), dtype=np.float32), not_stopped)), axis=1)
+    return (look * relevance).sum(axis=1)
+
+
+USER_METRICS: Dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+    "mrr": _mrr,
+    "map": _map,
+    "ndcg": _ndcg,
+    "recall": _recall,
+    "pfound": _pfound,
+}
+RANKING_METRICS = tuple(USER_METRICS)
+
+
+def user_metrics(
+    relevance: np.ndarray,
+    n_relevant: np.ndarray,
+    metrics: Sequence[str] = RANKING_METRICS,
+) -> Dict[str, np.ndarray]:
+    """Compute metrics of every user from relevance of recommended items
+    and number of relevant items of the user"""
+    n_relevant = np.asarray(n_relevant, dtype=np.float32)
+    values = {}
+    for metric in metrics:
+        if metric not in USER_METRICS:
+            raise ValueError(f"Unknown metric {metric}, expected one of {RANKING_METRICS}")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            user_values = USER_METRICS[metric](relevance, n_relevant)
+        # Users without relevant items get nan, so they are not averaged
+        values[metric] = np.where(n_relevant > 0, user_values, np.nan)
+
+    return values
+
+
+def _chunk_metrics(reco: np.ndarray, truth: sparse.csr_matrix, metrics: Sequence[str]) -> Dict[str, np.ndarray]:
+    return user_metrics(hit_relevance(reco, truth), np.diff(truth.indptr), metrics)
+
+
+def calc_ranking_metrics(
+    reco: np.ndarray,
+    truth: sparse.csr_matrix,
+    k: Optional[int] = None,
+    metrics: Sequence[str] = RANKING_METRICS,
+    chunk_size: int = 100_000,
+    n_jobs: int = 1,
+) -> Dict[str, float]:
+    """Compute mean metrics@k of recommendations.
+
+    Users are processed by chunks to bound memory, chunks are
+    distributed between `n_jobs` processes if it is more than 1.
+    """
+    reco = np.asarray(reco)[:, :k]
+    truth = truth.tocsr()
+    if len(reco) != truth.shape[0]:
+        raise ValueError(f"Recommendations for {len(reco)} users, but ground truth for {truth.shape[0]}")
+
+    starts = range(0, len(reco), chunk_size)
+    reco_chunks = [reco[start : start + chunk_size] for start in starts]
+    truth_chunks = [truth[start : start + chunk_size] for start in starts]
+    chunks: List[Dict[str, np.ndarray]]
+    if n_jobs > 1 and len(reco_chunks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            chunks = list(executor.map(_chunk_metrics, reco_chunks, truth_chunks, [metrics] * len(reco_chunks)))
+    else:
+        chunks = [_chunk_metrics(*chunk, metrics) for chunk in zip(reco_chunks, truth_chunks)]
+
+    results = {}
+    for metric in metrics:
+        values = np.concatenate([chunk[metric] for chunk in chunks]) if chunks else np.array([])
+        results[metric] = float(np.nanmean(values)) if np.any(~np.isnan(values)) else 0.0
+
+    return results
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 
 
 class Error(BaseModel):
@@ -45,6 +45,38 @@ class RecoResponse(BaseModel):
         }
 
 
+class BatchRecoRequest(BaseModel):
+    user_ids: List[int] = Field(..., title="User Ids")
+
+    class Config:
+        schema_extra = {"example": {"user_ids": [4456, 4457]}}
+
+
+class FoldInRequest(BaseModel):
+    item_ids: List[int] = Field(..., title="Item Ids", min_items=1)
+    weights: Optional[List[float]] = Field(None, title="Interactions Weights")
+
+    @validator("weights")
+    def weights_match_items(  # pylint: disable=no-self-argument
+        cls, weights: Optional[List[float]], values: Dict[str, Any]
+    ) -> Optional[List[float]]:
+        if weights is not None and len(weights) != len(values.get("item_ids", [])):
+            raise ValueError("weights must be given for all items")
+        return weights
+
+    class Config:
+        schema_extra = {"example": {"item_ids": [12173, 15297], "weights": [3, 1]}}
+
+
+class BatchRecoResponse(BaseModel):
+    recos: List[RecoResponse] = Field(..., title="Recos")
+
+
+class ReloadResponse(BaseModel):
+    model_name: str = Field(..., title="Model Name")
+    previous_versions: int = Field(..., title="Previous Versions Available For Rollback")
+
+
 class HealthResponse(BaseModel):
     health: str = Field(..., title="Health")
 
@@ -59,3 +91,19 @@ class HTTPValidationError(BaseModel):
 class ExplainResponse(BaseModel):
     p: int
     explanation: str
+
+
+class BatchExplainRequest(BaseModel):
+    item_ids: Optional[List[int]] = Field(None, title="Item Ids")
+
+    class Config:
+        schema_extra = {"example": {"item_ids": [12173, 15297]}}
+
+
+class ItemExplainResponse(ExplainResponse):
+    item_id: int = Field(..., title="Item Id")
+
+
+class BatchExplainResponse(BaseModel):
+    user_id: int = Field(..., title="User Id")
+    explanations: List[ItemExplainResponse] = Field(..., title="Explanations")
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..prometheus import DEGRADED_RESPONSES, IN_FLIGHT_REQUESTS
+from ..settings import AdmissionConfig
+
+controllers: Dict[str, "AdmissionController"] = {}
+
+
+class AdmissionController:
+    """Sheds model calls to a cheap fallback when the model is overloaded.
+
+    A call is shed when too many calls are in flight or the moving average
+    of recent latencies exceeds the budget. A call is still admitted when
+    nothing is in flight, so the average recovers after a spike. Admitted
+    calls slower than the timeout are answered by the fallback too,
+    but keep running (and their results are cached).
+    All state is changed only from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        latency_budget: float,
+        timeout: float,
+        max_in_flight: int,
+        ewma_alpha: float,
+    ) -> None:
+        self.model_name = model_name
+        self.latency_budget = latency_budget
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.ewma_alpha = ewma_alpha
+        self.in_flight = 0
+        self.latency = 0.0
+
+    def is_overloaded(self) -> bool:
+        if self.in_flight == 0:
+            return False
+        return self.in_flight >= self.max_in_flight or self.latency > self.latency_budget
+
+    async def run(
+        self,
+        compute: Callable[[], Awaitable[Any]],
+        fallback: Callable[[], Optional[Any]],
+    ) -> Tuple[Any, bool]:
+        """Get result of `compute` or of `fallback` under overload
+        and whether the result is degraded"""
+        if self.is_overloaded():
+            result = fallback()
+            if result is not None:
+                DEGRADED_RESPONSES.labels(model_name=self.model_name, reason="overload").inc()
+                return result, True
+
+        task = asyncio.ensure_future(compute())
+        self._track(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout), False
+        except asyncio.TimeoutError:
+            result = fallback()
+            if result is None:
+                return await task, False
+
+        DEGRADED_RESPONSES.labels(model_name=self.model_name, reason="timeout").inc()
+        return result, True
+
+    def _track(self, task: asyncio.Future) -> None:
+        self.in_flight += 1
+        IN_FLIGHT_REQUESTS.labels(model_name=self.model_name).inc()
+        started_at = time.perf_counter()
+
+        def on_done(future: asyncio.Future) -> None:
+            self.in_flight -= 1
+            IN_FLIGHT_REQUESTS.labels(model_name=self.model_name).dec()
+            latency = time.perf_counter() - started_at
+            self.latency += self.ewma_alpha * (latency - self.latency)
+            # Errors of abandoned calls are not reported as never retrieved
+            if not future.cancelled():
+                future.exception()
+
+        task.add_done_callback(on_done)
+
+
+def get_admission_controller(model_name: str, config: AdmissionConfig) -> AdmissionController:
+    controller = controllers.get(model_name)
+    if controller is None:
+        controller = AdmissionController(
+            model_name,
+            config.latency_budget_ms / 1000,
+            config.timeout_ms / 1000,
+            config.max_in_flight,
+            config.ewma_alpha,
+        )
+        controllers[model_name] = controller
+
+    return controller
@@ -1,84 +1,288 @@
 # mypy: disable-error-code="misc"
 # pylint: disable=too-many-instance-attributes
 import os
-from typing import Any, List, Tuple
+from typing import Any, List, Optional, Sequence, Tuple
 
 import joblib
+import numpy as np
 from rectools.models import ImplicitALSWrapperModel
+from scipy import sparse
 
+from ..api.exceptions import ItemNotFoundError
+from ..log import app_logger
+from ..prometheus import observe_stage
+from ..response import PreEncodedList
 from ..settings import ServiceConfig
+from .als_explainer import ALSExplainer
+from .artifacts import ALSArtifacts, get_model_signature, load_als_artifacts
 from .base import BaseRecommender
+from .cold import ColdSegments, load_cold_segments
+from .fold_in import FoldedInUser, FoldInOverlay
+from .id_index import MISSING_ID, IdIndex
+from .retrieval import load_index
+from .topk import load_top_k_table
 from .utils import get_cold_user_predictions_from_offline, get_data_with_features
 
+SCORING_CHUNK_SIZE = 1_000
+
 
 class ALSRecommender(BaseRecommender):
     """Recommender based on Implicit ALS
-    with nmslib ANN (online realization)"""
-
-    def __init__(self, global_cfg: ServiceConfig) -> None:
-        super().__init__(global_cfg)
-        # Loading dataset with features and list of non-cold users
-        self.dataset, self._users = get_data_with_features(
-            self.model_cfg["als"]["interactions"],
-            self.model_cfg["als"]["users_features"],
-            self.model_cfg["als"]["items_features"],
-            global_cfg,
-        )
+    with precomputed top k table or online retrieval (brute force or IVF)"""
+
+    default_name = "als"
+
+    def __init__(self, global_cfg: ServiceConfig, name: Optional[str] = None) -> None:
+        super().__init__(global_cfg, name)
         # Loading recommendations for cold users
-        self.cold_dataset = get_cold_user_predictions_from_offline(self.model_cfg["als"]["cold_dataset"], global_cfg)
+        self.cold_dataset = get_cold_user_predictions_from_offline(self.model_cfg["cold_dataset"], global_cfg)
+        self.cold_reco = PreEncodedList(self.cold_dataset.item_id.to_list())
+        # Cold users with known demographics get lists of their segment
+        self.cold_segments: Optional[ColdSegments] = self.load_cold_segments(global_cfg)
+        self.segment_recos: List[PreEncodedList] = []
+        if self.cold_segments is not None:
+            self.segment_recos = [PreEncodedList(row[row >= 0].tolist()) for row in self.cold_segments.items]
 
-        self.user_ext_to_int_map = self.dataset.user_id_map.to_internal.to_dict()
-        self.item_int_to_ext_map = self.dataset.item_id_map.to_external.to_dict()
-        self.item_ext_to_int_map = self.dataset.item_id_map.to_internal.to_dict()
-        self.ui_csr = self.dataset.get_user_item_matrix()
+        self.model: ImplicitALSWrapperModel
+        # Artifacts and top k table built from another model are not used
+        self.model_signature = get_model_signature(
+            os.path.join(global_cfg.predictors_path, self.model_cfg["model_filename"])
+        )
+        artifacts = self.load_artifacts(global_cfg)
+        if artifacts is not None:
+            # Memory-mapped artifacts share the same pages between workers
+            self._users, self.items, self.ui_csr, self.model, _ = artifacts
+        else:
+            # Loading dataset with features and list of non-cold users
+            dataset, self._users = get_data_with_features(
+                self.model_cfg["interactions"],
+                self.model_cfg["users_features"],
+                self.model_cfg["items_features"],
+                global_cfg,
+            )
+            self.items = IdIndex(dataset.item_id_map.external_ids)
+            self.ui_csr = dataset.get_user_item_matrix()
+            self.model = self.load_model(global_cfg)
 
-        self.model: ImplicitALSWrapperModel = self.load_model(global_cfg)
+        # Engine for online scoring of warm users
+        self.index = load_index(
+            self.model_cfg.get("retrieval"),
+            self.model.model.item_factors,
+            global_cfg.predictors_path,
+        )
+        self.explainer = ALSExplainer(
+            self.model.model.item_factors,
+            self.ui_csr,
+            self.model.model.regularization,
+            self.model_cfg.get("explain_cache_size", 1_000),
+        )
+        # Loading precomputed recommendations for warm users (if built)
+        self.top_k_table: Optional[np.ndarray] = self.load_top_k_table(global_cfg)
+        # Factors of users solved online, used instead of the model's ones
+        self.fold_in_overlay = FoldInOverlay(self.model_cfg.get("fold_in_max_users", 10_000))
 
     def load_model(self, global_cfg: ServiceConfig) -> Any:
         # Loading base pretrained ALS models
-        base_model = joblib.load(os.path.join(global_cfg.predictors_path, self.model_cfg["als"]["model_filename"]))
+        base_model = joblib.load(os.path.join(global_cfg.predictors_path, self.model_cfg["model_filename"]))
 
         return base_model
 
+    def load_artifacts(self, global_cfg: ServiceConfig) -> Optional[ALSArtifacts]:
+        artifacts_name = self.model_cfg.get("artifacts")
+        if artifacts_name is None:
+            return None
+
+        artifacts_path = os.path.join(global_cfg.predictors_path, artifacts_name)
+        if not os.path.isdir(artifacts_path):
+            app_logger.warning(f"ALS artifacts {artifacts_path} not found, ALS will be loaded from dataset")
+            return None
+
+        artifacts = load_als_artifacts(artifacts_path)
+        if artifacts.model_signature != self.model_signature:
+            app_logger.error(f"ALS artifacts {artifacts_path} were built from another model, loading ALS from dataset")
+            return None
+
+        return artifacts
+
+    def load_cold_segments(self, global_cfg: ServiceConfig) -> Optional[ColdSegments]:
+        segments_name = self.model_cfg.get("cold_segments")
+        if segments_name is None:
+            return None
+
+        segments_path = os.path.join(global_cfg.predictors_path, segments_name)
+        if not os.path.isdir(segments_path):
+            app_logger.warning(f"Cold segments {segments_path} not found, cold users get global recommendations")
+            return None
+
+        return load_cold_segments(segments_path)
+
+    def load_top_k_table(self, global_cfg: ServiceConfig) -> Optional[np.ndarray]:
+        table_name = self.model_cfg.get("top_k_table")
+        if table_name is None:
+            return None
+
+        table_path = os.path.join(global_cfg.predictors_path, table_name)
+        if not os.path.isdir(table_path):
+            app_logger.warning(f"Top k table {table_path} not found, ALS will score users online")
+            return None
+
+        table, table_users, model_signature = load_top_k_table(table_path)
+        if model_signature != self.model_signature:
+            app_logger.error(f"Top k table {table_path} is built from another model, ALS will score users online")
+            return None
+        # Table rows must be ordered as internal user ids of the dataset
+        if not np.array_equal(table_users, self._users.external_ids) or table.shape[1] < self.k_recs:
+            app_logger.warning(f"Top k table {table_path} is stale, ALS will score users online")
+            return None
+
+        return table[:, : self.k_recs]
+
     def recommend(self, user_id: int) -> List:
-        if user_id in self._users:
-            int_user_id = self.user_ext_to_int_map[user_id]
-            rec = self.model.model.recommend(
-                int_user_id,
-                user_items=self.ui_csr,
-                N=10,
-                filter_already_liked_items=True,
-            )
-            reco = [self.item_int_to_ext_map[item_int_id] for (item_int_id, _) in rec]
+        folded_in = self.fold_in_overlay.get(user_id)
+        if folded_in is not None:
+            return self._recommend_folded_in(folded_in)
+
+        with observe_stage(self.name, "id_mapping"):
+            int_user_id = self._users.get(user_id)
+
+        if int_user_id != MISSING_ID:
+            if self.top_k_table is not None:
+                with observe_stage(self.name, "scoring"):
+                    row = self.top_k_table[int_user_id]
+                    reco = row[row >= 0].tolist()
+            else:
+                with observe_stage(self.name, "scoring"):
+                    row = self._score_warm_users(np.array([int_user_id]))[0]
+                with observe_stage(self.name, "id_mapping"):
+                    reco = self.items.to_external(row[row >= 0]).tolist()
         else:
-            reco = self.cold_dataset.item_id.to_list()
+            reco = self.get_cold_recos([user_id])[0]
 
         return reco
 
-    def explain_reco(self, user_id: int, item_id: int) -> Tuple[float, List]:
-        item_id = self.item_ext_to_int_map[item_id]
-        user_id = self.user_ext_to_int_map[user_id]
-
-        item_score, top_contributors, _ = self.model.model.explain(
-            userid=user_id,
-            user_items=self.ui_csr[: user_id + 1, :],
-            itemid=item_id,
-            N=1,
-        )
+    def recommend_batch(self, user_ids: Sequence[int]) -> List[List]:
+        with observe_stage(self.name, "id_mapping"):
+            int_user_ids = self._users.to_internal(user_ids)
+            warm_positions = np.flatnonzero(int_user_ids != MISSING_ID)
+            warm_int_user_ids = int_user_ids[warm_positions]
+
+        with observe_stage(self.name, "scoring"):
+            if self.top_k_table is not None:
+                warm_reco = self.top_k_table[warm_int_user_ids]
+            else:
+                warm_reco = self._score_warm_users(warm_int_user_ids)
 
-        top_contributor = self.item_int_to_ext_map[top_contributors[0][0]]
+        with observe_stage(self.name, "id_mapping"):
+            if self.top_k_table is None:
+                found = warm_reco >= 0
+                warm_reco[found] = self.items.to_external(warm_reco[found])
+
+            recos: List[List] = [self.cold_reco] * len(int_user_ids)
+            cold_positions = np.flatnonzero(int_user_ids == MISSING_ID)
+            cold_recos = self.get_cold_recos([user_ids[position] for position in cold_positions])
+            for position, cold_reco in zip(cold_positions, cold_recos):
+                recos[position] = cold_reco
+            for position, row in zip(warm_positions, warm_reco):
+                recos[position] = row[row >= 0].tolist()
+
+        if len(self.fold_in_overlay):
+            for position, user_id in enumerate(user_ids):
+                folded_in = self.fold_in_overlay.get(user_id)
+                if folded_in is not None:
+                    recos[position] = self._recommend_folded_in(folded_in)
+
+        return recos
+
+    def fold_in(self, user_id: int, item_ids: Sequence[int], weights: Sequence[float]) -> None:
+        int_item_ids = self.items.to_internal(item_ids)
+        unknown = np.flatnonzero(int_item_ids == MISSING_ID)
+        if len(unknown):
+            raise ItemNotFoundError(error_message=f"Item {item_ids[unknown[0]]} not found")
+        confidences: np.ndarray = np.asarray(weights, dtype=np.float32)
+
+        # Recent interactions of a warm user are added to the known ones
+        int_user_id = self._users.get(user_id)
+        if int_user_id != MISSING_ID:
+            known_ids, known_confidences = self.explainer.user_items(int_user_id)
+            int_item_ids = np.concatenate([known_ids, int_item_ids])
+            confidences = np.concatenate([known_confidences, confidences])
+        int_item_ids, positions = np.unique(int_item_ids, return_inverse=True)
+        confidences = np.bincount(positions, weights=confidences).astype(np.float32)
+
+        with observe_stage(self.name, "fold_in"):
+            factors = self.explainer.solve_user(int_item_ids, confidences)
+        self.fold_in_overlay.put(user_id, factors, int_item_ids, confidences)
+
+    def user_version(self, user_id: int) -> int:
+        folded_in = self.fold_in_overlay.get(user_id)
+        return 0 if folded_in is None else folded_in.version
+
+    def is_warm(self, user_id: int) -> bool:
+        return user_id in self.fold_in_overlay or user_id in self._users
+
+    def _recommend_folded_in(self, folded_in: FoldedInUser) -> List:
+        with observe_stage(self.name, "scoring"):
+            viewed = sparse.csr_matrix(
+                (folded_in.confidences, folded_in.item_ids, [0, len(folded_in.item_ids)]),
+                shape=(1, len(self.items)),
+            )
+            row = self.index.search(folded_in.factors[np.newaxis], self.k_recs, viewed)[0]
+
+        return self.items.to_external(row[row >= 0]).tolist()
+
+    def get_cold_recos(self, user_ids: Sequence[int]) -> List[List]:
+        """Recommendations of users segments or global ones"""
+        if self.cold_segments is None:
+            return [self.cold_reco] * len(user_ids)
+
+        segments = self.cold_segments.segment_of(user_ids)
+        return [self.cold_reco if segment == MISSING_ID else self.segment_recos[segment] for segment in segments]
+
+    def fallback_recommend(self, user_id: int) -> Optional[List]:
+        # Popular items of the user's segment
+        return self.get_cold_recos([user_id])[0]
+
+    def _score_warm_users(self, int_user_ids: np.ndarray) -> np.ndarray:
+        # Get (n_users, k) internal item ids, users are scored by chunks
+        reco = np.full((len(int_user_ids), self.k_recs), -1, dtype=np.int32)
+        for start in range(0, len(int_user_ids), SCORING_CHUNK_SIZE):
+            chunk = int_user_ids[start : start + SCORING_CHUNK_SIZE]
+            reco[start : start + len(chunk)] = self.index.search(
+                self.model.model.user_factors[chunk],
+                self.k_recs,
+                self.ui_csr[chunk],
+            )
+
+        return reco
+
+    def explain_reco(self, user_id: int, item_id: int) -> Tuple[float, List]:
+        item_score, top_contributor = self.explain_reco_batch(user_id, [item_id])[0]
 
         return item_score, top_contributor
 
+    def explain_reco_batch(self, user_id: int, item_ids: Sequence[int]) -> List[Tuple[float, Any]]:
+        int_item_ids = [self.items[item_id] for item_id in item_ids]
+        folded_in = self.fold_in_overlay.get(user_id)
+        if folded_in is not None:
+            scores, top_contributors = self.explainer.explain_interactions(
+                self.explainer.factorize(folded_in.item_ids, folded_in.confidences),
+                folded_in.item_ids,
+                folded_in.confidences,
+                int_item_ids,
+            )
+        else:
+            scores, top_contributors = self.explainer.explain(self._users[user_id], int_item_ids)
+
+        return [
+            (float(score), None if contributor == MISSING_ID else self.items.to_external(contributor).item())
+            for score, contributor in zip(scores, top_contributors)
+        ]
+
     @property
-    def users(self):
+    def users(self) -> IdIndex:
         # Return model's hot users
         return self._users
 
     def __repr__(self) -> str:
-        return f"""{type(self).__name__}(model={self.model_cfg["als"]["model_filename"]},
-                    dataset={self.model_cfg["als"]["dataset"]})"""
-
-
-def get_als_predictor(global_cfg: ServiceConfig) -> BaseRecommender:
-    return ALSRecommender(global_cfg)
+        return f"""{type(self).__name__}(model={self.model_cfg["model_filename"]},
+                    dataset={self.model_cfg["interactions"]})"""
@@ -0,0 +1,81 @@
+from functools import lru_cache
+from typing import Any, Tuple
+
+import numpy as np
+from scipy import linalg, sparse
+
+from .id_index import MISSING_ID
+
+
+class ALSExplainer:
+    """Explanations of ALS scores (section 5 of "Collaborative Filtering
+    for Implicit Feedback Datasets") with cached per-user factorizations"""
+
+    def __init__(
+        self,
+        item_factors: np.ndarray,
+        ui_csr: sparse.csr_matrix,
+        regularization: float,
+        cache_size: int = 1_000,
+    ) -> None:
+        self.item_factors = item_factors
+        self.ui_csr = ui_csr
+        # YtY + regularization * I is the same for all users
+        factors = np.asarray(item_factors, dtype=np.float64)
+        self.gram: np.ndarray = factors.T @ factors + regularization * np.eye(factors.shape[1])
+        # Cholesky factorization of YtCuY + regularization * I of recent users
+        self._user_weights = lru_cache(maxsize=cache_size)(self._factorize)
+
+    def user_items(self, user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Internal ids and confidences of items of internal `user_id`"""
+        # Views of a single CSR row, the matrix itself is never copied
+        start, stop = self.ui_csr.indptr[user_id], self.ui_csr.indptr[user_id + 1]
+        return self.ui_csr.indices[start:stop], self.ui_csr.data[start:stop]
+
+    def _factorize(self, user_id: int) -> Any:
+        return self.factorize(*self.user_items(user_id))
+
+    def factorize(self, item_ids: np.ndarray, confidences: np.ndarray) -> Any:
+        """Cholesky factorization of YtCuY + regularization * I
+        of a user with given interactions"""
+        liked_factors = np.asarray(self.item_factors[item_ids], dtype=np.float64)
+        weights = np.abs(confidences) - 1
+        return linalg.cho_factor(self.gram + (liked_factors.T * weights) @ liked_factors)
+
+    def solve_user(self, item_ids: np.ndarray, confidences: np.ndarray) -> np.ndarray:
+        """Factors of a user with given interactions:
+        one regularized least squares step of ALS"""
+        positive = confidences > 0
+        target = self.item_factors[item_ids[positive]].T @ confidences[positive]
+        return linalg.cho_solve(self.factorize(item_ids, confidences), target).astype(np.float32)
+
+    def explain(self, user_id: int, item_ids: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """Get scores of internal `item_ids` for internal `user_id`
+        and the liked item contributing most to each score (-1 if none)"""
+        return self.explain_interactions(self._user_weights(user_id), *self.user_items(user_id), item_ids)
+
+    def explain_interactions(
+        self,
+        user_weights: Any,
+        liked_ids: np.ndarray,
+        confidences: np.ndarray,
+        item_ids: Any,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Same as `explain` for a user given by interactions
+        and their factorization"""
+        item_ids = np.asarray(item_ids)
+        positive = confidences >= 0
+        liked_ids, confidences = liked_ids[positive], confidences[positive]
+
+        # y_i^T W^u for all explained items at once
+        weighted_items = linalg.cho_solve(user_weights, self.item_factors[item_ids].T)
+        # contributions[j, i] = (y_i^T W^u) y_j * c_uj
+        contributions = (self.item_factors[liked_ids] @ weighted_items) * confidences[:, np.newaxis]
+
+        scores = contributions.sum(axis=0)
+        if len(liked_ids):
+            top_contributors = liked_ids[contributions.argmax(axis=0)]
+        else:
+            top_contributors = np.full(len(item_ids), MISSING_ID)
+
+        return scores, top_contributors
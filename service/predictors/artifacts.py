@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import shutil
+from functools import partial
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from implicit.als import AlternatingLeastSquares
+from rectools.models import ImplicitALSWrapperModel
+from scipy import sparse
+
+from .id_index import IdIndex
+
+PARAMS_FILENAME = "params.json"
+ID_INDEX_ARRAYS_NAMES = {
+    entity: (f"{entity}_ids", f"{entity}_ids_sorted", f"{entity}_ids_order") for entity in ("user", "item")
+}
+
+
+class ALSArtifacts(NamedTuple):
+    users: IdIndex
+    items: IdIndex
+    ui_csr: sparse.csr_matrix
+    model: ImplicitALSWrapperModel
+    # Signature of the model file the artifacts were exported from
+    model_signature: Optional[str] = None
+
+
+def get_model_signature(path: str) -> str:
+    """Get hash of the model file, artifacts built from it keep the hash"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(partial(f.read, 1024**2), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def save_arrays(path: str, arrays: Dict[str, np.ndarray], params: Dict[str, Any]) -> None:
+    """Save arrays as .npy files (and params as json) to the directory.
+
+    Files are written to a temporary directory which then replaces the old one,
+    so processes which memory-mapped previous files keep reading them safely.
+    """
+    tmp_path = f"{path}.tmp"
+    old_path = f"{path}.old"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(tmp_path, PARAMS_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(params, f)
+
+    if os.path.isdir(path):
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def load_arrays(path: str, names: Sequence[str]) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Load memory-mapped arrays (and params) saved by `save_arrays`"""
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in names}
+    with open(os.path.join(path, PARAMS_FILENAME), encoding="utf-8") as f:
+        params = json.load(f)
+
+    return arrays, params
+
+
+def export_als_artifacts(
+    path: str,
+    model: AlternatingLeastSquares,
+    ui_csr: sparse.csr_matrix,
+    users: IdIndex,
+    items: IdIndex,
+    model_signature: str,
+) -> None:
+    """Export ALS factors, interactions matrix and id arrays"""
+    # scipy keeps int32 indices as is, so the matrix is not copied on load
+    index_dtype = np.int32 if ui_csr.nnz < np.iinfo(np.int32).max else np.int64
+    arrays = {
+        "user_factors": np.asarray(model.user_factors, dtype=np.float32),
+        "item_factors": np.asarray(model.item_factors, dtype=np.float32),
+        "ui_indptr": ui_csr.indptr.astype(index_dtype),
+        "ui_indices": ui_csr.indices.astype(index_dtype),
+        "ui_data": ui_csr.data.astype(np.float32),
+        **_id_index_arrays("user", users),
+        **_id_index_arrays("item", items),
+    }
+    params = {
+        "factors": int(model.factors),
+        "regularization": float(model.regularization),
+        "model_signature": model_signature,
+    }
+    save_arrays(path, arrays, params)
+
+
+def _id_index_arrays(entity: str, index: IdIndex) -> Dict[str, np.ndarray]:
+    return dict(zip(ID_INDEX_ARRAYS_NAMES[entity], index.to_arrays()))
+
+
+def load_als_artifacts(path: str) -> ALSArtifacts:
+    """Open ALS artifacts without copying them into process memory"""
+    arrays, params = load_arrays(
+        path,
+        (
+            "user_factors",
+            "item_factors",
+            "ui_indptr",
+            "ui_indices",
+            "ui_data",
+            *ID_INDEX_ARRAYS_NAMES["user"],
+            *ID_INDEX_ARRAYS_NAMES["item"],
+        ),
+    )
+    users = IdIndex(*(arrays[name] for name in ID_INDEX_ARRAYS_NAMES["user"]))
+    items = IdIndex(*(arrays[name] for name in ID_INDEX_ARRAYS_NAMES["item"]))
+    ui_csr = sparse.csr_matrix(
+        (arrays["ui_data"], arrays["ui_indices"], arrays["ui_indptr"]),
+        shape=(len(users), len(items)),
+        copy=False,
+    )
+
+    als = AlternatingLeastSquares(factors=params["factors"], regularization=params["regularization"])
+    als.user_factors = arrays["user_factors"]
+    als.item_factors = arrays["item_factors"]
+    model = ImplicitALSWrapperModel(als)
+    model.model = als
+    model.is_fitted = True
+
+    return ALSArtifacts(users, items, ui_csr, model, params.get("model_signature"))
@@ -1,18 +1,26 @@
 # mypy: disable-error-code="misc"
 # pylint: disable=no-method-argument
 from abc import ABC, abstractmethod
-from typing import Any, List, Tuple
+from typing import Any, List, Optional, Sequence, Tuple
 
 from ..settings import ServiceConfig
+from .id_index import IdIndex
+from .retrieval import TopKIndex
 from .utils import get_predictors_config
 
 
 class BaseRecommender(ABC):
-    def __init__(self, global_cfg: ServiceConfig) -> None:
+    # Section of predictors config used when model name isn't given
+    default_name = ""
+
+    def __init__(self, global_cfg: ServiceConfig, name: Optional[str] = None) -> None:
         super().__init__()
+        self.name = name or self.default_name
         self.k_recs = global_cfg.k_recs
-        self.model_cfg = get_predictors_config(global_cfg)
-        self._users: List[int] = []
+        self.model_cfg = get_predictors_config(global_cfg)[self.name]
+        self._users = IdIndex([])
+        # Top k retrieval engine for models scoring users by item vectors
+        self.index: Optional[TopKIndex] = None
 
     @abstractmethod
     def load_model(self, global_cfg: ServiceConfig) -> Any:
@@ -22,10 +30,37 @@ class BaseRecommender(ABC):
     def recommend(self, user_id: int) -> List:
         raise NotImplementedError()
 
+    def recommend_batch(self, user_ids: Sequence[int]) -> List[List]:
+        # Models able to score many users at once should override it
+        return [self.recommend(user_id) for user_id in user_ids]
+
+    def fallback_recommend(self, user_id: int) -> Optional[List]:
+        """Cheap recommendations served when the model is overloaded"""
+        return None
+
+    def fold_in(self, user_id: int, item_ids: Sequence[int], weights: Sequence[float]) -> None:
+        """Update the user by recent interactions without retraining"""
+        raise NotImplementedError()
+
+    def user_version(self, user_id: int) -> int:
+        # Changes when the user is folded in, results are cached by it
+        return 0
+
     @abstractmethod
     def explain_reco(self, user_id: int, item_id: int) -> Tuple[float, List]:
         raise NotImplementedError()
 
+    def explain_reco_batch(self, user_id: int, item_ids: Sequence[int]) -> List[Tuple[float, Any]]:
+        # Models able to explain many items at once should override it
+        return [self.explain_reco(user_id, item_id) for item_id in item_ids]
+
     @property
-    def users(self) -> List:
+    def users(self) -> IdIndex:
         raise NotImplementedError()
+
+    def is_warm(self, user_id: int) -> bool:
+        # Models without known users treat everyone as cold
+        try:
+            return user_id in self.users
+        except NotImplementedError:
+            return False
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..settings import BatchingConfig
+from .constructor import get_predictor_async
+
+batchers: Dict[str, "RecoBatcher"] = {}
+
+
+class RecoBatcher:
+    """Collects concurrent single user requests to a model
+    and scores them with one `recommend_batch` call on the executor"""
+
+    def __init__(self, model_name: str, max_batch_size: int, max_wait: float) -> None:
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[int, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def recommend(self, user_id: int) -> List:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((user_id, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        # Keep reference to the task until it is done
+        task = asyncio.get_running_loop().create_task(self._score(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, batch: List[Tuple[int, asyncio.Future]]) -> None:
+        user_ids = [user_id for user_id, _ in batch]
+        try:
+            # Model is taken at flush time to pick up replaced predictors,
+            # lazy one is loaded on the executor
+            model = await get_predictor_async(self.model_name)
+            recos = await asyncio.get_running_loop().run_in_executor(None, model.recommend_batch, user_ids)
+        except Exception as e:  # pylint: disable=W0703
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), reco in zip(batch, recos):
+            # Future is already done if request was cancelled
+            if not future.done():
+                future.set_result(reco)
+
+
+def get_batcher(model_name: str, config: BatchingConfig) -> RecoBatcher:
+    batcher = batchers.get(model_name)
+    if batcher is None:
+        batcher = RecoBatcher(model_name, config.max_batch_size, config.max_wait_ms / 1000)
+        batchers[model_name] = batcher
+
+    return batcher
@@ -0,0 +1,160 @@
+"""Offline builders of predictors artifacts
+
+Usage:
+    python -m service.predictors.build als-artifacts
+    python -m service.predictors.build top-k [--chunk-size N]
+    python -m service.predictors.build als-ivf [--n-lists N]
+    python -m service.predictors.build ivf-benchmark [--n-probe N ...]
+    python -m service.predictors.build cold-segments [--algorithm A]
+
+Paths are taken from the same environment variables as the service uses.
+"""
+import argparse
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import joblib
+import pandas as pd
+
+from ..log import app_logger, setup_logging
+from ..settings import ServiceConfig, get_config
+from .als import ALSRecommender
+from .artifacts import export_als_artifacts, get_model_signature
+from .cold import COLD_ALGORITHMS, build_cold_segments, save_cold_segments
+from .id_index import IdIndex
+from .retrieval import IVFIndex, evaluate_recall
+from .topk import build_top_k_table, save_top_k_table
+from .utils import get_data_with_features, get_predictors_config
+
+
+def build_als_top_k(config: ServiceConfig, chunk_size: int) -> str:
+    """Precompute top k recommendations for all warm users of ALS"""
+    recommender = ALSRecommender(config)
+    model = recommender.model.model
+
+    table = build_top_k_table(
+        model.user_factors,
+        model.item_factors,
+        recommender.ui_csr,
+        recommender.items.external_ids,
+        recommender.k_recs,
+        chunk_size,
+    )
+
+    path = os.path.join(config.predictors_path, recommender.model_cfg["top_k_table"])
+    save_top_k_table(path, table, recommender.users.external_ids, recommender.model_signature)
+
+    return path
+
+
+def build_als_artifacts(config: ServiceConfig) -> str:
+    """Export ALS model and its data to memory-mappable arrays,
+    previous artifacts are never read, so a new model is exported"""
+    model_cfg = get_predictors_config(config)["als"]
+    dataset, users = get_data_with_features(
+        model_cfg["interactions"],
+        model_cfg["users_features"],
+        model_cfg["items_features"],
+        config,
+    )
+    model_path = os.path.join(config.predictors_path, model_cfg["model_filename"])
+    model = joblib.load(model_path)
+    items = IdIndex(dataset.item_id_map.external_ids)
+
+    path = os.path.join(config.predictors_path, model_cfg["artifacts"])
+    ui_csr = dataset.get_user_item_matrix()
+    export_als_artifacts(path, model.model, ui_csr, users, items, get_model_signature(model_path))
+
+    return path
+
+
+def build_als_ivf(config: ServiceConfig, n_lists: int) -> str:
+    """Build IVF retrieval index over ALS item factors"""
+    recommender = ALSRecommender(config)
+    index = IVFIndex.build(recommender.model.model.item_factors, n_lists)
+
+    path = os.path.join(config.predictors_path, recommender.model_cfg["retrieval"]["index"])
+    index.save(path)
+
+    return path
+
+
+def benchmark_als_ivf(config: ServiceConfig, n_probes: Sequence[int], n_users: int) -> List[Dict[str, Any]]:
+    """Measure recall@k and latency of IVF index for several n_probe values"""
+    recommender = ALSRecommender(config)
+    model = recommender.model.model
+    path = os.path.join(config.predictors_path, recommender.model_cfg["retrieval"]["index"])
+    n_users = min(n_users, model.user_factors.shape[0])
+
+    results = []
+    for n_probe in n_probes:
+        index = IVFIndex.load(path, model.item_factors, n_probe)
+        stats = evaluate_recall(index, model.user_factors[:n_users], recommender.k_recs, recommender.ui_csr[:n_users])
+        result: Dict[str, Any] = {"n_probe": n_probe}
+        result.update(stats)
+        results.append(result)
+
+    return results
+
+
+def build_als_cold_segments(config: ServiceConfig, algorithm: str, min_segment_users: int) -> str:
+    """Precompute recommendations for demographic segments of cold users"""
+    model_cfg = get_predictors_config(config)["als"]
+    interactions = pd.read_csv(
+        os.path.join(config.dataset_path, model_cfg["interactions"]), usecols=["user_id", "item_id"]
+    )
+    users_features = pd.read_csv(os.path.join(config.dataset_path, model_cfg["users_features"]))
+
+    segments = build_cold_segments(interactions, users_features, config.k_recs, algorithm, min_segment_users)
+    app_logger.info(f"Built recommendations for {len(segments.names)} segments of {len(segments.users)} users")
+
+    path = os.path.join(config.predictors_path, model_cfg["cold_segments"])
+    save_cold_segments(path, segments)
+
+    return path
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build predictors artifacts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("als-artifacts", help="Export ALS model to memory-mappable arrays")
+
+    top_k_parser = subparsers.add_parser("top-k", help="Precompute top k table for warm ALS users")
+    top_k_parser.add_argument("--chunk-size", type=int, default=10_000, help="Users scored at once")
+
+    ivf_parser = subparsers.add_parser("als-ivf", help="Build IVF retrieval index over ALS item factors")
+    ivf_parser.add_argument("--n-lists", type=int, default=256, help="Number of item clusters")
+
+    benchmark_parser = subparsers.add_parser("ivf-benchmark", help="Measure recall and latency of IVF index")
+    benchmark_parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 8, 16], help="Clusters to scan")
+    benchmark_parser.add_argument("--n-users", type=int, default=1_000, help="Users to evaluate")
+
+    cold_parser = subparsers.add_parser("cold-segments", help="Precompute cold recommendations by segments")
+    cold_parser.add_argument("--algorithm", choices=COLD_ALGORITHMS, default="coverage", help="Items selection")
+    cold_parser.add_argument("--min-segment-users", type=int, default=100, help="Smaller segments are dropped")
+
+    args = parser.parse_args(argv)
+    config = get_config()
+    setup_logging(config)
+
+    if args.command == "als-artifacts":
+        path = build_als_artifacts(config)
+        app_logger.info(f"ALS artifacts saved to {path}")
+    elif args.command == "top-k":
+        path = build_als_top_k(config, args.chunk_size)
+        app_logger.info(f"Top k table saved to {path}")
+    elif args.command == "als-ivf":
+        path = build_als_ivf(config, args.n_lists)
+        app_logger.info(f"IVF index saved to {path}")
+    elif args.command == "ivf-benchmark":
+        for result in benchmark_als_ivf(config, args.n_probe, args.n_users):
+            print(json.dumps(result))
+    elif args.command == "cold-segments":
+        path = build_als_cold_segments(config, args.algorithm, args.min_segment_users)
+        app_logger.info(f"Cold segments saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from ..prometheus import CACHE_EVICTIONS, CACHE_HITS, CACHE_MISSES
+from ..settings import CacheConfig
+from .utils import estimate_memory_usage
+
+caches: Dict[str, "ResultCache"] = {}
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    size: int
+    expires_at: float
+
+
+class ResultCache:  # pylint: disable=too-many-instance-attributes
+    """LRU cache of model results with TTL and memory cap.
+
+    Concurrent misses of the same key wait for one computation.
+    `invalidate` drops all entries, results of computations started
+    before it are returned to their callers but are not cached.
+    """
+
+    def __init__(self, model_name: str, max_entries: int, max_memory: int, ttl: float) -> None:
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+        self.ttl = ttl
+        self.memory_usage = 0
+        self._entries: "OrderedDict[Tuple[int, Hashable], CacheEntry]" = OrderedDict()
+        self._in_flight: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self._generation = 0
+        # Entries are invalidated from predictors loading threads
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._get((self._generation, key)) is not None
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        full_key = (self._generation, key)
+        entry = self._get(full_key)
+        if entry is not None:
+            CACHE_HITS.labels(model_name=self.model_name).inc()
+            return entry.value
+
+        CACHE_MISSES.labels(model_name=self.model_name).inc()
+        computation = self._in_flight.get(full_key)
+        if computation is None:
+            # Computation is a separate task, so a cancelled request
+            # doesn't cancel it for other callers waiting for the key
+            computation = asyncio.ensure_future(compute())
+            self._in_flight[full_key] = computation
+            computation.add_done_callback(lambda future: self._on_computed(full_key, future))
+
+        return await asyncio.shield(computation)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.memory_usage = 0
+
+    def _get(self, full_key: Tuple[int, Hashable]) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._evict(full_key)
+                return None
+            self._entries.move_to_end(full_key)
+
+        return entry
+
+    def _on_computed(self, full_key: Tuple[int, Hashable], future: asyncio.Future) -> None:
+        self._in_flight.pop(full_key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        value = future.result()
+        entry = CacheEntry(value, estimate_memory_usage(value), time.monotonic() + self.ttl)
+        with self._lock:
+            if full_key[0] != self._generation or entry.size > self.max_memory:
+                return
+            self._entries[full_key] = entry
+            self.memory_usage += entry.size
+            while len(self._entries) > self.max_entries or self.memory_usage > self.max_memory:
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, full_key: Tuple[int, Hashable]) -> None:
+        entry = self._entries.pop(full_key)
+        self.memory_usage -= entry.size
+        CACHE_EVICTIONS.labels(model_name=self.model_name).inc()
+
+
+def get_cache(model_name: str, config: CacheConfig) -> ResultCache:
+    cache = caches.get(model_name)
+    if cache is None:
+        cache = ResultCache(model_name, config.max_entries, int(config.max_memory_mb * 1024**2), config.ttl_seconds)
+        caches[model_name] = cache
+
+    return cache
+
+
+def invalidate_cache(model_name: str) -> None:
+    """Drop cached results of the replaced predictor"""
+    cache = caches.get(model_name)
+    if cache is not None:
+        cache.invalidate()
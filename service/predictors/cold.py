@@ -0,0 +1,188 @@
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .artifacts import ID_INDEX_ARRAYS_NAMES, load_arrays, save_arrays
+from .id_index import MISSING_ID, IdIndex
+
+SEGMENT_FEATURES = ("sex", "age", "income")
+UNKNOWN_FEATURE_VALUE = "unknown"
+COLD_ALGORITHMS = ("coverage", "popularity")
+
+
+class ColdSegments(NamedTuple):
+    # Users with known features and their rows in `items`
+    users: IdIndex
+    user_segments: np.ndarray
+    # (n_segments, k) external item ids padded with -1
+    items: np.ndarray
+    names: List[str]
+
+    def segment_of(self, user_ids: Sequence[int]) -> np.ndarray:
+        """Vectorized lookup of users segments, -1 for unknown users"""
+        internal_ids = self.users.to_internal(user_ids)
+        segments = np.full(len(internal_ids), MISSING_ID, dtype=np.int64)
+        found = internal_ids != MISSING_ID
+        segments[found] = self.user_segments[internal_ids[found]]
+        return segments
+
+
+def segment_users(
+    users_features: pd.DataFrame,
+    features: Sequence[str] = SEGMENT_FEATURES,
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Split users by combination of demographic features values.
+
+    `users_features` has the long format of `prepared_featured_users_full`
+    (id, value, feature). Get user ids, their segment codes and names.
+    """
+    columns = {}
+    for feature in features:
+        values = users_features[users_features["feature"] == feature].drop_duplicates("id")
+        columns[feature] = values.set_index("id")["value"]
+    wide = pd.DataFrame(columns).fillna(UNKNOWN_FEATURE_VALUE).astype(str)
+    keys = wide[features[0]].str.cat([wide[feature] for feature in features[1:]], sep="|")
+    codes, names = pd.factorize(keys, sort=True)
+
+    return wide.index.to_numpy(dtype=np.int64), codes, list(names)
+
+
+def greedy_coverage(ui_csr: sparse.csr_matrix, segment_csr: sparse.csr_matrix, k: int) -> np.ndarray:
+    """Pick for every segment k items, each next item is the one watched
+    by most users of the segment who didn't watch any item picked before.
+
+    `ui_csr` is a binary (n_users, n_items) matrix, `segment_csr` is a binary
+    (n_segments, n_users) membership matrix. When all users are covered
+    the rest is filled by popularity. Get (n_segments, k) internal ids.
+    """
+    n_segments, n_users = segment_csr.shape
+    chosen = np.full((n_segments, k), MISSING_ID, dtype=np.int64)
+    if n_segments == 0:
+        return chosen
+
+    popularity_counts = (segment_csr @ ui_csr).toarray()
+    # Segment of every member user, users out of segments are never covered
+    segment_coo = segment_csr.tocoo()
+    user_segment = np.full(n_users, MISSING_ID, dtype=np.int64)
+    user_segment[segment_coo.col] = segment_coo.row
+
+    uncovered = np.ones(n_users, dtype=np.float32)
+    segment_rows = np.arange(n_segments)
+    for step in range(min(k, ui_csr.shape[1])):
+        # Counts of uncovered users of every segment for every item
+        counts = (segment_csr @ sparse.diags(uncovered) @ ui_csr).toarray()
+        fallback = popularity_counts.copy()
+        for previous in range(step):
+            picked = chosen[:, previous] != MISSING_ID
+            counts[segment_rows[picked], chosen[picked, previous]] = -1
+            fallback[segment_rows[picked], chosen[picked, previous]] = -1
+
+        use_fallback = counts.max(axis=1) <= 0
+        best = np.where(use_fallback, fallback.argmax(axis=1), counts.argmax(axis=1))
+        found = ~use_fallback | (fallback.max(axis=1) > 0)
+        chosen[found, step] = best[found]
+
+        # Users who watched the item picked for their segment are covered
+        user_items = np.where(user_segment != MISSING_ID, chosen[user_segment, step], MISSING_ID)
+        users = np.flatnonzero(user_items != MISSING_ID)
+        if len(users):
+            watched = np.asarray(ui_csr[users, user_items[users]]).ravel() > 0
+            uncovered[users[watched]] = 0
+
+    return chosen
+
+
+def most_popular(ui_csr: sparse.csr_matrix, segment_csr: sparse.csr_matrix, k: int) -> np.ndarray:
+    """Pick for every segment k items watched by most its users"""
+    counts = (segment_csr @ ui_csr).toarray()
+    k = min(k, counts.shape[1])
+    top = np.argsort(-counts, axis=1, kind="stable")[:, :k]
+
+    chosen = np.full((counts.shape[0], k), MISSING_ID, dtype=np.int64)
+    found = np.take_along_axis(counts, top, axis=1) > 0
+    chosen[found] = top[found]
+    return chosen
+
+
+def build_cold_segments(
+    interactions: pd.DataFrame,
+    users_features: pd.DataFrame,
+    k: int,
+    algorithm: str = "coverage",
+    min_segment_users: int = 100,
+    features: Sequence[str] = SEGMENT_FEATURES,
+) -> ColdSegments:
+    """Precompute recommendations for every demographic segment.
+
+    Segments with less than `min_segment_users` users with interactions
+    are dropped, their users get the global cold recommendations.
+    Short lists of small segments are padded by globally popular items.
+    """
+    if algorithm not in COLD_ALGORITHMS:
+        raise ValueError(f"Unknown cold algorithm {algorithm}")
+
+    user_ids, codes, names = segment_users(users_features, features)
+    users = IdIndex(user_ids)
+
+    rows = users.to_internal(interactions["user_id"].to_numpy())
+    featured = rows != MISSING_ID
+    interactions, rows = interactions[featured], rows[featured]
+    item_codes, item_ids = pd.factorize(interactions["item_id"])
+    ui_csr = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, item_codes)), shape=(len(users), len(item_ids))
+    )
+    ui_csr.data[:] = 1
+
+    # Only users with interactions make segment large enough
+    active_users = np.bincount(codes[np.unique(rows)], minlength=len(names))
+    kept_segments = np.flatnonzero(active_users >= min_segment_users)
+    segment_rows = np.full(len(names), MISSING_ID, dtype=np.int64)
+    segment_rows[kept_segments] = np.arange(len(kept_segments))
+
+    user_segments = segment_rows[codes]
+    kept_users = np.flatnonzero(user_segments != MISSING_ID)
+    segment_csr = sparse.csr_matrix(
+        (np.ones(len(kept_users), dtype=np.float32), (user_segments[kept_users], kept_users)),
+        shape=(len(kept_segments), len(users)),
+    )
+
+    pick = greedy_coverage if algorithm == "coverage" else most_popular
+    chosen = pick(ui_csr, segment_csr, k)
+    items = np.full((len(kept_segments), k), MISSING_ID, dtype=np.int64)
+    found = chosen != MISSING_ID
+    items[:, : chosen.shape[1]][found] = np.asarray(item_ids)[chosen[found]]
+    _pad_with_popular(items, interactions["item_id"].value_counts().index.to_numpy())
+
+    return ColdSegments(
+        IdIndex(user_ids[kept_users]),
+        user_segments[kept_users],
+        items,
+        [names[segment] for segment in kept_segments],
+    )
+
+
+def _pad_with_popular(items: np.ndarray, popular_items: np.ndarray) -> None:
+    for row in items:
+        missing = row == MISSING_ID
+        if missing.any():
+            candidates = popular_items[~np.isin(popular_items, row)]
+            n_found = min(int(missing.sum()), len(candidates))
+            row[np.flatnonzero(missing)[:n_found]] = candidates[:n_found]
+
+
+def save_cold_segments(path: str, segments: ColdSegments) -> None:
+    arrays = {
+        **dict(zip(ID_INDEX_ARRAYS_NAMES["user"], segments.users.to_arrays())),
+        "user_segments": segments.user_segments.astype(np.int32),
+        "items": segments.items,
+    }
+    save_arrays(path, arrays, {"segments": segments.names})
+
+
+def load_cold_segments(path: str) -> ColdSegments:
+    arrays, params = load_arrays(path, (*ID_INDEX_ARRAYS_NAMES["user"], "user_segments", "items"))
+    users = IdIndex(*(arrays[name] for name in ID_INDEX_ARRAYS_NAMES["user"]))
+
+    return ColdSegments(users, arrays["user_segments"], arrays["items"], params["segments"])
@@ -1,21 +1,202 @@
-from ..api.exceptions import ModelNotFoundError
+import asyncio
+import importlib
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future
+from functools import partial
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple, Type
+
+from ..api.exceptions import ModelNotFoundError, ModelVersionNotFoundError
+from ..log import app_logger
+from ..prometheus import PREDICTOR_LOAD_TIME, PREDICTOR_MEMORY_USAGE
 from ..settings import ServiceConfig
-from .als import get_als_predictor
 from .base import BaseRecommender
-from .random import get_random_predictor
+from .cache import invalidate_cache
+from .utils import REGISTRY_SECTION, clear_predictors_config_cache, estimate_memory_usage, get_predictors_config
 
-predictors = {}
+# Users scored by a reloaded predictor before it starts serving
+WARM_UP_USERS = 100
 
 
-def load_predictors(config: ServiceConfig) -> None:
-    predictors["random"] = get_random_predictor(config)
-    predictors["als"] = get_als_predictor(config)
+class RegisteredPredictor(NamedTuple):
+    factory: Callable[[ServiceConfig], BaseRecommender]
+    # Lazy predictors are loaded on the first request and can be unloaded
+    lazy: bool
+    load: Callable[[], BaseRecommender]
 
 
-def get_predictor(name: str) -> BaseRecommender:
+# Models declared in predictors config
+registry: Dict[str, RegisteredPredictor] = {}
+predictors: Dict[str, BaseRecommender] = {}
+# Predictors which are loaded on the first request
+lazy_predictors: Dict[str, Callable[[], BaseRecommender]] = {}
+# Replaced predictors kept for rollback, the most recent is the last
+previous_predictors: Dict[str, Deque[BaseRecommender]] = {}
+# Memory of loaded predictors, the least recently used is the first
+predictors_memory: "OrderedDict[str, int]" = OrderedDict()
+memory_budget: Optional[int] = None
+_lazy_lock = threading.Lock()
+_swap_lock = threading.Lock()
+_reload_lock = threading.Lock()
+
+
+def load_predictors(config: ServiceConfig, executor: Executor) -> List[Future]:
+    """Register models of predictors config and start loading
+    of all non-lazy ones on the executor"""
+    global memory_budget  # pylint: disable=global-statement
+
+    predictors_config = get_predictors_config(config)
+    budget_mb = predictors_config.get(REGISTRY_SECTION, {}).get("memory_budget_mb")
+    memory_budget = None if budget_mb is None else int(budget_mb * 1024**2)
+
+    futures = []
+    for name, model_cfg in predictors_config.items():
+        if name == REGISTRY_SECTION:
+            continue
+        factory = partial(_import_class(model_cfg["class"]), name=name)
+        lazy = model_cfg.get("lazy", False)
+        registry[name] = RegisteredPredictor(factory, lazy, partial(_load_predictor, name, config))
+        if lazy:
+            lazy_predictors[name] = registry[name].load
+        else:
+            futures.append(executor.submit(registry[name].load))
+
+    return futures
+
+
+def _import_class(path: str) -> Type[BaseRecommender]:
+    module_name, _, class_name = path.rpartition(".")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _load_predictor(name: str, config: ServiceConfig) -> BaseRecommender:
+    predictor, memory_usage = _build_predictor(name, config)
+    _set_predictor(name, predictor, memory_usage, config.reload_config.max_previous_versions)
+
+    return predictor
+
+
+def _build_predictor(name: str, config: ServiceConfig) -> Tuple[BaseRecommender, int]:
+    started_at = time.perf_counter()
+    predictor = registry[name].factory(config)
+    load_time = time.perf_counter() - started_at
+    memory_usage = estimate_memory_usage(predictor)
+
+    PREDICTOR_LOAD_TIME.labels(model_name=name).set(load_time)
+    PREDICTOR_MEMORY_USAGE.labels(model_name=name).set(memory_usage)
+    app_logger.info(f"Predictor {name} loaded in {load_time:.3f}s, memory usage: {memory_usage} bytes")
+
+    return predictor, memory_usage
+
+
+def _set_predictor(name: str, predictor: BaseRecommender, memory_usage: int, max_previous_versions: int) -> None:
+    with _swap_lock:
+        previous = predictors.get(name)
+        if previous is not None and max_previous_versions > 0:
+            versions = previous_predictors.setdefault(name, deque(maxlen=max_previous_versions))
+            versions.append(previous)
+        # Requests in progress keep using the predictor they already got
+        predictors[name] = predictor
+        predictors_memory[name] = memory_usage
+        predictors_memory.move_to_end(name)
+        lazy_predictors.pop(name, None)
+    invalidate_cache(name)
+    _unload_idle_predictors(keep=name)
+
+
+def _unload_idle_predictors(keep: str) -> None:
+    # Least recently used lazy predictors are unloaded to fit the budget,
+    # they are loaded again on the next request
+    if memory_budget is None:
+        return
+
+    unloaded = []
+    with _swap_lock:
+        for name in list(predictors_memory):
+            if sum(predictors_memory.values()) <= memory_budget:
+                break
+            if name == keep or name not in registry or not registry[name].lazy:
+                continue
+            # `get_predictor` doesn't take the lock, so the predictor
+            # must be loadable again before it stops being served
+            lazy_predictors[name] = registry[name].load
+            predictors.pop(name, None)
+            predictors_memory.pop(name)
+            previous_predictors.pop(name, None)
+            unloaded.append(name)
+
+    for name in unloaded:
+        invalidate_cache(name)
+        PREDICTOR_MEMORY_USAGE.labels(model_name=name).set(0)
+        app_logger.info(f"Predictor {name} unloaded to fit memory budget")
+
+
+def _touch(name: str) -> None:
+    # Order is changed by loader threads under the lock as well
+    with _swap_lock:
+        try:
+            predictors_memory.move_to_end(name)
+        except KeyError:
+            # Predictor was unloaded or is not registered
+            pass
+
+
+def _warm_up(predictor: BaseRecommender) -> None:
+    # Page in model data before the predictor gets requests
     try:
-        predictor = predictors[name]
-    except KeyError as err:
-        raise ModelNotFoundError(error_message=f"Model {name} not found") from err
+        user_ids = predictor.users.external_ids[:WARM_UP_USERS].tolist()
+    except NotImplementedError:
+        user_ids = []
+    predictor.recommend_batch(user_ids or [0])
+
+
+def reload_predictor(name: str, config: ServiceConfig) -> None:
+    """Build new version of the predictor, warm it up and replace
+    the serving one, which is kept for rollback"""
+    if name not in registry:
+        raise ModelNotFoundError(error_message=f"Model {name} not found")
+
+    # Concurrent reloads would build the same predictor twice
+    with _reload_lock:
+        # New version is built with the current predictors config
+        clear_predictors_config_cache()
+        predictor, memory_usage = _build_predictor(name, config)
+        _warm_up(predictor)
+        _set_predictor(name, predictor, memory_usage, config.reload_config.max_previous_versions)
+    app_logger.info(f"Predictor {name} reloaded")
+
+
+def rollback_predictor(name: str) -> None:
+    """Replace the serving predictor with its previous version"""
+    with _swap_lock:
+        versions = previous_predictors.get(name)
+        if not versions:
+            raise ModelVersionNotFoundError(error_message=f"Model {name} has no previous version")
+        predictors[name] = versions.pop()
+    invalidate_cache(name)
+    app_logger.info(f"Predictor {name} rolled back")
+
+
+def get_predictor(name: str) -> BaseRecommender:
+    """Get loaded predictor, lazy one is loaded on the first request"""
+    predictor = predictors.get(name)
+    if predictor is None:
+        if name not in lazy_predictors:
+            raise ModelNotFoundError(error_message=f"Model {name} not found")
+        with _lazy_lock:
+            # Predictor could be loaded by another thread while we were waiting
+            predictor = predictors.get(name)
+            if predictor is None:
+                predictor = lazy_predictors[name]()
+    _touch(name)
 
     return predictor
+
+
+async def get_predictor_async(name: str) -> BaseRecommender:
+    """Get predictor without blocking event loop by lazy loading"""
+    if name in predictors:
+        return get_predictor(name)
+
+    return await asyncio.get_running_loop().run_in_executor(None, get_predictor, name)
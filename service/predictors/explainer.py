@@ -1,24 +1,91 @@
 import os
+from typing import Any, Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
 
 from ..settings import ServiceConfig
+from .id_index import IdIndex
 
-data = {}
+# Explanations with p below it say that the item won't be liked
+MIN_EXPLAINED_P = 10
+
+data: Dict[str, Any] = {}
+
+
+class ItemCatalogue:
+    """Items rating compiled into arrays
+    with precomputed rating based explanations"""
+
+    def __init__(self, items_rating: pd.DataFrame) -> None:
+        self.items = IdIndex(items_rating.index.values)
+        self.views: np.ndarray = items_rating["views"].to_numpy()
+        self.ranks: np.ndarray = items_rating["rank"].to_numpy()
+        self.quoted_titles: List[str] = [repr(title) for title in items_rating["title"]]
+
+        # Let's use as p a value equal to the rounded value of
+        # (-95 * (rank - 1) / (max_rank - 1) + 95)
+        # (from the equation of the line passing through 2 points)
+        # Thus the higher in the ranking - the higher the score
+        # (In range [0;95])
+        max_rank = self.ranks.max() if len(self.ranks) else 1
+        self.rating_p: np.ndarray = np.rint(-95 * (self.ranks - 1) / max(max_rank - 1, 1) + 95).astype(np.int64)
+
+        self.negative_explanations = [
+            rf"Фильм/сериал {quoted_title} скорее всего вам не понравится" for quoted_title in self.quoted_titles
+        ]
+        self.rating_explanations = [
+            (
+                rf"Фильм/сериал {quoted_title} может вам понравиться с вероятностью "
+                + rf"{p}% т.к. его уже посмотрели {views_count} пользователей сервиса "
+                + rf"и он занимает {item_rank} место в нашем топе"
+            )
+            if p >= MIN_EXPLAINED_P
+            else negative_explanation
+            for quoted_title, p, views_count, item_rank, negative_explanation in zip(
+                self.quoted_titles, self.rating_p, self.views, self.ranks, self.negative_explanations
+            )
+        ]
+
+    def __contains__(self, item_id: Any) -> bool:
+        return item_id in self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def explain_using_rating(self, item_id: int) -> Tuple[int, str]:
+        """Explanation based on the global top seen"""
+        row = self.items[item_id]
+        return int(self.rating_p[row]), self.rating_explanations[row]
+
+    def explain_using_model(self, item_id: int, item_score: float, top_contributor: Any) -> Tuple[int, str]:
+        """Explanation based on model score and the most contributing item"""
+        row = self.items[item_id]
+        p = round(item_score * 100)
+
+        if p < MIN_EXPLAINED_P:
+            return p, self.negative_explanations[row]
+
+        top_contributor_title = self.quoted_titles[self.items[top_contributor]]
+        explanation = (
+            rf"Фильм/сериал {self.quoted_titles[row]} может вам понравиться "
+            + rf"с вероятностью {p}% т.к. вы посмотрели {top_contributor_title}"
+        )
+        return p, explanation
 
 
 def load_explanation_data(cfg: ServiceConfig) -> None:
     """Get data required to explain recos"""
-    data["items_rating"] = pd.read_csv(os.path.join(cfg.explanation_data_path, "items_rating.csv"), index_col="item_id")
-    data["all_users"] = pd.read_csv(os.path.join(cfg.explanation_data_path, "users.csv"))["user_id"].values
+    items_rating = pd.read_csv(os.path.join(cfg.explanation_data_path, "items_rating.csv"), index_col="item_id")
+    data["item_catalogue"] = ItemCatalogue(items_rating)
+    data["all_users"] = IdIndex(pd.read_csv(os.path.join(cfg.explanation_data_path, "users.csv"))["user_id"].values)
 
 
-def get_items_rating() -> pd.DataFrame:
-    """Get items rating dataframe"""
-    return data["items_rating"]
+def get_item_catalogue() -> ItemCatalogue:
+    """Get catalogue of items with ratings"""
+    return data["item_catalogue"]
 
 
-def get_all_users() -> np.ndarray:
-    """Get list of all existing users"""
+def get_all_users() -> IdIndex:
+    """Get index of all existing users"""
     return data["all_users"]
@@ -0,0 +1,57 @@
+import itertools
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+class FoldedInUser(NamedTuple):
+    factors: np.ndarray
+    # Internal ids of interacted items and confidences of interactions
+    item_ids: np.ndarray
+    confidences: np.ndarray
+    # Changes on every fold-in, so results cached by version are not stale
+    version: int
+
+
+class FoldInOverlay:
+    """Bounded LRU of user factors solved online,
+    checked before factors of the trained model.
+
+    Overlay is kept in memory of one process, it is neither shared
+    between workers nor kept when the predictor is reloaded.
+    """
+
+    def __init__(self, max_users: int) -> None:
+        self.max_users = max_users
+        self._users: "OrderedDict[int, FoldedInUser]" = OrderedDict()
+        self._versions = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    def get(self, user_id: int) -> Optional[FoldedInUser]:
+        if not self._users:
+            return None
+
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is not None:
+                self._users.move_to_end(user_id)
+
+        return user
+
+    def put(self, user_id: int, factors: np.ndarray, item_ids: np.ndarray, confidences: np.ndarray) -> FoldedInUser:
+        with self._lock:
+            user = FoldedInUser(factors, item_ids, confidences, next(self._versions))
+            self._users[user_id] = user
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+        return user
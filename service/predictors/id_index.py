@@ -0,0 +1,77 @@
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+MISSING_ID = -1
+
+
+class IdIndex:
+    """Mapping between external ids and internal ids (row numbers)
+    backed by sorted arrays instead of python dicts"""
+
+    def __init__(
+        self,
+        external_ids: Any,
+        sorted_external_ids: Optional[np.ndarray] = None,
+        sorted_internal_ids: Optional[np.ndarray] = None,
+    ) -> None:
+        # Position in this array is the internal id
+        self.external_ids: np.ndarray = np.asarray(external_ids, dtype=np.int64)
+        # Sorted arrays can be precomputed offline (see `to_arrays`)
+        if sorted_internal_ids is None:
+            sorted_internal_ids = np.argsort(self.external_ids, kind="stable")
+        if sorted_external_ids is None:
+            sorted_external_ids = self.external_ids[sorted_internal_ids]
+        self._sorted_external_ids: np.ndarray = np.asarray(sorted_external_ids, dtype=np.int64)
+        self._sorted_internal_ids: np.ndarray = np.asarray(sorted_internal_ids, dtype=np.int64)
+
+    def to_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Arrays to restore the index with `IdIndex(*arrays)`"""
+        return self.external_ids, self._sorted_external_ids, self._sorted_internal_ids
+
+    def __len__(self) -> int:
+        return len(self.external_ids)
+
+    def __contains__(self, external_id: Any) -> bool:
+        return self._find(external_id) != MISSING_ID
+
+    def __getitem__(self, external_id: Any) -> int:
+        internal_id = self._find(external_id)
+        if internal_id == MISSING_ID:
+            raise KeyError(external_id)
+        return internal_id
+
+    def get(self, external_id: Any, default: int = MISSING_ID) -> int:
+        internal_id = self._find(external_id)
+        return default if internal_id == MISSING_ID else internal_id
+
+    def _find(self, external_id: Any) -> int:
+        try:
+            position = int(np.searchsorted(self._sorted_external_ids, external_id))
+        except (OverflowError, TypeError):
+            return MISSING_ID
+
+        if position < len(self) and self._sorted_external_ids[position] == external_id:
+            return int(self._sorted_internal_ids[position])
+        return MISSING_ID
+
+    def to_internal(self, external_ids: Any) -> np.ndarray:
+        """Vectorized lookup of internal ids, unknown ids are mapped to -1"""
+        external_ids = np.asarray(external_ids, dtype=np.int64)
+        positions = np.searchsorted(self._sorted_external_ids, external_ids)
+        positions = np.minimum(positions, max(len(self) - 1, 0))
+
+        internal_ids: np.ndarray = np.full(external_ids.shape, MISSING_ID, dtype=np.int64)
+        if len(self):
+            found = self._sorted_external_ids[positions] == external_ids
+            internal_ids[found] = self._sorted_internal_ids[positions[found]]
+
+        return internal_ids
+
+    def to_external(self, internal_ids: Any) -> np.ndarray:
+        """Vectorized lookup of external ids"""
+        return self.external_ids[internal_ids]
+
+    def contains(self, external_ids: Any) -> np.ndarray:
+        """Vectorized membership check"""
+        return self.to_internal(external_ids) != MISSING_ID
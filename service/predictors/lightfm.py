@@ -0,0 +1,106 @@
+# mypy: disable-error-code="misc"
+# pylint: disable=too-many-instance-attributes
+import os
+from typing import Any, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+
+from ..prometheus import observe_stage
+from ..response import PreEncodedList
+from ..settings import ServiceConfig
+from .base import BaseRecommender
+from .id_index import MISSING_ID, IdIndex
+from .retrieval import load_index
+from .utils import get_cold_user_predictions_from_offline, get_data, get_data_with_features
+
+SCORING_CHUNK_SIZE = 1_000
+
+
+class LightFMRecommender(BaseRecommender):
+    """Recommender based on LightFM, users are scored by dot products
+    with item representations precomputed at load time"""
+
+    default_name = "lightfm"
+
+    def __init__(self, global_cfg: ServiceConfig, name: Optional[str] = None) -> None:
+        super().__init__(global_cfg, name)
+        # Loading recommendations for cold users
+        self.cold_dataset = get_cold_user_predictions_from_offline(self.model_cfg["cold_dataset"], global_cfg)
+        self.cold_reco = PreEncodedList(self.cold_dataset.item_id.to_list())
+
+        if self.model_cfg.get("with_features", False):
+            dataset, self._users = get_data_with_features(
+                self.model_cfg["interactions"],
+                self.model_cfg["users_features"],
+                self.model_cfg["items_features"],
+                global_cfg,
+            )
+        else:
+            dataset, self._users = get_data(self.model_cfg["interactions"], global_cfg)
+        self.items = IdIndex(dataset.item_id_map.external_ids)
+        self.ui_csr = dataset.get_user_item_matrix(include_weights=False)
+
+        self.model = self.load_model(global_cfg)
+        # Embeddings with biases (and features) folded in, so a score is
+        # a plain dot product: [b_u, 1, e_u] @ [1, b_i, e_i]
+        user_vectors, item_vectors = self.model.get_vectors(dataset)
+        self.user_vectors: np.ndarray = np.ascontiguousarray(user_vectors, dtype=np.float32)
+        self.item_vectors: np.ndarray = np.ascontiguousarray(item_vectors, dtype=np.float32)
+
+        # Engine for scoring of warm users
+        self.index = load_index(self.model_cfg.get("retrieval"), self.item_vectors, global_cfg.predictors_path)
+
+    def load_model(self, global_cfg: ServiceConfig) -> Any:
+        # Loading pretrained LightFMWrapperModel
+        return joblib.load(os.path.join(global_cfg.predictors_path, self.model_cfg["model_filename"]))
+
+    def recommend(self, user_id: int) -> List:
+        return self.recommend_batch([user_id])[0]
+
+    def recommend_batch(self, user_ids: Sequence[int]) -> List[List]:
+        with observe_stage(self.name, "id_mapping"):
+            int_user_ids = self._users.to_internal(user_ids)
+            warm_positions = np.flatnonzero(int_user_ids != MISSING_ID)
+
+        with observe_stage(self.name, "scoring"):
+            warm_reco = self._score_warm_users(int_user_ids[warm_positions])
+
+        with observe_stage(self.name, "id_mapping"):
+            found = warm_reco >= 0
+            external_reco = np.full(warm_reco.shape, MISSING_ID, dtype=np.int64)
+            external_reco[found] = self.items.to_external(warm_reco[found])
+
+            recos: List[List] = [self.cold_reco] * len(int_user_ids)
+            for position, row in zip(warm_positions, external_reco):
+                recos[position] = row[row >= 0].tolist()
+
+        return recos
+
+    def fallback_recommend(self, user_id: int) -> Optional[List]:
+        return self.cold_reco
+
+    def _score_warm_users(self, int_user_ids: np.ndarray) -> np.ndarray:
+        # Get (n_users, k) internal item ids, viewed items are filtered
+        reco = np.full((len(int_user_ids), self.k_recs), MISSING_ID, dtype=np.int32)
+        for start in range(0, len(int_user_ids), SCORING_CHUNK_SIZE):
+            chunk = int_user_ids[start : start + SCORING_CHUNK_SIZE]
+            reco[start : start + len(chunk)] = self.index.search(
+                self.user_vectors[chunk],
+                self.k_recs,
+                self.ui_csr[chunk],
+            )
+
+        return reco
+
+    def explain_reco(self, user_id: int, item_id: int) -> Tuple[float, List]:
+        raise NotImplementedError()
+
+    @property
+    def users(self) -> IdIndex:
+        # Return model's hot users
+        return self._users
+
+    def __repr__(self) -> str:
+        return f"""{type(self).__name__}(model={self.model_cfg["model_filename"]},
+                    dataset={self.model_cfg["interactions"]})"""
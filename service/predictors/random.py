@@ -1,40 +1,66 @@
-from typing import Any, List, Tuple
+from typing import Any, List, Optional, Sequence, Tuple
 
 import numpy as np
 
+from ..prometheus import observe_stage
 from ..settings import ServiceConfig
 from .base import BaseRecommender
+from .id_index import IdIndex
+from .sampling import ThreadLocalGenerators, sample_without_replacement, sample_without_replacement_batch
 from .utils import get_items_list
 
 
 class RandomRecommender(BaseRecommender):
-    def __init__(self, global_cfg: ServiceConfig) -> None:
-        super().__init__(global_cfg)
+    """Random items, sampling doesn't depend on the number of items"""
+
+    default_name = "random"
+
+    def __init__(self, global_cfg: ServiceConfig, name: Optional[str] = None) -> None:
+        super().__init__(global_cfg, name)
         # Loading list of items
-        self.items = get_items_list(
-            self.model_cfg["random"]["items"],
-            global_cfg,
+        self.items: np.ndarray = np.asarray(
+            get_items_list(
+                self.model_cfg["items"],
+                global_cfg,
+            )
         )
-        self.load_model(global_cfg)
+        self.random_state = self.model_cfg["random_state"]
+        # The same user always gets the same items
+        self.per_user_seed = self.model_cfg.get("per_user_seed", False)
+        self.generators = self.load_model(global_cfg)
 
     def load_model(self, global_cfg: ServiceConfig) -> Any:
-        np.random.seed(self.model_cfg["random"]["random_state"])
+        return ThreadLocalGenerators(self.random_state)
 
     def recommend(self, user_id: int) -> List:
-        reco = np.random.choice(self.items, self.k_recs, replace=False).tolist()
+        with observe_stage(self.name, "scoring"):
+            rng = self._user_generator(user_id) if self.per_user_seed else self.generators.get()
+            reco = self.items[sample_without_replacement(rng, len(self.items), self.k_recs)].tolist()
 
         return reco
 
+    def recommend_batch(self, user_ids: Sequence[int]) -> List[List]:
+        if self.per_user_seed:
+            return [self.recommend(user_id) for user_id in user_ids]
+
+        with observe_stage(self.name, "scoring"):
+            samples = sample_without_replacement_batch(
+                self.generators.get(), len(self.items), self.k_recs, len(user_ids)
+            )
+            recos = self.items[samples].tolist()
+
+        return recos
+
+    def _user_generator(self, user_id: int) -> np.random.Generator:
+        # Seed entropy must be non-negative
+        return np.random.default_rng([self.random_state, user_id % 2**64])
+
     def explain_reco(self, user_id: int, item_id: int) -> Tuple[float, List]:
         raise NotImplementedError()
 
     @property
-    def users(self) -> List:
+    def users(self) -> IdIndex:
         raise NotImplementedError()
 
     def __repr__(self) -> str:
-        return f"""{type(self).__name__}(model={self.model_cfg["random"]["model_filename"]}"""
-
-
-def get_random_predictor(global_cfg: ServiceConfig) -> BaseRecommender:
-    return RandomRecommender(global_cfg)
+        return f"""{type(self).__name__}(items={self.model_cfg["items"]})"""
@@ -0,0 +1,179 @@
+import json
+import os
+import tempfile
+import threading
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..log import app_logger
+from ..settings import ServiceConfig
+from .constructor import predictors, reload_predictor, rollback_predictor
+from .utils import clear_predictors_config_cache, get_models_configs, get_predictors_config_path
+
+FilesSignature = Tuple[Tuple[str, int, int, int], ...]
+ADMIN_COMMANDS = ("reload", "rollback")
+
+
+class AdminCommands:
+    """Admin commands shared by all workers through a directory,
+    a file of a model keeps the last command published for it"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        # Commands published before the worker started are not applied
+        self._seen = {name: command_id for name, (command_id, _) in self._read_all().items()}
+
+    def publish(self, model_name: str, command: str) -> None:
+        command_id = uuid.uuid4().hex
+        path = os.path.join(self.path, f"{model_name}.json")
+        tmp_path = f"{path}.{command_id}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"id": command_id, "command": command}, f)
+        os.replace(tmp_path, path)
+        self._seen[model_name] = command_id
+
+    def poll(self) -> List[Tuple[str, str]]:
+        """Get (model name, command) published since the last poll"""
+        new_commands = []
+        for name, (command_id, command) in self._read_all().items():
+            if self._seen.get(name) != command_id:
+                self._seen[name] = command_id
+                new_commands.append((name, command))
+
+        return new_commands
+
+    def _read_all(self) -> Dict[str, Tuple[str, str]]:
+        commands = {}
+        for filename in os.listdir(self.path):
+            name, extension = os.path.splitext(filename)
+            if extension != ".json":
+                continue
+            try:
+                with open(os.path.join(self.path, filename), encoding="utf-8") as f:
+                    content = json.load(f)
+            except (OSError, ValueError):
+                continue
+            commands[name] = (content["id"], content["command"])
+
+        return commands
+
+
+def run_admin_command(model_name: str, command: str, config: ServiceConfig) -> None:
+    if command == "reload":
+        reload_predictor(model_name, config)
+    elif command == "rollback":
+        rollback_predictor(model_name)
+    else:
+        raise ValueError(f"Unknown admin command {command}, expected one of {ADMIN_COMMANDS}")
+
+
+def get_commands_path(config: ServiceConfig) -> str:
+    commands_dir: Optional[str] = config.reload_config.commands_dir
+    return commands_dir or os.path.join(tempfile.gettempdir(), f"{config.service_name}_admin")
+
+
+class PredictorsWatcher:
+    """Applies admin commands published by other workers and
+    (if enabled) reloads predictors whose files were changed.
+
+    Rollback returns a version kept in memory, so workers
+    restarted after it serve predictors loaded from current files.
+    """
+
+    def __init__(self, config: ServiceConfig) -> None:
+        self.config = config
+        self.poll_interval = config.reload_config.poll_interval_seconds
+        self.commands = AdminCommands(get_commands_path(config))
+        self._config_signature = _file_signature(get_predictors_config_path(config))
+        self._signatures = {name: self._files_signature(name) for name in get_models_configs(config)}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"{config.service_name}_watcher", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def run_command(self, model_name: str, command: str) -> None:
+        """Apply admin command in this worker and publish it to others,
+        failed command is not published"""
+        run_admin_command(model_name, command, self.config)
+        self.commands.publish(model_name, command)
+
+    def check_commands(self) -> List[Tuple[str, str]]:
+        """Apply commands published by other workers, get applied ones"""
+        applied = []
+        for model_name, command in self.commands.poll():
+            try:
+                run_admin_command(model_name, command, self.config)
+            except Exception as e:  # pylint: disable=W0703
+                app_logger.error(f"Admin command {command} of predictor {model_name} failed: {e!r}")
+            else:
+                applied.append((model_name, command))
+
+        return applied
+
+    def check(self) -> List[str]:
+        """Reload predictors whose files or config were changed,
+        get names of reloaded ones"""
+        config_signature = _file_signature(get_predictors_config_path(self.config))
+        if config_signature != self._config_signature:
+            # Edited config may point to other files
+            self._config_signature = config_signature
+            clear_predictors_config_cache()
+
+        reloaded = []
+        for name in self._signatures:
+            signature = self._files_signature(name)
+            if signature == self._signatures[name]:
+                continue
+
+            # Files being written change again, so failed reload is retried
+            self._signatures[name] = signature
+            if name not in predictors:
+                # Lazy predictor will read new files on the first request
+                continue
+            try:
+                reload_predictor(name, self.config)
+            except Exception as e:  # pylint: disable=W0703
+                app_logger.error(f"Predictor {name} reload failed, previous version is kept: {e!r}")
+            else:
+                reloaded.append(name)
+
+        return reloaded
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.check_commands()
+            if self.config.reload_config.watch:
+                self.check()
+
+    def _files_signature(self, name: str) -> FilesSignature:
+        # Predictor is rebuilt with its edited config as well
+        signature = [_file_signature(get_predictors_config_path(self.config))]
+        for filename in _string_values(get_models_configs(self.config).get(name, {})):
+            for directory in (self.config.predictors_path, self.config.dataset_path):
+                signature.append(_file_signature(os.path.join(directory, filename)))
+
+        return tuple(item for item in signature if item is not None)
+
+
+def _file_signature(path: str) -> Optional[Tuple[str, int, int, int]]:
+    # Artifacts directories are replaced on rebuild, so inode is checked
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+
+def _string_values(model_cfg: Dict[str, Any]) -> Iterator[str]:
+    for value in model_cfg.values():
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            yield from _string_values(value)
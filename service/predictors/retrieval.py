@@ -0,0 +1,168 @@
+"""Top k retrieval engines over item vectors
+
+`brute_force` scores all items and is the exact reference,
+`ivf` is an inverted file index: items are split into clusters offline
+and only items of `n_probe` clusters closest to the user are scored.
+"""
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import numpy as np
+from scipy import sparse
+
+from .artifacts import load_arrays, save_arrays
+from .topk import top_k_items
+
+
+class TopKIndex(ABC):
+    def __init__(self, item_vectors: np.ndarray) -> None:
+        self.item_vectors = item_vectors
+
+    @abstractmethod
+    def search(self, user_vectors: np.ndarray, k: int, ui_csr: Optional[sparse.csr_matrix] = None) -> np.ndarray:
+        """Get (n_users, k) internal item ids padded with -1,
+        already liked items from `ui_csr` rows are filtered out"""
+        raise NotImplementedError()
+
+
+class BruteForceIndex(TopKIndex):
+    def search(self, user_vectors: np.ndarray, k: int, ui_csr: Optional[sparse.csr_matrix] = None) -> np.ndarray:
+        return top_k_items(user_vectors, self.item_vectors, k, ui_csr)
+
+
+class IVFIndex(TopKIndex):
+    def __init__(
+        self,
+        item_vectors: np.ndarray,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_items: np.ndarray,
+        n_probe: int,
+    ) -> None:
+        super().__init__(item_vectors)
+        self.centroids = centroids
+        # Items of list i are list_items[list_offsets[i]:list_offsets[i + 1]]
+        self.list_offsets = list_offsets
+        self.list_items = list_items
+        self.n_probe = min(n_probe, len(centroids))
+
+    @classmethod
+    def build(cls, item_vectors: np.ndarray, n_lists: int, n_iter: int = 20, random_state: int = 42) -> "IVFIndex":
+        """Split items into lists by k-means over their vectors"""
+        rng = np.random.default_rng(random_state)
+        n_lists = min(n_lists, len(item_vectors))
+        vectors = np.asarray(item_vectors, dtype=np.float32)
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assignment = _nearest_centroids(vectors, centroids)
+            for list_id in range(n_lists):
+                members = vectors[assignment == list_id]
+                if len(members):
+                    centroids[list_id] = members.mean(axis=0)
+
+        assignment = _nearest_centroids(vectors, centroids)
+        list_items = np.argsort(assignment, kind="stable").astype(np.int32)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+
+        return cls(item_vectors, centroids, list_offsets, list_items, n_probe=n_lists)
+
+    def save(self, path: str) -> None:
+        arrays = {
+            "centroids": self.centroids,
+            "list_offsets": self.list_offsets,
+            "list_items": self.list_items,
+        }
+        save_arrays(path, arrays, {"n_lists": len(self.centroids)})
+
+    @classmethod
+    def load(cls, path: str, item_vectors: np.ndarray, n_probe: int) -> "IVFIndex":
+        arrays, _ = load_arrays(path, ("centroids", "list_offsets", "list_items"))
+        return cls(item_vectors, arrays["centroids"], arrays["list_offsets"], arrays["list_items"], n_probe)
+
+    def search(self, user_vectors: np.ndarray, k: int, ui_csr: Optional[sparse.csr_matrix] = None) -> np.ndarray:
+        n_users = len(user_vectors)
+        result = np.full((n_users, k), -1, dtype=np.int32)
+
+        centroid_scores = user_vectors @ self.centroids.T
+        if self.n_probe < len(self.centroids):
+            probes = np.argpartition(-centroid_scores, self.n_probe - 1, axis=1)[:, : self.n_probe]
+        else:
+            probes = np.tile(np.arange(len(self.centroids)), (n_users, 1))
+
+        for row, (user_vector, user_probes) in enumerate(zip(user_vectors, probes)):
+            candidates = np.concatenate(
+                [self.list_items[self.list_offsets[probe] : self.list_offsets[probe + 1]] for probe in user_probes]
+            )
+            if ui_csr is not None:
+                liked = ui_csr.indices[ui_csr.indptr[row] : ui_csr.indptr[row + 1]]
+                candidates = candidates[~np.isin(candidates, liked)]
+
+            scores = self.item_vectors[candidates] @ user_vector
+            if len(candidates) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            result[row, : len(top)] = candidates[top]
+
+        return result
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin of ||v - c||^2 = ||c||^2 - 2 * v.c, ||v||^2 doesn't matter
+    distances = (centroids**2).sum(axis=1) - 2 * vectors @ centroids.T
+    return distances.argmin(axis=1)
+
+
+def load_index(retrieval_cfg: Optional[Dict[str, Any]], item_vectors: np.ndarray, predictors_path: str) -> TopKIndex:
+    """Create retrieval engine described in predictors config"""
+    retrieval_cfg = retrieval_cfg or {}
+    engine = retrieval_cfg.get("engine", "brute_force")
+
+    if engine == "brute_force":
+        return BruteForceIndex(item_vectors)
+    if engine == "ivf":
+        return IVFIndex.load(
+            os.path.join(predictors_path, retrieval_cfg["index"]),
+            item_vectors,
+            retrieval_cfg.get("n_probe", 8),
+        )
+    raise ValueError(f"Unknown retrieval engine {engine}")
+
+
+def evaluate_recall(
+    index: TopKIndex,
+    user_vectors: np.ndarray,
+    k: int,
+    ui_csr: Optional[sparse.csr_matrix] = None,
+) -> Dict[str, float]:
+    """Compare index with exact brute force search: recall@k
+    and latency of single user requests"""
+    exact_index = BruteForceIndex(index.item_vectors)
+    found, total = 0, 0
+    exact_time, approximate_time = 0.0, 0.0
+
+    for row in range(len(user_vectors)):
+        user_items = ui_csr[row : row + 1] if ui_csr is not None else None
+
+        started_at = time.perf_counter()
+        exact = exact_index.search(user_vectors[row : row + 1], k, user_items)[0]
+        exact_time += time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        approximate = index.search(user_vectors[row : row + 1], k, user_items)[0]
+        approximate_time += time.perf_counter() - started_at
+
+        found += len(np.intersect1d(exact[exact >= 0], approximate[approximate >= 0]))
+        total += int((exact >= 0).sum())
+
+    n_users = max(len(user_vectors), 1)
+    return {
+        "recall": found / max(total, 1),
+        "exact_ms": 1000 * exact_time / n_users,
+        "approximate_ms": 1000 * approximate_time / n_users,
+    }
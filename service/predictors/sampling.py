@@ -0,0 +1,48 @@
+import threading
+
+import numpy as np
+
+
+def sample_without_replacement(rng: np.random.Generator, n: int, k: int) -> np.ndarray:
+    """Sample k of n integers without replacement in O(k)
+    by Floyd's algorithm, the result is in random order"""
+    k = min(k, n)
+    # Draw of j-th step is uniform on [0, j] for j in [n - k, n)
+    draws = rng.integers(0, np.arange(n - k + 1, n + 1)).tolist()
+    chosen = set()
+    for j, draw in enumerate(draws, start=n - k):
+        chosen.add(j if draw in chosen else draw)
+
+    return rng.permutation(np.fromiter(chosen, dtype=np.int64, count=k))
+
+
+def sample_without_replacement_batch(rng: np.random.Generator, n: int, k: int, size: int) -> np.ndarray:
+    """Vectorized Floyd's algorithm, get (size, k) samples of k of n"""
+    k = min(k, n)
+    draws = rng.integers(0, np.arange(n - k + 1, n + 1), size=(size, k))
+    chosen = np.empty((size, k), dtype=np.int64)
+    for step in range(k):
+        draw = draws[:, step]
+        taken = (chosen[:, :step] == draw[:, None]).any(axis=1)
+        chosen[:, step] = np.where(taken, n - k + step, draw)
+
+    return rng.permuted(chosen, axis=1)
+
+
+class ThreadLocalGenerators:
+    """Independent random generator for every thread,
+    all of them are spawned from the same seed"""
+
+    def __init__(self, random_state: int) -> None:
+        self._seed_sequence = np.random.SeedSequence(random_state)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def get(self) -> np.random.Generator:
+        rng = getattr(self._local, "rng", None)
+        if rng is None:
+            with self._lock:
+                (seed,) = self._seed_sequence.spawn(1)
+            rng = self._local.rng = np.random.default_rng(seed)
+
+        return rng
@@ -0,0 +1,88 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .artifacts import load_arrays, save_arrays
+
+TOP_K_ITEMS_NAME = "items"
+TOP_K_USERS_NAME = "users"
+
+
+def top_k_items(
+    user_factors: np.ndarray,
+    item_factors: np.ndarray,
+    k: int,
+    ui_csr: Optional[sparse.csr_matrix] = None,
+) -> np.ndarray:
+    """Get top k internal item ids for every row of user factors.
+
+    If `ui_csr` is given (its rows must match `user_factors` rows),
+    already liked items are filtered out. Rows with less than k
+    available items are padded with -1.
+    """
+    n_users = user_factors.shape[0]
+    n_items = item_factors.shape[0]
+    scores = user_factors @ item_factors.T
+
+    if ui_csr is not None and ui_csr.nnz:
+        rows = np.repeat(np.arange(n_users), np.diff(ui_csr.indptr))
+        scores[rows, ui_csr.indices] = -np.inf
+
+    if k < n_items:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(n_items), (n_users, 1))
+    candidates_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidates_scores, axis=1, kind="stable")
+    top_k = np.take_along_axis(candidates, order, axis=1)[:, :k]
+    top_k_scores = np.take_along_axis(candidates_scores, order, axis=1)[:, :k]
+
+    top_k = top_k.astype(np.int32)
+    top_k[np.isneginf(top_k_scores)] = -1
+    if top_k.shape[1] < k:
+        top_k = np.pad(top_k, ((0, 0), (0, k - top_k.shape[1])), constant_values=-1)
+
+    return top_k
+
+
+def build_top_k_table(
+    user_factors: np.ndarray,
+    item_factors: np.ndarray,
+    ui_csr: sparse.csr_matrix,
+    item_external_ids: np.ndarray,
+    k: int,
+    chunk_size: int = 10_000,
+) -> np.ndarray:
+    """Build (n_users, k) table of external item ids for all users.
+
+    Users are scored in chunks to keep the dense score matrix small.
+    """
+    n_users = user_factors.shape[0]
+    table: np.ndarray = np.full((n_users, k), -1, dtype=np.int32)
+
+    for start in range(0, n_users, chunk_size):
+        stop = min(start + chunk_size, n_users)
+        internal = top_k_items(user_factors[start:stop], item_factors, k, ui_csr[start:stop])
+        found = internal >= 0
+        table[start:stop][found] = item_external_ids[internal[found]]
+
+    return table
+
+
+def save_top_k_table(path: str, table: np.ndarray, user_external_ids: np.ndarray, model_signature: str) -> None:
+    """Save top k table, external user ids of its rows and signature
+    of the model file it was built from"""
+    arrays: Dict[str, np.ndarray] = {
+        TOP_K_ITEMS_NAME: table.astype(np.int32),
+        TOP_K_USERS_NAME: np.asarray(user_external_ids, dtype=np.int64),
+    }
+    save_arrays(path, arrays, {"k": table.shape[1], "model_signature": model_signature})
+
+
+def load_top_k_table(path: str) -> Tuple[np.ndarray, np.ndarray, Optional[str]]:
+    """Load memory-mapped top k table, external user ids of its rows
+    and signature of the model file"""
+    arrays, params = load_arrays(path, (TOP_K_ITEMS_NAME, TOP_K_USERS_NAME))
+
+    return arrays[TOP_K_ITEMS_NAME], arrays[TOP_K_USERS_NAME], params.get("model_signature")
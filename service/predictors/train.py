@@ -0,0 +1,305 @@
+"""Training of ALS with explicit features fitted together with latent ones
+
+Usage:
+    python -m service.predictors.train [--mode M] [--iterations N]
+
+Modes:
+    full         factors are initialized randomly and all of them are solved
+    warm         factors of known users and items start from previous ones
+    incremental  only users and items with changed interactions are solved
+
+Previous factors and id maps are read from ALS artifacts, which are
+rewritten after training together with the model and the top k table.
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+from implicit import _als
+from implicit.als import AlternatingLeastSquares
+from rectools.dataset import Dataset
+from rectools.models import ImplicitALSWrapperModel
+from scipy import sparse
+
+from ..log import app_logger, setup_logging
+from ..settings import ServiceConfig, get_config
+from .artifacts import ALSArtifacts, export_als_artifacts, get_model_signature, load_als_artifacts
+from .id_index import MISSING_ID, IdIndex
+from .topk import build_top_k_table, save_top_k_table
+from .utils import get_data_with_features, get_predictors_config
+
+TRAINING_MODES = ("full", "warm", "incremental")
+
+
+class ALSLayout(NamedTuple):
+    """Columns of factors: user ones are [explicit, latent, paired],
+    item ones are [paired, latent, explicit]"""
+
+    user_explicit: np.ndarray
+    item_explicit: np.ndarray
+
+    @property
+    def n_user_explicit(self) -> int:
+        return self.user_explicit.shape[1]
+
+    @property
+    def n_item_explicit(self) -> int:
+        return self.item_explicit.shape[1]
+
+    def reset_user_explicit(self, user_factors: np.ndarray, rows: Optional[np.ndarray] = None) -> None:
+        selected: Any = slice(None) if rows is None else rows
+        user_factors[selected, : self.n_user_explicit] = self.user_explicit[selected]
+
+    def reset_item_explicit(self, item_factors: np.ndarray, rows: Optional[np.ndarray] = None) -> None:
+        selected: Any = slice(None) if rows is None else rows
+        item_factors[selected, item_factors.shape[1] - self.n_item_explicit :] = self.item_explicit[selected]
+
+
+def get_layout(dataset: Dataset) -> ALSLayout:
+    n_users, n_items = dataset.get_user_item_matrix().shape
+    user_explicit = np.zeros((n_users, 0), dtype=np.float32)
+    if dataset.user_features is not None:
+        user_explicit = dataset.user_features.get_dense().astype(np.float32)
+    item_explicit = np.zeros((n_items, 0), dtype=np.float32)
+    if dataset.item_features is not None:
+        item_explicit = dataset.item_features.get_dense().astype(np.float32)
+
+    return ALSLayout(user_explicit, item_explicit)
+
+
+def init_factors(
+    layout: ALSLayout,
+    n_factors: int,
+    random_state: Optional[int],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Initialize factors the same way as rectools does"""
+    n_latent = n_factors - layout.n_user_explicit - layout.n_item_explicit
+    if n_latent < 0:
+        raise ValueError(f"{n_factors} factors are less than number of explicit features")
+
+    rng = np.random.RandomState(random_state)
+    n_users, n_items = len(layout.user_explicit), len(layout.item_explicit)
+    user_factors = np.hstack(
+        (
+            layout.user_explicit,
+            rng.rand(n_users, n_latent) * 0.01,
+            np.zeros((n_users, layout.n_item_explicit)),
+        )
+    ).astype(np.float32)
+    item_factors = np.hstack(
+        (
+            np.zeros((n_items, layout.n_user_explicit)),
+            rng.rand(n_items, n_latent) * 0.01,
+            layout.item_explicit,
+        )
+    ).astype(np.float32)
+
+    return user_factors, item_factors
+
+
+def warm_start_factors(
+    previous: ALSArtifacts,
+    users: IdIndex,
+    items: IdIndex,
+    user_factors: np.ndarray,
+    item_factors: np.ndarray,
+) -> None:
+    """Copy previous factors of known users and items in place"""
+    for factors, index, previous_index, previous_factors in (
+        (user_factors, users, previous.users, previous.model.model.user_factors),
+        (item_factors, items, previous.items, previous.model.model.item_factors),
+    ):
+        previous_rows = previous_index.to_internal(index.external_ids)
+        known = np.flatnonzero(previous_rows != MISSING_ID)
+        factors[known] = previous_factors[previous_rows[known]]
+
+
+def get_changed_rows(
+    previous: ALSArtifacts,
+    users: IdIndex,
+    items: IdIndex,
+    ui_csr: sparse.csr_matrix,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Get internal ids of users and items whose interactions
+    (or their weights) differ from the previous ones"""
+    previous_coo = previous.ui_csr.tocoo()
+    rows = users.to_internal(previous.users.external_ids)[previous_coo.row]
+    cols = items.to_internal(previous.items.external_ids)[previous_coo.col]
+    kept = (rows != MISSING_ID) & (cols != MISSING_ID)
+    aligned = sparse.csr_matrix(
+        (previous_coo.data[kept], (rows[kept], cols[kept])),
+        shape=ui_csr.shape,
+        dtype=np.float32,
+    )
+
+    diff = (ui_csr - aligned).tocoo()
+    changed = diff.data != 0
+    # Users lost interactions with items which left the dataset
+    dropped_users = rows[(rows != MISSING_ID) & (cols == MISSING_ID)]
+
+    return np.union1d(diff.row[changed], dropped_users), np.unique(diff.col[changed])
+
+
+def fit_als(
+    model: AlternatingLeastSquares,
+    ui_csr: sparse.csr_matrix,
+    user_factors: np.ndarray,
+    item_factors: np.ndarray,
+    layout: ALSLayout,
+    users_to_solve: Optional[np.ndarray] = None,
+    items_to_solve: Optional[np.ndarray] = None,
+) -> List[Dict[str, Any]]:
+    """Run ALS iterations in place, only given rows are solved if set.
+
+    Every iteration is logged with its time and training loss.
+    """
+    ui_csr = ui_csr.astype(np.float32)
+    iu_csr = ui_csr.T.tocsr()
+    # Rows of interactions matrices are sliced once, not on every iteration
+    ui_rows = ui_csr if users_to_solve is None else ui_csr[users_to_solve]
+    iu_rows = iu_csr if items_to_solve is None else iu_csr[items_to_solve]
+
+    history = []
+    for iteration in range(model.iterations):
+        started_at = time.perf_counter()
+        _solve_rows(model, ui_rows, user_factors, item_factors, users_to_solve)
+        layout.reset_user_explicit(user_factors, users_to_solve)
+        _solve_rows(model, iu_rows, item_factors, user_factors, items_to_solve)
+        layout.reset_item_explicit(item_factors, items_to_solve)
+        elapsed = time.perf_counter() - started_at
+
+        loss = _als.calculate_loss(  # pylint: disable=c-extension-no-member
+            ui_csr, user_factors, item_factors, model.regularization, num_threads=model.num_threads
+        )
+        history.append({"iteration": iteration, "seconds": elapsed, "loss": float(loss)})
+        app_logger.info(f"ALS iteration {iteration}: {elapsed:.3f}s, loss {loss:.6f}")
+
+    return history
+
+
+def _solve_rows(
+    model: AlternatingLeastSquares,
+    xy_rows: sparse.csr_matrix,
+    x_factors: np.ndarray,
+    y_factors: np.ndarray,
+    rows: Optional[np.ndarray],
+) -> None:
+    if rows is None:
+        model.solver(xy_rows, x_factors, y_factors, model.regularization, model.num_threads)
+        return
+
+    # Conjugate gradient starts from current factors of the rows
+    x_rows = np.ascontiguousarray(x_factors[rows])
+    model.solver(xy_rows, x_rows, y_factors, model.regularization, model.num_threads)
+    x_factors[rows] = x_rows
+
+
+def train_als(
+    config: ServiceConfig,
+    mode: str,
+    iterations: Optional[int] = None,
+    num_threads: int = 0,
+) -> List[Dict[str, Any]]:
+    """Train ALS on the current dataset and save it for the service"""
+    model_cfg = get_predictors_config(config)["als"]
+    model_path = os.path.join(config.predictors_path, model_cfg["model_filename"])
+    artifacts_path = os.path.join(config.predictors_path, model_cfg["artifacts"])
+
+    dataset, users = get_data_with_features(
+        model_cfg["interactions"],
+        model_cfg["users_features"],
+        model_cfg["items_features"],
+        config,
+    )
+    items = IdIndex(dataset.item_id_map.external_ids)
+    ui_csr = dataset.get_user_item_matrix().astype(np.float32)
+    layout = get_layout(dataset)
+
+    # Hyperparameters are kept from the previous model
+    previous_model: AlternatingLeastSquares = joblib.load(model_path).model
+    model = AlternatingLeastSquares(
+        factors=previous_model.factors,
+        regularization=previous_model.regularization,
+        iterations=previous_model.iterations if iterations is None else iterations,
+        use_cg=True,
+        num_threads=num_threads,
+        random_state=previous_model.random_state,
+    )
+    user_factors, item_factors = init_factors(layout, model.factors, model.random_state)
+
+    previous = _load_previous(artifacts_path, model.factors, mode)
+    users_to_solve = items_to_solve = None
+    if previous is None:
+        mode = "full"
+    else:
+        warm_start_factors(previous, users, items, user_factors, item_factors)
+        if mode == "incremental":
+            users_to_solve, items_to_solve = get_changed_rows(previous, users, items, ui_csr)
+            app_logger.info(f"Solving {len(users_to_solve)} users and {len(items_to_solve)} items")
+        # Explicit columns of known users and items could change too
+        layout.reset_user_explicit(user_factors)
+        layout.reset_item_explicit(item_factors)
+
+    app_logger.info(f"Training ALS ({mode}) on {ui_csr.nnz} interactions")
+    history = fit_als(model, ui_csr, user_factors, item_factors, layout, users_to_solve, items_to_solve)
+
+    model.user_factors = user_factors
+    model.item_factors = item_factors
+    wrapper = ImplicitALSWrapperModel(model, fit_features_together=True)
+    wrapper.model = model
+    wrapper.is_fitted = True
+    _save_model(model_path, wrapper)
+    model_signature = get_model_signature(model_path)
+    export_als_artifacts(artifacts_path, model, ui_csr, users, items, model_signature)
+
+    # Top k table is stale after training and is rebuilt if used
+    top_k_name = model_cfg.get("top_k_table")
+    if top_k_name is not None:
+        table = build_top_k_table(user_factors, item_factors, ui_csr, items.external_ids, config.k_recs)
+        save_top_k_table(os.path.join(config.predictors_path, top_k_name), table, users.external_ids, model_signature)
+
+    return history
+
+
+def _load_previous(artifacts_path: str, n_factors: int, mode: str) -> Optional[ALSArtifacts]:
+    if mode == "full":
+        return None
+    if not os.path.isdir(artifacts_path):
+        app_logger.warning(f"ALS artifacts {artifacts_path} not found, ALS will be trained from scratch")
+        return None
+
+    previous = load_als_artifacts(artifacts_path)
+    if previous.model.model.user_factors.shape[1] != n_factors:
+        app_logger.warning("Number of ALS factors changed, ALS will be trained from scratch")
+        return None
+
+    return previous
+
+
+def _save_model(path: str, model: ImplicitALSWrapperModel) -> None:
+    # Model is replaced at once, so the service never reads a partial file
+    tmp_path = f"{path}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train ALS model")
+    parser.add_argument("--mode", choices=TRAINING_MODES, default="incremental", help="What factors are solved")
+    parser.add_argument("--iterations", type=int, default=None, help="Iterations, previous model's by default")
+    parser.add_argument("--num-threads", type=int, default=0, help="Solver threads, 0 means all cores")
+
+    args = parser.parse_args(argv)
+    config = get_config()
+    setup_logging(config)
+
+    history = train_als(config, args.mode, args.iterations, args.num_threads)
+    total = sum(stats["seconds"] for stats in history)
+    app_logger.info(f"ALS trained in {total:.3f}s, final loss {history[-1]['loss']:.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
+import copy
+import mmap
 import os
-from typing import Any, List, Tuple
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Set, Tuple
 
+import numpy as np
 import pandas as pd
 import yaml
-from rectools import Columns
 from rectools.dataset import Dataset
+from scipy import sparse
 
 from ..settings import ServiceConfig
+from .id_index import IdIndex
+
+# Section of predictors config with settings of the registry, not a model
+REGISTRY_SECTION = "registry"
+# Python objects whose own size is counted by `estimate_memory_usage`
+PYTHON_BUILTINS = (dict, list, tuple, str, bytes, int, float)
 
 
 def get_items_list(items_dataset_name: str, global_cfg: ServiceConfig) -> List[str]:
@@ -16,11 +27,11 @@ def get_items_list(items_dataset_name: str, global_cfg: ServiceConfig) -> List[s
     return df["id"].unique()
 
 
-def get_data(dataset_name: str, global_cfg: ServiceConfig) -> Tuple[Dataset, List[int]]:
+def get_data(dataset_name: str, global_cfg: ServiceConfig) -> Tuple[Dataset, IdIndex]:
     """Get data for models trained without features"""
     df = pd.read_csv(os.path.join(global_cfg.dataset_path, dataset_name))
     dataset = Dataset.construct(df)
-    users = df[Columns.User].unique()
+    users = IdIndex(dataset.user_id_map.external_ids)
 
     return dataset, users
 
@@ -30,7 +41,7 @@ def get_data_with_features(
     users_features_dataset_name: str,
     items_features_dataset_name: str,
     global_cfg: ServiceConfig,
-) -> Tuple[Dataset, List[int]]:
+) -> Tuple[Dataset, IdIndex]:
     """Get data for models trained with features"""
     interactions = pd.read_csv(os.path.join(global_cfg.dataset_path, interactions_dataset_name))
     users_features = pd.read_csv(os.path.join(global_cfg.dataset_path, users_features_dataset_name))
@@ -50,7 +61,7 @@ def get_data_with_features(
         ],
     )
 
-    users = interactions[Columns.User].unique()
+    users = IdIndex(dataset.user_id_map.external_ids)
 
     return dataset, users
 
@@ -62,14 +73,79 @@ def get_cold_user_predictions_from_offline(cold_dataset: str, global_cfg: Servic
     return df
 
 
+def get_predictors_config_path(global_cfg: ServiceConfig) -> str:
+    """Get path of predictors config file"""
+    return os.path.join(
+        global_cfg.root_path,
+        "service/predictors/predictors_config.yaml",
+    )
+
+
 def get_predictors_config(global_cfg: ServiceConfig) -> Any:
     """Get config"""
-    with open(
-        os.path.join(
-            global_cfg.root_path,
-            "service/predictors/predictors_config.yaml",
-        ),
-        encoding="ascii",
-    ) as f:
+    # Config is parsed once, callers get their own copy
+    return copy.deepcopy(_read_predictors_config(get_predictors_config_path(global_cfg)))
+
+
+def clear_predictors_config_cache() -> None:
+    """Make the next call of `get_predictors_config` read edited file"""
+    _read_predictors_config.cache_clear()
+
+
+def get_models_configs(global_cfg: ServiceConfig) -> Dict[str, Dict[str, Any]]:
+    """Get configs of all registered models by their names"""
+    predictors_config = get_predictors_config(global_cfg)
+    return {name: model_cfg for name, model_cfg in predictors_config.items() if name != REGISTRY_SECTION}
+
+
+@lru_cache(maxsize=None)
+def _read_predictors_config(config_path: str) -> Any:
+    with open(config_path, encoding="ascii") as f:
         predictors_config = yaml.safe_load(f)
+
+    # Model variant overrides only some keys of the model it extends
+    for name, model_cfg in predictors_config.items():
+        if name != REGISTRY_SECTION and "extends" in model_cfg:
+            predictors_config[name] = {**predictors_config[model_cfg.pop("extends")], **model_cfg}
     return predictors_config
+
+
+def estimate_memory_usage(obj: Any, max_depth: int = 8) -> int:
+    """Estimate memory (in bytes) held by arrays, frames and python objects.
+    Memory-mapped arrays are skipped as they are shared between processes"""
+    return _estimate_memory_usage(obj, max_depth, set())
+
+
+def _estimate_memory_usage(value: Any, depth: int, visited: Set[int]) -> int:
+    if id(value) in visited or depth < 0:
+        return 0
+    visited.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        return 0 if _is_memory_mapped(value) else value.nbytes
+    if sparse.issparse(value):
+        return sum(
+            _estimate_memory_usage(getattr(value, name), depth - 1, visited) for name in ("data", "indices", "indptr")
+        )
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        return int(np.sum(value.memory_usage(deep=True)))
+
+    size = 0
+    if isinstance(value, PYTHON_BUILTINS) or value is None:
+        size = sys.getsizeof(value)
+    items: Iterable = ()
+    if isinstance(value, dict):
+        items = value.values()
+    elif isinstance(value, (list, tuple)):
+        items = value
+    # Attributes of objects and of list subclasses (`PreEncodedList`)
+    if hasattr(value, "__dict__"):
+        size += _estimate_memory_usage(vars(value), depth - 1, visited)
+    return size + sum(_estimate_memory_usage(item, depth - 1, visited) for item in items)
+
+
+def _is_memory_mapped(array: np.ndarray) -> bool:
+    base: Any = array
+    while isinstance(base, np.ndarray):
+        base = base.base
+    return isinstance(base, mmap.mmap)
@@ -1,34 +1,159 @@
-from time import time
+import os
+from contextlib import contextmanager
+from time import perf_counter, time
+from typing import Dict, Iterator, Optional, Tuple
 
 import psutil
 from fastapi import FastAPI, Request, Response
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest, multiprocess
 from prometheus_client.core import CollectorRegistry
 
+# Workers write metrics to this directory and /metrics aggregates them
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+# Process metrics are refreshed at most once per this many seconds
+PROCESS_METRICS_INTERVAL = 1.0
+STAGE_TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+REQUEST_LABELS = ("route", "method", "status", "model_name", "user_temperature")
 
-def add_prometheus_middleware(app: FastAPI):
-    registry = CollectorRegistry()
-    REQUEST_COUNT = Counter("request_count", "App Request Count", registry=registry)
-    RESPONSE_TIME = Histogram("response_time", "Response time", registry=registry)
-    CPU_USAGE = Gauge("cpu_usage", "CPU usage", registry=registry)
-    MEMORY_USAGE = Gauge("memory_usage", "Memory usage", registry=registry)
+registry = CollectorRegistry()
+REQUEST_COUNT = Counter("request_count", "App Request Count", REQUEST_LABELS, registry=registry)
+RESPONSE_TIME = Histogram("response_time", "Response time", REQUEST_LABELS, registry=registry)
+STAGE_TIME = Histogram(
+    "inference_stage_time",
+    "Time of request processing stages (seconds)",
+    ["model_name", "stage"],
+    buckets=STAGE_TIME_BUCKETS,
+    registry=registry,
+)
+PREDICTOR_LOAD_TIME = Gauge(
+    "predictor_load_time",
+    "Predictor load time (seconds)",
+    ["model_name"],
+    registry=registry,
+    multiprocess_mode="liveall",
+)
+PREDICTOR_MEMORY_USAGE = Gauge(
+    "predictor_memory_usage",
+    "Predictor memory usage (bytes)",
+    ["model_name"],
+    registry=registry,
+    multiprocess_mode="liveall",
+)
+CACHE_HITS = Counter("cache_hits", "Result cache hits", ["model_name"], registry=registry)
+CACHE_MISSES = Counter("cache_misses", "Result cache misses", ["model_name"], registry=registry)
+CACHE_EVICTIONS = Counter("cache_evictions", "Result cache evictions", ["model_name"], registry=registry)
+DEGRADED_RESPONSES = Counter(
+    "degraded_responses",
+    "Responses with fallback recommendations because of model overload",
+    ["model_name", "reason"],
+    registry=registry,
+)
+IN_FLIGHT_REQUESTS = Gauge(
+    "in_flight_requests",
+    "Model calls in progress",
+    ["model_name"],
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped", "Log records dropped because of full queue", ["logger"], registry=registry
+)
 
-    @app.middleware("http")
-    async def monitor_requests(request: Request, call_next):
-        REQUEST_COUNT.inc()
+# Workers are forked from the master, so the process is kept with its pid
+_process: Optional[psutil.Process] = None
+_process_metrics_updated_at = 0.0
+# Unlabelled gauges open their multiprocess files when they are created,
+# so they are created by the first worker update, not on import
+_process_gauges: Optional[Tuple[Gauge, Gauge]] = None
 
-        start_time = time()
-        response = await call_next(request)
-        latency = time() - start_time
 
-        RESPONSE_TIME.observe(latency)
+@contextmanager
+def observe_stage(model_name: str, stage: str) -> Iterator[None]:
+    """Measure time of request processing stage"""
+    started_at = perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_TIME.labels(model_name=model_name, stage=stage).observe(perf_counter() - started_at)
 
-        return response
 
+def set_request_labels(request: Request, model_name: str, user_temperature: str = "") -> None:
+    """Label request metrics with the model and user (warm/cold)"""
+    request.state.model_name = model_name
+    request.state.user_temperature = user_temperature
+
+
+def update_process_metrics() -> None:
+    global _process_metrics_updated_at  # pylint: disable=global-statement
+
+    now = time()
+    if now - _process_metrics_updated_at < PROCESS_METRICS_INTERVAL:
+        return
+    _process_metrics_updated_at = now
+
+    process = get_process()
+    cpu_usage, memory_usage = _get_process_gauges()
+    cpu_usage.set(process.cpu_percent())
+    memory_usage.set(process.memory_info().rss)
+
+
+def get_process() -> psutil.Process:
+    """Get the current process, it is created again in a forked one"""
+    global _process  # pylint: disable=global-statement
+
+    if _process is None or _process.pid != os.getpid():
+        _process = psutil.Process()
+    return _process
+
+
+def _get_process_gauges() -> Tuple[Gauge, Gauge]:
+    global _process_gauges  # pylint: disable=global-statement
+
+    if _process_gauges is None:
+        _process_gauges = (
+            Gauge("cpu_usage", "CPU usage of the worker process", registry=registry, multiprocess_mode="liveall"),
+            Gauge(
+                "memory_usage",
+                "Resident memory of the worker process (bytes)",
+                registry=registry,
+                multiprocess_mode="liveall",
+            ),
+        )
+    return _process_gauges
+
+
+def _request_labels(request: Request, status_code: int) -> Dict[str, str]:
+    # Route template instead of the path keeps labels cardinality bounded
+    route = request.scope.get("route")
+    return {
+        "route": getattr(route, "path", "unmatched"),
+        "method": request.method,
+        # Handlers of app exceptions respond with HTTPStatus members
+        "status": str(int(status_code)),
+        "model_name": getattr(request.state, "model_name", ""),
+        "user_temperature": getattr(request.state, "user_temperature", ""),
+    }
+
+
+def observe_request(request: Request, status_code: int, latency: float) -> None:
+    """Count finished request and its latency"""
+    labels = _request_labels(request, status_code)
+    REQUEST_COUNT.labels(**labels).inc()
+    RESPONSE_TIME.labels(**labels).observe(latency)
+    update_process_metrics()
+
+
+def add_metrics_endpoint(app: FastAPI):
     @app.get("/metrics")
     async def get_metrics():
         """Prometheus endpoint"""
-        CPU_USAGE.set(psutil.cpu_percent())
-        MEMORY_USAGE.set(psutil.virtual_memory().used / 1024 / 1024 / 1024)
+        update_process_metrics()
+
+        if MULTIPROC_DIR_ENV in os.environ:
+            # Metrics of all workers, not only the one serving the scrape
+            scrape_registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(scrape_registry)
+        else:
+            scrape_registry = registry
 
-        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+        return Response(generate_latest(scrape_registry), media_type=CONTENT_TYPE_LATEST)
@@ -1,37 +1,78 @@
-import json
 import typing as tp
 from http import HTTPStatus
 
 import orjson
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 
 from service.models import Error
 
 
-class EnhancedJSONEncoder(json.JSONEncoder):
-    def default(self, o: tp.Any) -> tp.Any:
-        if isinstance(o, BaseModel):
-            return o.dict()
-        try:
-            orjson.dumps(o)
-        except TypeError:
-            return str(o)
-        return super().default(o)
+def _default(o: tp.Any) -> tp.Any:
+    # Called by orjson only for objects it can't serialize itself
+    if isinstance(o, BaseModel):
+        return o.dict()
+    return str(o)
 
 
 class DataclassJSONResponse(JSONResponse):
     media_type = "application/json"
 
     def render(self, content: tp.Any) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-            cls=EnhancedJSONEncoder,
-        ).encode("utf-8")
+        return orjson.dumps(content, default=_default)
+
+
+class EncodedJSONResponse(Response):
+    """Response with content already encoded to JSON bytes"""
+
+    media_type = "application/json"
+
+
+class PreEncodedList(list):
+    """List of predictor output which also keeps its JSON encoding,
+    so static payloads (e.g. cold users recos) are encoded once"""
+
+    def __init__(self, items: tp.Iterable[tp.Any]) -> None:
+        super().__init__(items)
+        self.encoded = orjson.dumps(self)
+
+
+def encode_items(items: tp.List[tp.Any]) -> bytes:
+    if isinstance(items, PreEncodedList):
+        return items.encoded
+    return orjson.dumps(items)
+
+
+def encode_reco(user_id: int, items: tp.List[tp.Any]) -> bytes:
+    """Encode `RecoResponse` without validation of trusted predictor output"""
+    return b'{"user_id":' + str(user_id).encode() + b',"items":' + encode_items(items) + b"}"
+
+
+def encode_batch_reco(user_ids: tp.Sequence[int], recos: tp.Sequence[tp.List[tp.Any]]) -> bytes:
+    """Encode `BatchRecoResponse`"""
+    return b'{"recos":[' + b",".join(encode_reco(user_id, reco) for user_id, reco in zip(user_ids, recos)) + b"]}"
+
+
+def encode_explain(p: int, explanation: str) -> bytes:
+    """Encode `ExplainResponse`"""
+    return orjson.dumps({"p": p, "explanation": explanation})
+
+
+def encode_batch_explain(
+    user_id: int,
+    item_ids: tp.Sequence[int],
+    explanations: tp.Sequence[tp.Tuple[int, str]],
+) -> bytes:
+    """Encode `BatchExplainResponse`"""
+    return orjson.dumps(
+        {
+            "user_id": user_id,
+            "explanations": [
+                {"p": p, "explanation": explanation, "item_id": item_id}
+                for item_id, (p, explanation) in zip(item_ids, explanations)
+            ],
+        }
+    )
 
 
 def create_response(
@@ -1,5 +1,6 @@
 # mypy: disable-error-code="call-arg"
 import os
+from typing import Dict, Optional
 
 from pydantic import BaseSettings
 
@@ -12,14 +13,69 @@ class Config(BaseSettings):
 class LogConfig(Config):
     level: str = "INFO"
     datetime_format: str = "%Y-%m-%d %H:%M:%S"
+    use_queue: bool = True
+    queue_size: int = 10_000
+    # Share of INFO records kept per logger, e.g. {"access": 0.1}
+    sample_rates: Dict[str, float] = {}
 
     class Config:
         case_sensitive = False
         fields = {
             "level": {"env": ["log_level"]},
+            "use_queue": {"env": ["log_use_queue"]},
+            "queue_size": {"env": ["log_queue_size"]},
+            "sample_rates": {"env": ["log_sample_rates"]},
         }
 
 
+class BatchingConfig(Config):
+    enabled: bool = True
+    max_batch_size: int = 64
+    max_wait_ms: float = 2.0
+
+    class Config:
+        case_sensitive = False
+        env_prefix = "batching_"
+
+
+class CacheConfig(Config):
+    enabled: bool = True
+    max_entries: int = 100_000
+    max_memory_mb: float = 256.0
+    ttl_seconds: float = 300.0
+
+    class Config:
+        case_sensitive = False
+        env_prefix = "cache_"
+
+
+class ReloadConfig(Config):
+    watch: bool = False
+    poll_interval_seconds: float = 10.0
+    max_previous_versions: int = 1
+    # Admin endpoints are disabled unless the token is set
+    admin_token: Optional[str] = None
+    # Admin commands are passed to all workers through this directory
+    commands_dir: Optional[str] = None
+
+    class Config:
+        case_sensitive = False
+        env_prefix = "reload_"
+
+
+class AdmissionConfig(Config):
+    enabled: bool = True
+    # Calls are shed while average latency of a model is over the budget
+    latency_budget_ms: float = 200.0
+    timeout_ms: float = 1000.0
+    max_in_flight: int = 256
+    ewma_alpha: float = 0.2
+
+    class Config:
+        case_sensitive = False
+        env_prefix = "admission_"
+
+
 class ServiceConfig(Config):
     service_name: str = "reco_service"
     k_recs: int = 10
@@ -29,9 +85,17 @@ class ServiceConfig(Config):
     explanation_data_path: str
 
     log_config: LogConfig
+    batching_config: BatchingConfig
+    cache_config: CacheConfig
+    reload_config: ReloadConfig
+    admission_config: AdmissionConfig
 
 
 def get_config() -> ServiceConfig:
     return ServiceConfig(
         log_config=LogConfig(),
+        batching_config=BatchingConfig(),
+        cache_config=CacheConfig(),
+        reload_config=ReloadConfig(),
+        admission_config=AdmissionConfig(),
     )
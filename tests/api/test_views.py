@@ -1,11 +1,33 @@
+import json
 from http import HTTPStatus
+from pathlib import Path
 
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from fastapi import FastAPI
 from starlette.testclient import TestClient
 
+from service.api.app import create_app
+from service.predictors import admission, constructor
+from service.predictors.admission import AdmissionController
 from service.settings import ServiceConfig
 
 GET_RECO_PATH = "/reco/{model_name}/{user_id}"
 GET_EXPLANATION_PATH = "/explain/{model_name}/{user_id}/{item_id}"
+GET_BATCH_RECO_PATH = "/reco/{model_name}/batch"
+GET_BATCH_EXPLANATION_PATH = "/explain/{model_name}/{user_id}"
+RELOAD_PATH = "/admin/reload/{model_name}"
+ROLLBACK_PATH = "/admin/rollback/{model_name}"
+FOLD_IN_PATH = "/fold_in/{model_name}/{user_id}"
+ADMIN_HEADERS = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture(name="admin_client")
+def fixture_admin_client(service_config: ServiceConfig, tmp_path: Path) -> TestClient:
+    reload_config = service_config.reload_config.copy(
+        update={"admin_token": ADMIN_HEADERS["X-Admin-Token"], "commands_dir": str(tmp_path)}
+    )
+    return TestClient(app=create_app(service_config.copy(update={"reload_config": reload_config})))
 
 
 def test_health(
@@ -42,6 +64,45 @@ def test_get_reco_for_unknown_user(
     assert response.json()["errors"][0]["error_key"] == "user_not_found"
 
 
+def test_get_batch_reco_success(
+    client: TestClient,
+    service_config: ServiceConfig,
+) -> None:
+    user_ids = [555088, 6, 721985]  # warm, cold and warm users from mock data
+    with client:
+        single_recos = [
+            client.get(GET_RECO_PATH.format(model_name="als", user_id=user_id)).json() for user_id in user_ids
+        ]
+        response = client.post(GET_BATCH_RECO_PATH.format(model_name="als"), json={"user_ids": user_ids})
+    assert response.status_code == HTTPStatus.OK
+    recos = response.json()["recos"]
+    assert recos == single_recos
+    assert all(len(reco["items"]) == service_config.k_recs for reco in recos)
+
+
+def test_get_batch_reco_stream(
+    client: TestClient,
+) -> None:
+    user_ids = [555088, 6]
+    path = GET_BATCH_RECO_PATH.format(model_name="als") + "?stream=true"
+    with client:
+        response = client.post(path, json={"user_ids": user_ids})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["user_id"] for line in lines] == user_ids
+
+
+def test_get_batch_reco_for_unknown_user(
+    client: TestClient,
+) -> None:
+    path = GET_BATCH_RECO_PATH.format(model_name="random")
+    with client:
+        response = client.post(path, json={"user_ids": [1, 10**10]})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json()["errors"][0]["error_key"] == "user_not_found"
+
+
 def test_get_explanation_for_als_for_warm_user_success(client: TestClient) -> None:
     user_id = 555088  # warm user's user_id from mock data
     item_id = 12173  # item_id from mock data
@@ -102,3 +163,152 @@ def test_get_explanation_for_unknown_item(client: TestClient) -> None:
         response = client.get(path)
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert response.json()["errors"][0]["error_key"] == "item_not_found"
+
+
+def test_explain_batch_matches_single_explanations(client: TestClient) -> None:
+    user_id = 555088  # warm user's user_id from mock data
+    item_ids = [12173, 15297]  # item_ids from mock data
+    path = GET_BATCH_EXPLANATION_PATH.format(model_name="als", user_id=user_id)
+    with client:
+        response = client.post(path, json={"item_ids": item_ids})
+        single = [
+            client.get(GET_EXPLANATION_PATH.format(model_name="als", user_id=user_id, item_id=item_id)).json()
+            for item_id in item_ids
+        ]
+    assert response.status_code == HTTPStatus.OK
+    explanations = response.json()["explanations"]
+    assert [explanation["item_id"] for explanation in explanations] == item_ids
+    assert [{"p": e["p"], "explanation": e["explanation"]} for e in explanations] == single
+
+
+def test_explain_batch_defaults_to_recommendations(client: TestClient) -> None:
+    user_id = 6  # cold user's user_id from mock data
+    path = GET_BATCH_EXPLANATION_PATH.format(model_name="als", user_id=user_id)
+    with client:
+        reco = client.get(GET_RECO_PATH.format(model_name="als", user_id=user_id)).json()
+        response = client.post(path)
+    assert response.status_code == HTTPStatus.OK
+    explained_items = [explanation["item_id"] for explanation in response.json()["explanations"]]
+    assert explained_items
+    assert set(explained_items) <= set(reco["items"])
+
+
+def test_explain_by_model_without_explanations(client: TestClient) -> None:
+    user_id = 555088  # warm user's user_id from mock data
+    item_id = 12173  # item_id from mock data
+    with client:
+        responses = [
+            client.get(GET_EXPLANATION_PATH.format(model_name="lightfm", user_id=user_id, item_id=item_id)),
+            client.post(GET_BATCH_EXPLANATION_PATH.format(model_name="lightfm", user_id=user_id)),
+        ]
+    for response in responses:
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json()["errors"][0]["error_key"] == "not_supported"
+
+
+def test_reload_and_rollback_model(admin_client: TestClient) -> None:
+    constructor.previous_predictors.clear()
+    with admin_client:
+        no_previous_response = admin_client.post(ROLLBACK_PATH.format(model_name="random"), headers=ADMIN_HEADERS)
+        reload_response = admin_client.post(RELOAD_PATH.format(model_name="random"), headers=ADMIN_HEADERS)
+        reloaded = constructor.predictors["random"]
+        rollback_response = admin_client.post(ROLLBACK_PATH.format(model_name="random"), headers=ADMIN_HEADERS)
+    assert no_previous_response.status_code == HTTPStatus.NOT_FOUND
+    assert no_previous_response.json()["errors"][0]["error_key"] == "model_version_not_found"
+    assert reload_response.status_code == HTTPStatus.OK
+    assert reload_response.json() == {"model_name": "random", "previous_versions": 1}
+    assert rollback_response.status_code == HTTPStatus.OK
+    assert rollback_response.json() == {"model_name": "random", "previous_versions": 0}
+    assert constructor.predictors["random"] is not reloaded
+
+
+def test_reload_requires_admin_token(client: TestClient, admin_client: TestClient) -> None:
+    path = RELOAD_PATH.format(model_name="random")
+    with client:
+        disabled_response = client.post(path, headers=ADMIN_HEADERS)
+    with admin_client:
+        forbidden_response = admin_client.post(path, headers={"X-Admin-Token": "wrong"})
+        response = admin_client.post(path, headers=ADMIN_HEADERS)
+    assert disabled_response.status_code == HTTPStatus.FORBIDDEN
+    assert forbidden_response.status_code == HTTPStatus.FORBIDDEN
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_metrics_are_labelled_by_route_model_and_user_temperature(client: TestClient) -> None:
+    with client:
+        client.get(GET_RECO_PATH.format(model_name="als", user_id=555088))
+        response = client.get("/metrics")
+    assert response.status_code == HTTPStatus.OK
+    assert (
+        'request_count_total{method="GET",model_name="als",route="/reco/{model_name}/{user_id}",'
+        + 'status="200",user_temperature="warm"}'
+    ) in response.text
+    assert 'inference_stage_time_count{model_name="als",stage="serialization"}' in response.text
+
+
+def test_app_exceptions_are_labelled_by_numeric_status(client: TestClient) -> None:
+    with client:
+        client.get(GET_RECO_PATH.format(model_name="unknown", user_id=1))
+        metrics = client.get("/metrics").text
+    assert (
+        'request_count_total{method="GET",model_name="",route="/reco/{model_name}/{user_id}",'
+        + 'status="404",user_temperature=""}'
+    ) in metrics
+
+
+def test_unhandled_exception_is_converted_to_server_error(app: FastAPI) -> None:
+    async def fail() -> None:
+        raise RuntimeError("boom")
+
+    app.add_api_route("/fail", fail)
+    with TestClient(app=app, raise_server_exceptions=False) as client:
+        response = client.get("/fail")
+        metrics = client.get("/metrics").text
+    assert response.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
+    assert response.json() == {
+        "errors": [{"error_key": "server_error", "error_message": "Internal Server Error", "error_loc": None}]
+    }
+    assert 'request_count_total{method="GET",model_name="",route="/fail",status="500",user_temperature=""}' in metrics
+
+
+def test_overloaded_model_serves_degraded_fallback(client: TestClient, monkeypatch: MonkeyPatch) -> None:
+    user_id = 555088  # warm user's user_id from mock data
+    overloaded = AdmissionController("als", latency_budget=0.1, timeout=1.0, max_in_flight=10, ewma_alpha=0.2)
+    overloaded.in_flight, overloaded.latency = 1, 1.0
+    monkeypatch.setattr(admission, "controllers", {"als": overloaded})
+
+    with client:
+        response = client.get(GET_RECO_PATH.format(model_name="als", user_id=user_id))
+        fallback = constructor.get_predictor("als").fallback_recommend(user_id)
+        metrics = client.get("/metrics").text
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["X-Degraded"] == "true"
+    assert response.json()["items"] == fallback
+    assert 'degraded_responses_total{model_name="als",reason="overload"}' in metrics
+
+
+def test_fold_in_updates_recommendations(client: TestClient) -> None:
+    user_id = 7  # cold user's user_id from mock data
+    body = {"item_ids": [12173, 15297], "weights": [3, 1]}
+    with client:
+        cold_response = client.get(GET_RECO_PATH.format(model_name="als", user_id=user_id))
+        fold_in_response = client.post(FOLD_IN_PATH.format(model_name="als", user_id=user_id), json=body)
+        reco_response = client.get(GET_RECO_PATH.format(model_name="als", user_id=user_id))
+        unsupported_response = client.post(FOLD_IN_PATH.format(model_name="random", user_id=user_id), json=body)
+        invalid_response = client.post(
+            FOLD_IN_PATH.format(model_name="als", user_id=user_id), json={"item_ids": [12173], "weights": [1, 2]}
+        )
+        unknown_item_response = client.post(
+            FOLD_IN_PATH.format(model_name="als", user_id=user_id), json={"item_ids": [10**9]}
+        )
+        empty_response = client.post(FOLD_IN_PATH.format(model_name="als", user_id=user_id), json={"item_ids": []})
+
+    assert fold_in_response.status_code == HTTPStatus.OK
+    # Result cached before fold-in is not served anymore
+    assert reco_response.json() == fold_in_response.json()
+    assert reco_response.json()["items"] != cold_response.json()["items"]
+    assert unsupported_response.status_code == HTTPStatus.BAD_REQUEST
+    assert invalid_response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert unknown_item_response.json()["errors"][0]["error_key"] == "item_not_found"
+    assert empty_response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from service.metrics.cross_validation import UsersKFoldPOut, evaluate_folds, exclude_users, group_by_users, leave_p_out
+
+
+def _popular(train: sparse.csr_matrix, test_users: np.ndarray, k: int) -> np.ndarray:
+    popular = np.argsort(-np.asarray(train.getnnz(axis=0)), kind="stable")[:k]
+    return np.tile(popular, (len(test_users), 1))
+
+
+def _interactions(n_users: int = 20, n_items: int = 15) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    user_ids = np.repeat(np.arange(n_users) * 10, 6)
+    return pd.DataFrame(
+        {
+            "user_id": user_ids,
+            "item_id": rng.integers(0, n_items, len(user_ids)),
+            "order": rng.permutation(len(user_ids)),
+        }
+    ).drop_duplicates(["user_id", "item_id"])
+
+
+def test_interactions_are_grouped_by_users_in_order() -> None:
+    interactions = pd.DataFrame({"user_id": [2, 1, 2, 2], "item_id": [5, 6, 7, 8], "order": [3, 0, 1, 2]})
+
+    grouped = group_by_users(interactions, order_column="order")
+
+    assert grouped.users.external_ids.tolist() == [2, 1]
+    assert grouped.items.to_external(grouped.ui_csr[0].indices).tolist() == [7, 8, 5]
+    assert leave_p_out(grouped.ui_csr, np.array([0]), p=2).toarray().tolist() == [[0, 0, 1, 1]]
+
+
+def test_folds_partition_users_with_local_random_state() -> None:
+    cv = UsersKFoldPOut(n_folds=3, p=2, random_state=1)
+
+    folds = list(cv.split(10))
+    np.random.seed(0)
+
+    assert [len(fold.test_users) for fold in folds] == [4, 3, 3]
+    assert sorted(np.concatenate([fold.test_users for fold in folds]).tolist()) == list(range(10))
+    assert all(np.array_equal(a.test_users, b.test_users) for a, b in zip(folds, cv.split(10)))
+
+
+def test_fold_train_excludes_test_users() -> None:
+    ui_csr = group_by_users(_interactions(), order_column="order").ui_csr
+    cv = UsersKFoldPOut(n_folds=4, p=2)
+    fold = next(cv.split(ui_csr.shape[0]))
+
+    train, test = cv.get_fold(ui_csr, fold)
+
+    assert train.shape == ui_csr.shape
+    assert train.getnnz(axis=1)[fold.test_users].sum() == 0
+    assert train.nnz + ui_csr[fold.test_users].nnz == ui_csr.nnz
+    assert (test.getnnz(axis=1) == 2).all()
+    assert exclude_users(ui_csr, np.array([], dtype=np.int64)).nnz == ui_csr.nnz
+
+
+def test_parallel_evaluation_matches_sequential() -> None:
+    ui_csr = group_by_users(_interactions(), order_column="order").ui_csr
+    cv = UsersKFoldPOut(n_folds=3, p=2)
+
+    expected = evaluate_folds(ui_csr, cv, _popular, k=5)
+    results = evaluate_folds(ui_csr, cv, _popular, k=5, n_jobs=2)
+
+    assert [result["fold"] for result in results] == [0, 1, 2]
+    for result, expected_result in zip(results, expected):
+        assert result == pytest.approx(expected_result)
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from rectools.metrics import MAP, Recall
+from scipy import sparse
+
+from service.metrics.ranking import calc_ranking_metrics, hit_relevance, truth_matrix, user_metrics
+from service.predictors.id_index import IdIndex
+
+K = 5
+
+
+def _random_data(n_users: int = 50, n_items: int = 30) -> tuple:
+    rng = np.random.default_rng(0)
+    truth = sparse.random(n_users, n_items, density=0.1, format="csr", random_state=0, dtype=np.float32)
+    truth.data[:] = 1
+    reco = np.stack([rng.choice(n_items, K, replace=False) for _ in range(n_users)])
+    return reco, truth
+
+
+def _naive_metrics(reco: np.ndarray, truth: sparse.csr_matrix) -> dict:
+    values: dict = {"mrr": [], "ndcg": [], "pfound": []}
+    for row, items in enumerate(reco):
+        relevant = set(truth[row].indices)
+        if not relevant:
+            continue
+        hits = [item in relevant for item in items]
+        values["mrr"].append(next((1 / (rank + 1) for rank, hit in enumerate(hits) if hit), 0))
+        ideal = sum(1 / np.log2(rank + 2) for rank in range(min(len(relevant), K)))
+        values["ndcg"].append(sum(hit / np.log2(rank + 2) for rank, hit in enumerate(hits)) / ideal)
+        p_found, p_look = 0.0, 1.0
+        for hit in hits:
+            p_found += p_look * hit
+            p_look *= (1 - hit) * 0.85
+        values["pfound"].append(p_found)
+    return {metric: np.mean(metric_values) for metric, metric_values in values.items()}
+
+
+def test_metrics_match_reference_implementations() -> None:
+    reco, truth = _random_data()
+    metrics = calc_ranking_metrics(reco, truth, k=K)
+
+    for metric, expected in _naive_metrics(reco, truth).items():
+        assert metrics[metric] == pytest.approx(expected, rel=1e-5)
+
+    reco_df = pd.DataFrame(
+        {
+            "user_id": np.repeat(np.arange(len(reco)), K),
+            "item_id": reco.ravel(),
+            "rank": np.tile(np.arange(1, K + 1), len(reco)),
+        }
+    )
+    truth_coo = truth.tocoo()
+    interactions = pd.DataFrame({"user_id": truth_coo.row, "item_id": truth_coo.col})
+    assert metrics["map"] == pytest.approx(MAP(k=K).calc(reco_df, interactions), rel=1e-5)
+    assert metrics["recall"] == pytest.approx(Recall(k=K).calc(reco_df, interactions), rel=1e-5)
+
+
+def test_chunks_and_processes_do_not_change_metrics() -> None:
+    reco, truth = _random_data()
+
+    expected = calc_ranking_metrics(reco, truth)
+    assert calc_ranking_metrics(reco, truth, chunk_size=7) == pytest.approx(expected)
+    assert calc_ranking_metrics(reco, truth, chunk_size=7, n_jobs=2) == pytest.approx(expected)
+
+
+def test_padding_and_graded_relevance() -> None:
+    truth = sparse.csr_matrix(np.array([[0.5, 0, 1], [0, 0, 0]], dtype=np.float32))
+    reco = np.array([[2, -1, 0], [0, 1, 2]])
+
+    assert hit_relevance(reco, truth).tolist() == [[1, 0, 0.5], [0, 0, 0]]
+    values = user_metrics(hit_relevance(reco, truth), np.diff(truth.indptr), ["pfound", "recall"])
+    # Relevant first item stops the user, the second user is not evaluated
+    assert values["pfound"][0] == pytest.approx(1.0)
+    assert values["recall"][0] == pytest.approx(1.0)
+    assert np.isnan(values["recall"][1])
+
+
+def test_truth_matrix_drops_unknown_and_duplicated_interactions() -> None:
+    interactions = pd.DataFrame({"user_id": [10, 10, 10, 30], "item_id": [1, 1, 2, 1], "weight": [0.2, 0.7, 0.4, 1]})
+
+    truth = truth_matrix(interactions, IdIndex([10, 20]), IdIndex([2, 1]), relevance_column="weight")
+
+    assert np.allclose(truth.toarray(), np.array([[0.4, 0.7], [0, 0]]))
@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, List, Optional, Tuple
+
+from service.predictors.admission import AdmissionController
+
+
+def _controller(latency_budget: float = 1.0, timeout: float = 1.0, max_in_flight: int = 10) -> AdmissionController:
+    return AdmissionController("test", latency_budget, timeout, max_in_flight, ewma_alpha=1.0)
+
+
+def _fallback() -> Optional[List[int]]:
+    return [0]
+
+
+def test_slow_model_is_answered_by_fallback_until_it_recovers() -> None:
+    controller = _controller(latency_budget=0.01)
+
+    async def compute(delay: float) -> List[int]:
+        await asyncio.sleep(delay)
+        return [1]
+
+    async def request_all() -> List[Tuple[Any, bool]]:
+        slow = asyncio.ensure_future(controller.run(lambda: compute(0.05), _fallback))
+        await asyncio.sleep(0)
+        await slow
+        # Latency is over the budget, but calls are admitted while idle
+        in_flight = asyncio.ensure_future(controller.run(lambda: compute(0.05), _fallback))
+        await asyncio.sleep(0)
+        shed = await controller.run(lambda: compute(0), _fallback)
+        await in_flight
+        recovered = await controller.run(lambda: compute(0), _fallback)
+        after_recovery = await controller.run(lambda: compute(0), _fallback)
+        return [await slow, await in_flight, shed, recovered, after_recovery]
+
+    assert asyncio.run(request_all()) == [([1], False), ([1], False), ([0], True), ([1], False), ([1], False)]
+    assert controller.in_flight == 0
+
+
+def test_calls_over_timeout_are_answered_by_fallback() -> None:
+    controller = _controller(timeout=0.01)
+    finished: List[int] = []
+
+    async def compute() -> List[int]:
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return [1]
+
+    async def request() -> Tuple[Any, bool]:
+        result = await controller.run(compute, _fallback)
+        await asyncio.sleep(0.1)
+        return result
+
+    assert asyncio.run(request()) == ([0], True)
+    # Abandoned call is finished and counted
+    assert finished == [1]
+    assert controller.in_flight == 0
+
+
+def test_calls_are_not_shed_without_fallback() -> None:
+    controller = _controller(max_in_flight=1, timeout=0.01)
+
+    async def compute() -> List[int]:
+        await asyncio.sleep(0.02)
+        return [1]
+
+    async def request_all() -> List[Tuple[Any, bool]]:
+        return await asyncio.gather(*(controller.run(compute, lambda: None) for _ in range(2)))
+
+    assert asyncio.run(request_all()) == [([1], False), ([1], False)]
@@ -0,0 +1,120 @@
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict
+
+import joblib
+import numpy as np
+from _pytest.monkeypatch import MonkeyPatch
+
+from service.predictors import base
+from service.predictors.als import ALSRecommender
+from service.predictors.utils import get_predictors_config
+from service.settings import ServiceConfig, get_config
+
+
+def test_recommend_batch_matches_recommend(service_config: ServiceConfig) -> None:
+    recommender = ALSRecommender(service_config)
+    user_ids = recommender.users.external_ids.tolist() + [6, 10**10]
+
+    for top_k_table in (recommender.top_k_table, None):
+        recommender.top_k_table = top_k_table
+        assert recommender.recommend_batch(user_ids) == [recommender.recommend(user_id) for user_id in user_ids]
+
+
+def test_artifacts_match_dataset(service_config: ServiceConfig, monkeypatch: MonkeyPatch) -> None:
+    from_artifacts = ALSRecommender(service_config)
+
+    def get_config_without_artifacts(global_cfg: ServiceConfig) -> Dict[str, Any]:
+        config = get_predictors_config(global_cfg)
+        del config["als"]["artifacts"], config["als"]["top_k_table"]
+        return config
+
+    monkeypatch.setattr(base, "get_predictors_config", get_config_without_artifacts)
+    from_dataset = ALSRecommender(service_config)
+
+    user_ids = from_dataset.users.external_ids.tolist() + [6]
+    assert from_artifacts.recommend_batch(user_ids) == from_dataset.recommend_batch(user_ids)
+    assert from_artifacts.explain_reco(555088, 12173) == from_dataset.explain_reco(555088, 12173)
+
+
+def test_explain_reco_batch_matches_implicit(service_config: ServiceConfig) -> None:
+    recommender = ALSRecommender(service_config)
+    model = recommender.model.model
+    item_ids = recommender.items.external_ids[:5].tolist()
+
+    for user_id in recommender.users.external_ids.tolist():
+        int_user_id = recommender.users[user_id]
+        explained = recommender.explain_reco_batch(user_id, item_ids)
+        for item_id, (score, top_contributor) in zip(item_ids, explained):
+            expected_score, contributions, _ = model.explain(
+                int_user_id, recommender.ui_csr, recommender.items[item_id], N=1
+            )
+            assert np.isclose(score, expected_score, atol=1e-5)
+            assert top_contributor == recommender.items.to_external(contributions[0][0])
+
+
+def test_fold_in_solves_als_normal_equations(service_config: ServiceConfig) -> None:
+    recommender = ALSRecommender(service_config)
+    model = recommender.model.model
+    item_factors = np.asarray(model.item_factors, dtype=np.float64)
+
+    for user_id in recommender.users.external_ids.tolist():
+        recommender.fold_in(user_id, [], [])
+        folded_in = recommender.fold_in_overlay.get(user_id)
+        assert folded_in is not None
+
+        # (YtCuY + regularization * I) x_u = YtCu p(u) as in implicit
+        liked_factors = item_factors[folded_in.item_ids]
+        gram = item_factors.T @ item_factors + model.regularization * np.eye(item_factors.shape[1])
+        lhs = gram + (liked_factors.T * (folded_in.confidences - 1)) @ liked_factors
+        rhs = liked_factors.T @ folded_in.confidences
+        assert np.allclose(lhs @ folded_in.factors, rhs, atol=1e-3)
+
+
+def test_folded_in_cold_user_is_recommended_by_own_factors(service_config: ServiceConfig) -> None:
+    recommender = ALSRecommender(service_config)
+    user_id = 6  # cold user's user_id from mock data
+    item_ids = recommender.items.external_ids[:3].tolist()
+
+    assert recommender.user_version(user_id) == 0
+    recommender.fold_in(user_id, item_ids, [3, 1, 1])
+
+    reco = recommender.recommend(user_id)
+    assert recommender.is_warm(user_id)
+    assert recommender.user_version(user_id) > 0
+    assert reco != recommender.cold_reco and not set(reco) & set(item_ids)
+    assert recommender.recommend_batch([user_id, 555088]) == [reco, recommender.recommend(555088)]
+    _, top_contributor = recommender.explain_reco(user_id, reco[0])
+    assert top_contributor in item_ids
+
+
+def test_fold_in_is_kept_by_its_worker_only(service_config: ServiceConfig) -> None:
+    # Every worker process builds its own predictor
+    worker, other_worker = ALSRecommender(service_config), ALSRecommender(service_config)
+    user_id = 6  # cold user's user_id from mock data
+
+    worker.fold_in(user_id, worker.items.external_ids[:3].tolist(), [3, 1, 1])
+
+    assert worker.is_warm(user_id)
+    assert not other_worker.is_warm(user_id)
+    assert other_worker.recommend(user_id) == other_worker.get_cold_recos([user_id])[0]
+
+
+def test_artifacts_of_another_model_are_not_used(service_config: ServiceConfig, tmp_path: Path) -> None:
+    predictors_path = tmp_path / "predictors"
+    shutil.copytree(service_config.predictors_path, predictors_path)
+    with MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("PREDICTORS_PATH", str(predictors_path))
+        config = get_config()
+    model_path = os.path.join(config.predictors_path, get_predictors_config(config)["als"]["model_filename"])
+    assert ALSRecommender(config).top_k_table is not None
+
+    # Model is retrained, but artifacts and top k table are not rebuilt
+    model = joblib.load(model_path)
+    model.model.item_factors = model.model.item_factors + 1
+    joblib.dump(model, model_path)
+    recommender = ALSRecommender(config)
+
+    assert recommender.top_k_table is None
+    assert np.allclose(recommender.model.model.item_factors, model.model.item_factors)
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+from typing import Any, List, Sequence, cast
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from service.predictors import constructor
+from service.predictors.batching import RecoBatcher
+
+
+class CountingRecommender:
+    def __init__(self) -> None:
+        self.batches: List[List[int]] = []
+
+    def recommend_batch(self, user_ids: Sequence[int]) -> List[List[int]]:
+        self.batches.append(list(user_ids))
+        return [[user_id] for user_id in user_ids]
+
+
+def test_batcher_scores_concurrent_requests_together(monkeypatch: MonkeyPatch) -> None:
+    recommender = CountingRecommender()
+    monkeypatch.setitem(constructor.predictors, "counting", cast(Any, recommender))
+    batcher = RecoBatcher("counting", max_batch_size=3, max_wait=0.01)
+
+    async def request_all() -> List[List[int]]:
+        return await asyncio.gather(*(batcher.recommend(user_id) for user_id in range(5)))
+
+    recos = asyncio.run(request_all())
+
+    assert recos == [[0], [1], [2], [3], [4]]
+    assert recommender.batches == [[0, 1, 2], [3, 4]]
+
+
+def test_batcher_loads_lazy_predictor_outside_event_loop(monkeypatch: MonkeyPatch) -> None:
+    recommender = CountingRecommender()
+    loading_threads: List[threading.Thread] = []
+
+    def load() -> Any:
+        loading_threads.append(threading.current_thread())
+        constructor.predictors["counting"] = cast(Any, recommender)
+        return recommender
+
+    # Predictor set by loading is removed after the test
+    monkeypatch.setitem(constructor.predictors, "counting", cast(Any, None))
+    monkeypatch.delitem(constructor.predictors, "counting")
+    monkeypatch.setitem(constructor.lazy_predictors, "counting", load)
+    batcher = RecoBatcher("counting", max_batch_size=2, max_wait=0.01)
+
+    async def request_all() -> List[List[int]]:
+        return await asyncio.gather(*(batcher.recommend(user_id) for user_id in range(2)))
+
+    assert asyncio.run(request_all()) == [[0], [1]]
+    assert loading_threads and loading_threads[0] is not threading.main_thread()
@@ -0,0 +1,33 @@
+import os
+import shutil
+from pathlib import Path
+
+import joblib
+import numpy as np
+from _pytest.monkeypatch import MonkeyPatch
+
+from service.predictors.artifacts import load_als_artifacts
+from service.predictors.build import build_als_artifacts
+from service.predictors.utils import get_predictors_config
+from service.settings import ServiceConfig, get_config
+
+
+def test_als_artifacts_are_built_from_the_model(service_config: ServiceConfig, tmp_path: Path) -> None:
+    predictors_path = tmp_path / "predictors"
+    shutil.copytree(service_config.predictors_path, predictors_path)
+    with MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("PREDICTORS_PATH", str(predictors_path))
+        config = get_config()
+
+    model_cfg = get_predictors_config(config)["als"]
+    model_path = os.path.join(config.predictors_path, model_cfg["model_filename"])
+    model = joblib.load(model_path)
+    model.model.user_factors = model.model.user_factors * 2
+    model.model.item_factors = model.model.item_factors + 1
+    joblib.dump(model, model_path)
+
+    path = build_als_artifacts(config)
+    artifacts = load_als_artifacts(path)
+
+    assert np.allclose(artifacts.model.model.user_factors, model.model.user_factors)
+    assert np.allclose(artifacts.model.model.item_factors, model.model.item_factors)
@@ -0,0 +1,83 @@
+import asyncio
+from typing import List
+
+from service.predictors.cache import ResultCache
+from service.predictors.utils import estimate_memory_usage
+from service.response import PreEncodedList
+
+
+def _cache(max_entries: int = 10, ttl: float = 60.0) -> ResultCache:
+    return ResultCache("test", max_entries=max_entries, max_memory=1024**2, ttl=ttl)
+
+
+def test_concurrent_misses_are_computed_once() -> None:
+    cache = _cache()
+    computed: List[int] = []
+
+    async def compute() -> List[int]:
+        computed.append(1)
+        await asyncio.sleep(0.01)
+        return [1, 2, 3]
+
+    async def request_all() -> List[List[int]]:
+        return await asyncio.gather(*(cache.get_or_compute("key", compute) for _ in range(5)))
+
+    assert asyncio.run(request_all()) == [[1, 2, 3]] * 5
+    assert len(computed) == 1
+    assert len(cache) == 1
+
+
+def test_least_recently_used_and_expired_entries_are_evicted() -> None:
+    computed: List[int] = []
+
+    async def request(cache: ResultCache, key: int) -> int:
+        async def compute() -> int:
+            computed.append(key)
+            return key
+
+        return await cache.get_or_compute(key, compute)
+
+    async def request_all(cache: ResultCache, keys: List[int]) -> None:
+        for key in keys:
+            await request(cache, key)
+
+    asyncio.run(request_all(_cache(max_entries=2), [1, 2, 1, 3, 1, 2]))
+    assert computed == [1, 2, 3, 2]
+
+    computed.clear()
+    asyncio.run(request_all(_cache(ttl=0.0), [1, 1]))
+    assert computed == [1, 1]
+
+
+def test_results_computed_before_invalidation_are_not_cached() -> None:
+    cache = _cache()
+
+    async def compute() -> str:
+        cache.invalidate()
+        return "stale"
+
+    assert asyncio.run(cache.get_or_compute("key", compute)) == "stale"
+    assert len(cache) == 0
+
+
+def test_memory_cap_evicts_least_recently_used_entries() -> None:
+    value = list(range(1_000, 1_100))
+    cache = ResultCache("test", max_entries=10, max_memory=estimate_memory_usage(value) * 3 // 2, ttl=60.0)
+
+    async def request_all() -> None:
+        for key in range(2):
+            await cache.get_or_compute(key, lambda: _compute(value))
+
+    asyncio.run(request_all())
+    assert len(cache) == 1
+    assert 0 < cache.memory_usage <= cache.max_memory
+
+
+def test_cached_results_have_memory_usage() -> None:
+    assert estimate_memory_usage([1_000, 1_001]) > 0
+    assert estimate_memory_usage(PreEncodedList([1_000, 1_001])) > estimate_memory_usage([1_000, 1_001])
+    assert estimate_memory_usage([(0.5, "explanation")]) > 0
+
+
+async def _compute(value: List[int]) -> List[int]:
+    return value
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from service.predictors.als import ALSRecommender
+from service.predictors.cold import ColdSegments, build_cold_segments, greedy_coverage, most_popular
+from service.predictors.id_index import IdIndex
+from service.response import PreEncodedList
+from service.settings import ServiceConfig
+
+
+def test_greedy_coverage_picks_items_of_uncovered_users() -> None:
+    # Item 0 is the most popular, but item 2 covers users left after it
+    ui_csr = sparse.csr_matrix(
+        np.array(
+            [
+                [1, 1, 0],
+                [1, 1, 0],
+                [1, 0, 0],
+                [0, 1, 1],
+                [0, 0, 1],
+            ],
+            dtype=np.float32,
+        )
+    )
+    segment_csr = sparse.csr_matrix(np.ones((1, 5), dtype=np.float32))
+
+    assert greedy_coverage(ui_csr, segment_csr, k=3).tolist() == [[0, 2, 1]]
+    assert most_popular(ui_csr, segment_csr, k=3).tolist() == [[0, 1, 2]]
+
+
+def test_build_cold_segments_drops_small_segments() -> None:
+    users_features = pd.DataFrame(
+        {
+            "id": [1, 1, 2, 2, 3, 3, 4],
+            "value": ["М", "age_18_24", "М", "age_18_24", "Ж", "age_18_24", "Ж"],
+            "feature": ["sex", "age", "sex", "age", "sex", "age", "sex"],
+        }
+    )
+    interactions = pd.DataFrame({"user_id": [1, 2, 2, 3, 4, 5], "item_id": [10, 10, 20, 30, 40, 50]})
+
+    segments = build_cold_segments(interactions, users_features, k=3, min_segment_users=2, features=("sex", "age"))
+
+    assert segments.names == ["М|age_18_24"]
+    assert segments.segment_of([1, 2, 3, 4, 5]).tolist() == [0, 0, -1, -1, -1]
+    # Segment has only two items, the rest is globally popular
+    assert segments.items.tolist() == [[10, 20, 30]]
+
+
+def test_cold_users_get_recommendations_of_their_segment(service_config: ServiceConfig) -> None:
+    recommender = ALSRecommender(service_config)
+    recommender.cold_segments = ColdSegments(IdIndex([7]), np.array([0]), np.array([[1, 2, -1]]), ["segment"])
+    recommender.segment_recos = [PreEncodedList([1, 2])]
+    user_ids = [6, 7, 555088]
+
+    assert recommender.recommend(7) == [1, 2]
+    assert recommender.recommend(6) == recommender.cold_reco
+    assert recommender.recommend_batch(user_ids) == [recommender.recommend(user_id) for user_id in user_ids]
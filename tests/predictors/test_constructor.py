@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from service.predictors import base, constructor, utils
+from service.predictors.random import RandomRecommender
+from service.predictors.utils import estimate_memory_usage, get_predictors_config
+from service.settings import ServiceConfig
+
+
+def test_lazy_predictor_is_loaded_on_first_use(service_config: ServiceConfig, monkeypatch: MonkeyPatch) -> None:
+    def get_config_with_lazy_random(global_cfg: ServiceConfig) -> Dict[str, Any]:
+        config = get_predictors_config(global_cfg)
+        config["random"]["lazy"] = True
+        return config
+
+    monkeypatch.setattr(constructor, "get_predictors_config", get_config_with_lazy_random)
+    monkeypatch.setattr(constructor, "predictors", {})
+    monkeypatch.setattr(constructor, "lazy_predictors", {})
+
+    with ThreadPoolExecutor() as executor:
+        futures = constructor.load_predictors(service_config, executor)
+    for future in futures:
+        future.result()
+
+    assert "random" not in constructor.predictors
+    assert "als" in constructor.predictors
+    assert isinstance(constructor.get_predictor("random"), RandomRecommender)
+    assert "random" not in constructor.lazy_predictors
+
+
+def test_least_recently_used_lazy_predictors_are_unloaded(
+    service_config: ServiceConfig, monkeypatch: MonkeyPatch
+) -> None:
+    memory_usage = estimate_memory_usage(RandomRecommender(service_config))
+
+    def get_config_with_variants(global_cfg: ServiceConfig) -> Dict[str, Any]:
+        config = get_predictors_config(global_cfg)
+        # Budget fits not lazy model and two of the three variants
+        config["registry"]["memory_budget_mb"] = 3.5 * memory_usage / 1024**2
+        del config["als"]
+        for name in ("random_a", "random_b", "random_c"):
+            config[name] = {**config["random"], "lazy": True}
+        return config
+
+    monkeypatch.setattr(constructor, "get_predictors_config", get_config_with_variants)
+    monkeypatch.setattr(base, "get_predictors_config", get_config_with_variants)
+    for name in ("registry", "predictors", "lazy_predictors", "predictors_memory"):
+        monkeypatch.setattr(constructor, name, type(getattr(constructor, name))())
+
+    with ThreadPoolExecutor() as executor:
+        for future in constructor.load_predictors(service_config, executor):
+            future.result()
+
+    variant_a = constructor.get_predictor("random_a")
+    constructor.get_predictor("random_b")
+    # "random_a" is used recently, so "random_b" is unloaded
+    assert constructor.get_predictor("random_a") is variant_a
+    constructor.get_predictor("random_c")
+
+    assert set(constructor.predictors) == {"random", "random_a", "random_c"}
+    assert "random_b" in constructor.lazy_predictors
+    assert constructor.get_predictor("random_b").name == "random_b"
+    # Not lazy predictor is never unloaded
+    assert "random" in constructor.predictors
+
+
+def test_model_variant_extends_another_model(tmp_path: Any) -> None:
+    config_path = tmp_path / "predictors_config.yaml"
+    config_path.write_text("als:\n  factors: 64\n  lazy: false\nals_128:\n  extends: als\n  factors: 128\n")
+
+    config = utils._read_predictors_config(str(config_path))  # pylint: disable=protected-access
+
+    assert config["als_128"] == {"factors": 128, "lazy": False}
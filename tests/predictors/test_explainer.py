@@ -0,0 +1,24 @@
+import pandas as pd
+
+from service.predictors.explainer import ItemCatalogue
+
+
+def test_item_catalogue_precomputes_rating_explanations() -> None:
+    items_rating = pd.DataFrame(
+        {"views": [300, 200, 100], "rank": [1, 2, 3], "title": ["Первый", "Второй", "Третий"]},
+        index=pd.Index([30, 10, 20], name="item_id"),
+    )
+
+    catalogue = ItemCatalogue(items_rating)
+
+    assert 10 in catalogue and 40 not in catalogue
+    assert catalogue.explain_using_rating(30) == (
+        95,
+        "Фильм/сериал 'Первый' может вам понравиться с вероятностью 95% т.к. его уже посмотрели"
+        + " 300 пользователей сервиса и он занимает 1 место в нашем топе",
+    )
+    assert catalogue.explain_using_rating(20) == (0, "Фильм/сериал 'Третий' скорее всего вам не понравится")
+    assert catalogue.explain_using_model(10, 0.5, 30) == (
+        50,
+        "Фильм/сериал 'Второй' может вам понравиться с вероятностью 50% т.к. вы посмотрели 'Первый'",
+    )
@@ -0,0 +1,17 @@
+import pytest
+
+from service.predictors.id_index import MISSING_ID, IdIndex
+
+
+def test_id_index_lookups() -> None:
+    index = IdIndex([30, 10, 20])
+
+    assert 10 in index
+    assert 15 not in index
+    assert 10**30 not in index
+    assert index[30] == 0
+    assert index.get(15) == MISSING_ID
+    assert index.to_internal([20, 15, 30]).tolist() == [2, MISSING_ID, 0]
+    assert index.to_external([1, 2]).tolist() == [10, 20]
+    with pytest.raises(KeyError):
+        index[15]  # pylint: disable=pointless-statement
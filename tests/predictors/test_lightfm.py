@@ -0,0 +1,20 @@
+from service.predictors.lightfm import LightFMRecommender
+from service.predictors.utils import get_data_with_features
+from service.settings import ServiceConfig
+
+
+def test_recommendations_match_lightfm(service_config: ServiceConfig) -> None:
+    recommender = LightFMRecommender(service_config)
+    dataset, users = get_data_with_features(
+        recommender.model_cfg["interactions"],
+        recommender.model_cfg["users_features"],
+        recommender.model_cfg["items_features"],
+        service_config,
+    )
+    user_ids = users.external_ids.tolist()
+
+    expected = recommender.model.recommend(user_ids, dataset, k=service_config.k_recs, filter_viewed=True)
+    expected_recos = expected.groupby("user_id")["item_id"].apply(list).to_dict()
+
+    assert recommender.recommend_batch(user_ids) == [expected_recos[user_id] for user_id in user_ids]
+    assert recommender.recommend(6) == recommender.cold_reco
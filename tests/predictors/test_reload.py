@@ -0,0 +1,83 @@
+import os
+import shutil
+from typing import Any, List, Tuple, cast
+
+from _pytest.monkeypatch import MonkeyPatch
+
+from service.predictors import constructor, reload
+from service.predictors.reload import PredictorsWatcher
+from service.predictors.utils import get_predictors_config, get_predictors_config_path
+from service.settings import ServiceConfig
+
+
+def test_watcher_reloads_predictors_with_changed_files(
+    service_config: ServiceConfig, monkeypatch: MonkeyPatch, tmp_path: Any
+) -> None:
+    dataset_path = str(tmp_path / "dataset")
+    shutil.copytree(service_config.dataset_path, dataset_path)
+    config = service_config.copy(update={"dataset_path": dataset_path})
+
+    reloaded: List[str] = []
+    monkeypatch.setattr(reload, "reload_predictor", lambda name, _: reloaded.append(name))
+    # Other loaded models share the items file with random model
+    monkeypatch.setattr(reload, "predictors", {"random": cast(Any, object())})
+    watcher = PredictorsWatcher(config)
+
+    assert not watcher.check()
+
+    items_path = os.path.join(dataset_path, constructor.get_predictors_config(config)["random"]["items"])
+    stat = os.stat(items_path)
+    os.utime(items_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert watcher.check() == ["random"]
+    assert reloaded == ["random"]
+    assert not watcher.check()
+
+
+def test_admin_commands_are_applied_by_all_workers(
+    service_config: ServiceConfig, monkeypatch: MonkeyPatch, tmp_path: Any
+) -> None:
+    reload_config = service_config.reload_config.copy(update={"commands_dir": str(tmp_path)})
+    config = service_config.copy(update={"reload_config": reload_config})
+    applied: List[Tuple[str, str]] = []
+    monkeypatch.setattr(reload, "reload_predictor", lambda name, _: applied.append((name, "reload")))
+    monkeypatch.setattr(reload, "rollback_predictor", lambda name: applied.append((name, "rollback")))
+    workers = [PredictorsWatcher(config), PredictorsWatcher(config)]
+
+    workers[0].run_command("random", "reload")
+    assert applied == [("random", "reload")]
+    assert not workers[0].check_commands()
+    assert workers[1].check_commands() == [("random", "reload")]
+    assert not workers[1].check_commands()
+
+    # Worker started later doesn't apply commands published before it
+    workers[1].run_command("random", "rollback")
+    assert not PredictorsWatcher(config).check_commands()
+    assert workers[0].check_commands() == [("random", "rollback")]
+
+
+def test_watcher_reloads_predictors_with_edited_config(
+    service_config: ServiceConfig, monkeypatch: MonkeyPatch, tmp_path: Any
+) -> None:
+    config = service_config.copy(update={"root_path": str(tmp_path)})
+    config_path = get_predictors_config_path(config)
+    os.makedirs(os.path.dirname(config_path))
+    shutil.copy(get_predictors_config_path(service_config), config_path)
+
+    reloaded: List[str] = []
+    monkeypatch.setattr(reload, "reload_predictor", lambda name, _: reloaded.append(name))
+    monkeypatch.setattr(reload, "predictors", {"random": cast(Any, object())})
+    watcher = PredictorsWatcher(config)
+    assert get_predictors_config(config)["random"]["random_state"] == 42
+
+    with open(config_path, encoding="ascii") as f:
+        edited = f.read().replace("random_state: 42", "random_state: 7", 1)
+    with open(config_path, "w", encoding="ascii") as f:
+        f.write(edited)
+    stat = os.stat(config_path)
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert watcher.check() == ["random"]
+    assert reloaded == ["random"]
+    assert get_predictors_config(config)["random"]["random_state"] == 7
+    assert not watcher.check()
@@ -0,0 +1,32 @@
+import numpy as np
+from scipy import sparse
+
+from service.predictors.retrieval import BruteForceIndex, IVFIndex, evaluate_recall
+
+
+def _random_vectors(n: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, 8)).astype(np.float32)
+
+
+def test_ivf_scanning_all_lists_matches_brute_force() -> None:
+    item_vectors = _random_vectors(100, seed=0)
+    user_vectors = _random_vectors(5, seed=1)
+    ui_csr = sparse.random(5, 100, density=0.1, format="csr", random_state=2)
+
+    index = IVFIndex.build(item_vectors, n_lists=10)
+    exact = BruteForceIndex(item_vectors).search(user_vectors, 10, ui_csr)
+
+    assert index.search(user_vectors, 10, ui_csr).tolist() == exact.tolist()
+
+
+def test_ivf_save_load_and_recall(tmp_path) -> None:
+    item_vectors = _random_vectors(100, seed=0)
+    user_vectors = _random_vectors(20, seed=1)
+    path = str(tmp_path / "ivf")
+
+    IVFIndex.build(item_vectors, n_lists=10).save(path)
+    index = IVFIndex.load(path, item_vectors, n_probe=2)
+    stats = evaluate_recall(index, user_vectors, k=10)
+
+    assert index.search(user_vectors, 10).shape == (20, 10)
+    assert 0 < stats["recall"] <= 1
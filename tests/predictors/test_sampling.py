@@ -0,0 +1,53 @@
+from typing import Any, Dict
+
+import numpy as np
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from service.predictors import base
+from service.predictors.random import RandomRecommender
+from service.predictors.sampling import sample_without_replacement, sample_without_replacement_batch
+from service.predictors.utils import get_predictors_config
+from service.settings import ServiceConfig
+
+
+@pytest.mark.parametrize("n,k", [(1000, 10), (10, 10), (5, 10)])
+def test_samples_are_distinct(n: int, k: int) -> None:
+    rng = np.random.default_rng(0)
+
+    sample = sample_without_replacement(rng, n, k)
+    batch = sample_without_replacement_batch(rng, n, k, size=100)
+
+    assert sorted(set(sample.tolist())) == sorted(sample.tolist())
+    assert len(sample) == min(n, k) and sample.min() >= 0 and sample.max() < n
+    assert batch.shape == (100, min(n, k))
+    assert all(len(set(row)) == batch.shape[1] for row in batch.tolist())
+
+
+def test_samples_are_uniform() -> None:
+    rng = np.random.default_rng(0)
+    n, k, size = 20, 5, 20_000
+
+    counts = np.bincount(sample_without_replacement_batch(rng, n, k, size).ravel(), minlength=n)
+    positions = np.bincount(
+        np.concatenate([sample_without_replacement(rng, n, k)[:1] for _ in range(size)]), minlength=n
+    )
+
+    expected = size * k / n
+    assert np.abs(counts - expected).max() < 0.1 * expected
+    # Order is random too, so every item is equally likely to be the first
+    assert np.abs(positions - size / n).max() < 0.15 * size / n
+
+
+def test_per_user_seed(service_config: ServiceConfig, monkeypatch: MonkeyPatch) -> None:
+    def get_config_with_per_user_seed(global_cfg: ServiceConfig) -> Dict[str, Any]:
+        config = get_predictors_config(global_cfg)
+        config["random"]["per_user_seed"] = True
+        return config
+
+    monkeypatch.setattr(base, "get_predictors_config", get_config_with_per_user_seed)
+    recommender = RandomRecommender(service_config)
+
+    assert recommender.recommend(1) == recommender.recommend(1)
+    assert recommender.recommend(1) != recommender.recommend(2)
+    assert recommender.recommend_batch([1, 2]) == [recommender.recommend(1), recommender.recommend(2)]
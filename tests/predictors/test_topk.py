@@ -0,0 +1,35 @@
+import numpy as np
+from scipy import sparse
+
+from service.predictors.als import ALSRecommender
+from service.predictors.topk import build_top_k_table, top_k_items
+from service.settings import ServiceConfig
+
+
+def test_top_k_table_matches_online_recommendations(service_config: ServiceConfig) -> None:
+    recommender = ALSRecommender(service_config)
+    model = recommender.model.model
+    item_external_ids = recommender.items.external_ids
+
+    table = build_top_k_table(
+        model.user_factors,
+        model.item_factors,
+        recommender.ui_csr,
+        item_external_ids,
+        k=service_config.k_recs,
+        chunk_size=3,
+    )
+
+    for int_user_id in range(recommender.ui_csr.shape[0]):
+        online = model.recommend(int_user_id, user_items=recommender.ui_csr, N=service_config.k_recs)
+        assert table[int_user_id].tolist() == [item_external_ids[item_id] for item_id, _ in online]
+
+
+def test_top_k_items_pads_when_not_enough_items() -> None:
+    user_factors: np.ndarray = np.array([[1.0, 0.0]], dtype=np.float32)
+    item_factors: np.ndarray = np.array([[1.0, 0.0], [0.5, 0.0], [0.1, 0.0]], dtype=np.float32)
+    ui_csr = sparse.csr_matrix(np.array([[1.0, 0.0, 0.0]], dtype=np.float32))
+
+    top_k = top_k_items(user_factors, item_factors, k=4, ui_csr=ui_csr)
+
+    assert top_k.tolist() == [[1, 2, -1, -1]]
@@ -0,0 +1,100 @@
+# pylint: disable=redefined-outer-name
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from implicit.als import AlternatingLeastSquares
+from rectools.dataset import Dataset
+from rectools.models import ImplicitALSWrapperModel
+from scipy import sparse
+
+from service.predictors.als import ALSRecommender
+from service.predictors.artifacts import ALSArtifacts
+from service.predictors.id_index import IdIndex
+from service.predictors.train import fit_als, get_changed_rows, get_layout, init_factors, train_als
+from service.predictors.utils import get_data_with_features, get_predictors_config
+from service.settings import ServiceConfig, get_config
+
+
+@pytest.fixture
+def featured_dataset(service_config: ServiceConfig) -> Dataset:
+    model_cfg = get_predictors_config(service_config)["als"]
+    dataset, _ = get_data_with_features(
+        model_cfg["interactions"],
+        model_cfg["users_features"],
+        model_cfg["items_features"],
+        service_config,
+    )
+    return dataset
+
+
+def _als(factors: int, iterations: int) -> AlternatingLeastSquares:
+    return AlternatingLeastSquares(
+        factors=factors, regularization=0.01, iterations=iterations, use_cg=True, num_threads=1, random_state=42
+    )
+
+
+def test_full_fit_matches_rectools(featured_dataset: Dataset) -> None:
+    expected = ImplicitALSWrapperModel(_als(factors=3, iterations=5), fit_features_together=True)
+    expected.fit(featured_dataset)
+
+    layout = get_layout(featured_dataset)
+    model = _als(factors=expected.model.factors, iterations=5)
+    user_factors, item_factors = init_factors(layout, model.factors, model.random_state)
+    history = fit_als(model, featured_dataset.get_user_item_matrix(), user_factors, item_factors, layout)
+
+    assert np.allclose(user_factors, expected.model.user_factors, atol=1e-5)
+    assert np.allclose(item_factors, expected.model.item_factors, atol=1e-5)
+    assert history[-1]["loss"] < history[0]["loss"]
+
+
+def test_incremental_fit_solves_only_changed_rows(featured_dataset: Dataset) -> None:
+    users = IdIndex(featured_dataset.user_id_map.external_ids)
+    items = IdIndex(featured_dataset.item_id_map.external_ids)
+    previous_csr = featured_dataset.get_user_item_matrix().astype(np.float32)
+    ui_csr = previous_csr.tolil()
+    ui_csr[1, 0] = 5.0
+    ui_csr = ui_csr.tocsr()
+    previous = ALSArtifacts(users, items, previous_csr, model=None)
+
+    users_to_solve, items_to_solve = get_changed_rows(previous, users, items, ui_csr)
+    assert users_to_solve.tolist() == [1]
+    assert items_to_solve.tolist() == [0]
+
+    layout = get_layout(featured_dataset)
+    user_factors, item_factors = init_factors(layout, 64, random_state=42)
+    old_user_factors, old_item_factors = user_factors.copy(), item_factors.copy()
+    fit_als(_als(64, 2), ui_csr, user_factors, item_factors, layout, users_to_solve, items_to_solve)
+
+    assert np.flatnonzero((user_factors != old_user_factors).any(axis=1)).tolist() == [1]
+    assert np.flatnonzero((item_factors != old_item_factors).any(axis=1)).tolist() == [0]
+
+
+def test_unchanged_interactions_keep_factors() -> None:
+    users, items = IdIndex([10, 20]), IdIndex([1, 2, 3])
+    previous_csr = sparse.csr_matrix(np.array([[1, 0, 2], [0, 3, 0]], dtype=np.float32))
+    previous = ALSArtifacts(users, items, previous_csr, model=None)
+    # Same interactions in another order of ids, item 3 left the dataset
+    ui_csr = sparse.csr_matrix(np.array([[3, 0], [0, 1]], dtype=np.float32))
+
+    users_to_solve, items_to_solve = get_changed_rows(previous, IdIndex([20, 10]), IdIndex([2, 1]), ui_csr)
+
+    assert users_to_solve.tolist() == [1]
+    assert items_to_solve.tolist() == []
+
+
+def test_trained_model_is_served(service_config: ServiceConfig, tmp_path: Path) -> None:
+    predictors_path = tmp_path / "predictors"
+    shutil.copytree(service_config.predictors_path, predictors_path)
+    with MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("PREDICTORS_PATH", str(predictors_path))
+        config = get_config()
+
+        history = train_als(config, "warm", iterations=2, num_threads=1)
+        recommender = ALSRecommender(config)
+
+    assert len(history) == 2
+    assert recommender.top_k_table is not None
+    assert len(recommender.recommend(555088)) == config.k_recs
@@ -0,0 +1,28 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from service.benchmark import BenchmarkRequest, check_thresholds, run_benchmark, summarize, zipf_requests
+
+
+def test_benchmark_reports_groups_and_thresholds(app: FastAPI) -> None:
+    requests = zipf_requests([555088, 6], ["als", "random"], n_requests=20)
+    requests.append(BenchmarkRequest("POST", "/reco/als/batch", {"user_ids": [555088, 6]}))
+
+    async def benchmark() -> dict:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            return summarize(*await run_benchmark(client, requests, concurrency=4))
+
+    summary = asyncio.run(benchmark())
+
+    assert summary["total"]["requests"] == 21
+    assert summary["total"]["errors"] == 0
+    assert {(group["endpoint"], group["model_name"]) for group in summary["groups"]} == {
+        ("reco", "als"),
+        ("reco", "random"),
+        ("reco_batch", "als"),
+    }
+    assert summary["total"]["p50_ms"] <= summary["total"]["p99_ms"]
+    assert not check_thresholds(summary, max_p99_ms=10**6, max_error_rate=0.0)
+    assert check_thresholds(summary, min_rps=10**9)
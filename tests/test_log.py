@@ -0,0 +1,27 @@
+import logging
+import queue
+
+from service.log import DroppingQueueHandler, SamplingFilter
+
+
+def _record(level: int) -> logging.LogRecord:
+    return logging.LogRecord("access", level, __file__, 1, "message %s", ("arg",), None)
+
+
+def test_sampling_filter_keeps_severe_records() -> None:
+    sampling_filter = SamplingFilter(rate=0.0)
+
+    assert not sampling_filter.filter(_record(logging.INFO))
+    assert sampling_filter.filter(_record(logging.WARNING))
+
+
+def test_queue_handler_drops_records_when_queue_is_full() -> None:
+    records_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(1)
+    handler = DroppingQueueHandler(records_queue)
+
+    handler.handle(_record(logging.INFO))
+    handler.handle(_record(logging.INFO))
+
+    assert handler.dropped == 1
+    # Message is formatted by the writer thread, not by the caller
+    assert records_queue.get_nowait().args == ("arg",)
@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from service.prometheus import get_process
+
+
+def test_import_writes_no_multiprocess_files(tmp_path: Path) -> None:
+    multiproc_dir = tmp_path / "prometheus_multiproc"
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(multiproc_dir)}
+    command = "import service.log, service.prometheus"
+
+    missing_dir = subprocess.run([sys.executable, "-c", command], env=env, capture_output=True, check=False)
+    assert missing_dir.returncode == 0, missing_dir.stderr.decode()
+
+    multiproc_dir.mkdir()
+    subprocess.run([sys.executable, "-c", command], env=env, check=True)
+    assert not list(multiproc_dir.iterdir())
+
+
+def test_forked_worker_reports_its_own_process() -> None:
+    parent_pid = get_process().pid
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child process reports the pid of its metrics and exits at once
+        os.close(read_fd)
+        os.write(write_fd, str(get_process().pid).encode())
+        os._exit(0)  # pylint: disable=protected-access
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        child_pid = int(f.read())
+    os.waitpid(pid, 0)
+
+    assert parent_pid == os.getpid()
+    assert child_pid == pid
@@ -0,0 +1,37 @@
+import json
+
+from service.models import BatchExplainResponse, Error, ItemExplainResponse, RecoResponse
+from service.response import PreEncodedList, create_response, encode_batch_explain, encode_batch_reco, encode_reco
+
+
+def test_encoded_reco_matches_pydantic_model() -> None:
+    items = [12, 13, 123]
+    expected = json.loads(RecoResponse(user_id=4456, items=items).json())
+
+    assert json.loads(encode_reco(4456, items)) == expected
+    assert json.loads(encode_reco(4456, PreEncodedList(items))) == expected
+    assert json.loads(encode_batch_reco([1, 2], [items, PreEncodedList(items)])) == {
+        "recos": [{"user_id": 1, "items": items}, {"user_id": 2, "items": items}]
+    }
+
+
+def test_encoded_batch_explain_matches_pydantic_model() -> None:
+    item_ids = [12173, 15297]
+    explanations = [(76, "Рекомендуем тем, кто смотрел «Фильм»"), (0, "")]
+    expected = BatchExplainResponse(
+        user_id=4456,
+        explanations=[
+            ItemExplainResponse(item_id=item_id, p=p, explanation=explanation)
+            for item_id, (p, explanation) in zip(item_ids, explanations)
+        ],
+    )
+
+    assert json.loads(encode_batch_explain(4456, item_ids, explanations)) == json.loads(expected.json())
+
+
+def test_error_response_is_encoded() -> None:
+    response = create_response(404, errors=[Error(error_key="user_not_found", error_message="Пользователь")])
+
+    assert json.loads(response.body) == {
+        "errors": [{"error_key": "user_not_found", "error_message": "Пользователь", "error_loc": None}]
+    }